@@ -10,19 +10,15 @@ from TrampolineAcrobaticVariability.Function.Function_Class_Basics import (
     load_and_interpolate_for_point,
     find_index
 )
+from TrampolineAcrobaticVariability.Function.Function_trial_store import TrialStore
 
-home_path_xsens = "/home/lim/Documents/StageMathieu/DataTrampo/Xsens_pkl/GuSe/Pos_JC/831<"
+trial_store_xsens = TrialStore("/home/lim/Documents/StageMathieu/DataTrampo/Xsens_trial_store/")
 n_points = 100
 alpha = 0.05
 
-fichiers_mat_xsens = []
-for root, dirs, files in os.walk(home_path_xsens):
-    for file in files:
-        if file.endswith(".mat"):
-            full_path = os.path.join(root, file)
-            fichiers_mat_xsens.append(full_path)
+essais_xsens = trial_store_xsens.trials(participant="GuSe", acrobatics="831<")
 
-data_xsens = [load_and_interpolate_for_point(file, n_points) for file in fichiers_mat_xsens]
+data_xsens = [load_and_interpolate_for_point(essai, n_points, store=trial_store_xsens) for essai in essais_xsens]
 
 home_path_vicon = "/home/lim/Documents/StageMathieu/DataTrampo/Guillaume/Pos_JC/Gui_831_contact"
 
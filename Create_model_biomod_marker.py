@@ -1,15 +1,15 @@
 import biorbd
-import numpy as np
 import bioviz
 import pandas as pd
 import matplotlib.pyplot as plt
-from TrampolineAcrobaticVariability.Function.Function_build_model import get_all_matrice, convert_to_local_frame, average_rotation_matrix
-from TrampolineAcrobaticVariability.Function.Function_Class_Basics import parent_list_marker
+from TrampolineAcrobaticVariability.Function.Function_build_model import load_relax_reference
+from TrampolineAcrobaticVariability.Function.Function_cache import ArrayCache
 
 home_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
 csv_path = f"{home_path}Labelling_trampo.csv"
 DoF = False
 is_y_up = False
+kalman_cache = ArrayCache(f"{home_path}Kalman_cache/")
 
 
 ##
@@ -37,48 +37,10 @@ for participant_name in participant_names:
         (file_path_relax + "Relax.c3d", (0, 50)),
     ]
 
-    joint_center_mov = []
-    rotate_matrice_mov = []
-
-    joint_center_relax = []
-    rotate_matrice_relax = []
-
-    pos_marker_relax = []
-
     file_path_relax, interval_relax = relax_intervals[0]
-    rot_mat, articular_joint_center, pos_marker_relax = get_all_matrice(file_path_relax, interval_relax, model, is_y_up)
-
-    nb_mat = rot_mat.shape[0]
-    relax_matrix = np.zeros((nb_mat, 3, 3))
-    for i in range(nb_mat):
-        matrices = rot_mat[i]
-        relax_matrix[i] = average_rotation_matrix(matrices)
-
-    relax_joint_center = np.mean(articular_joint_center, axis=1)
-
-    matrix_in_parent_frame = []
-    joint_center_in_parent_frame = []
-    rot_trans_matrix = []
-
-    for index, (joint, parent_info) in enumerate(parent_list_marker.items()):
-        if parent_info is not None:  # Vérifie si parent_info n'est pas None
-            parent_index, parent_name = parent_info
-            P2_in_P1, R2_in_R1 = convert_to_local_frame(relax_joint_center[parent_index], relax_matrix[parent_index],
-                                                        relax_joint_center[index], relax_matrix[index])
-            matrix_in_parent_frame.append(R2_in_R1)
-            joint_center_in_parent_frame.append(P2_in_P1)
-            RT_mat = np.eye(4)
-            RT_mat[:3, :3] = R2_in_R1
-            RT_mat[:3, 3] = P2_in_P1
-            rot_trans_matrix.append(RT_mat)
-
-        else:
-            matrix_in_parent_frame.append(relax_matrix[index])
-            joint_center_in_parent_frame.append(relax_joint_center[index])
-            RT_mat = np.eye(4)
-            RT_mat[:3, :3] = relax_matrix[index]
-            RT_mat[:3, 3] = [0.0, 0.0, 0.0]
-            rot_trans_matrix.append(RT_mat)
+    # Pose de reference relue depuis <modele>_relax_reference.npz si le Relax et le modele n'ont pas change
+    relax_reference = load_relax_reference(file_path_relax, interval_relax, model, is_y_up, cache=kalman_cache)
+    rot_trans_matrix = relax_reference["rot_trans_matrix"]
 
     model = biorbd.Model(chemin_fichier_original)
     desired_order = [model.markerNames()[i].to_string() for i in range(model.nbMarkers())]
@@ -1,5 +1,5 @@
-import moviepy.editor as mp
 import os
+from TrampolineAcrobaticVariability.Function.Function_video import superimpose_videos
 
 home_path = "/home/lim/Documents/StageMathieu/Video_outcome/"
 
@@ -10,11 +10,9 @@ for root, dirs, files in os.walk(home_path):
         file_path = os.path.join(root, file)
         video_files.append(file_path)
 
-clips = [mp.VideoFileClip(video).set_opacity(0.5) for video in video_files]
-max_duration = max(clip.duration for clip in clips)
-clips = [clip.set_duration(max_duration) for clip in clips]
-final_clip = mp.CompositeVideoClip(clips)
-
-output_path = "/home/lim/Documents/StageMathieu/composite_video_outcome.mp4"
-final_clip.write_videofile(output_path, codec='libx264')
-
+# Moyenne des essais (superposition) et carte de l'ecart-type par pixel (variabilite), en un seul decodage des clips
+outputs = {
+    "mean": "/home/lim/Documents/StageMathieu/composite_video_outcome.mp4",
+    "std": "/home/lim/Documents/StageMathieu/composite_video_variability.mp4",
+}
+superimpose_videos(sorted(video_files), outputs, chunk_size=8, codec='libx264')
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+import pandas as pd
+from TrampolineAcrobaticVariability.Function.Function_resample import resample
+from TrampolineAcrobaticVariability.Function.Function_stat import safe_interpolate
+
+n_points = 100
+n_trials = 200
+n_channels = 48  # 16 centres articulaires x 3 axes
+rng = np.random.default_rng(0)
+trials = [rng.standard_normal((rng.integers(150, 400), n_channels)) for _ in range(n_trials)]
+
+# Ancienne methode : np.interp colonne par colonne avec DataFrame.apply
+start = time.perf_counter()
+data_apply = [
+    pd.DataFrame(trial).apply(
+        lambda x: np.interp(np.linspace(0, 1, n_points), np.linspace(0, 1, len(x)), x)
+    ).to_numpy()
+    for trial in trials
+]
+time_apply = time.perf_counter() - start
+
+start = time.perf_counter()
+data_resample = [resample(trial, n_points) for trial in trials]
+time_resample = time.perf_counter() - start
+
+# Essais de meme longueur empiles en un tenseur (essais x frames x canaux)
+same_length = np.stack([trial[:150] for trial in trials])
+start = time.perf_counter()
+data_tensor = resample(same_length, n_points)
+time_tensor = time.perf_counter() - start
+
+print(f"{n_trials} essais, {n_channels} canaux, {n_points} points")
+print(f"DataFrame.apply : {time_apply:.3f} s")
+print(f"resample par essai : {time_resample:.4f} s (x{time_apply / time_resample:.0f})")
+print(f"resample tenseur de meme longueur : {time_tensor:.4f} s")
+print(f"Ecart maximal : {max(np.max(np.abs(a - b)) for a, b in zip(data_apply, data_resample))}")
+assert all(np.allclose(a, b) for a, b in zip(data_apply, data_resample))
+
+# Mode NaN et arrondi de safe_interpolate
+gaze = (rng.random((300, 1)) > 0.5).astype(float)
+gaze[50:80] = np.nan
+reference = pd.DataFrame(gaze).apply(
+    lambda x: np.round(np.interp(
+        np.linspace(0, 1, n_points), np.linspace(0, 1, len(x))[np.isfinite(x)], x[np.isfinite(x)]
+    )).astype(int)
+).to_numpy()
+assert np.array_equal(safe_interpolate(gaze, n_points), reference)
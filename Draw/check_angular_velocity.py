@@ -0,0 +1,51 @@
+import time
+import numpy as np
+import biorbd
+from scipy.spatial.transform import Rotation as R
+from TrampolineAcrobaticVariability.Function.Function_angular_velocity import (
+    euler_rates_to_omega,
+    angular_velocity_from_rotations,
+)
+
+rng = np.random.default_rng(0)
+n_trials, n_frames = 20, 100
+euler_angles = rng.uniform(-np.pi, np.pi, (n_trials, n_frames, 3))
+euler_rates = rng.normal(0, 5, (n_trials, n_frames, 3))
+
+# Ancienne methode : un biorbd.Quaternion et un eulerDotToOmega par frame
+start = time.perf_counter()
+omega_biorbd = np.zeros((n_trials, n_frames, 3))
+for i_trial in range(n_trials):
+    for i in range(n_frames):
+        quaternion = biorbd.Quaternion()
+        omega_biorbd[i_trial, i] = quaternion.eulerDotToOmega(
+            euler_rates[i_trial, i], euler_angles[i_trial, i], seq="xyz"
+        ).to_array()
+duration_biorbd = time.perf_counter() - start
+
+start = time.perf_counter()
+omega = euler_rates_to_omega(euler_angles, euler_rates, "xyz")
+duration = time.perf_counter() - start
+
+assert np.allclose(omega, omega_biorbd, atol=1e-10)
+print(f"eulerDotToOmega: {duration_biorbd * 1000:.1f} ms, euler_rates_to_omega: {duration * 1000:.2f} ms")
+
+# Vitesse angulaire a partir des matrices de rotation, comparee a la boucle np.linalg.inv + scipy Rotation
+delta_t = 1 / 60
+rotation_matrices = R.from_rotvec(np.cumsum(rng.normal(0, 0.1, (1000, 3)), axis=0)).as_matrix()
+
+start = time.perf_counter()
+angular_velocities_loop = np.array(
+    [
+        R.from_matrix(rotation_matrices[i] @ np.linalg.inv(rotation_matrices[i - 1])).as_rotvec() / delta_t
+        for i in range(1, len(rotation_matrices))
+    ]
+)
+duration_loop = time.perf_counter() - start
+
+start = time.perf_counter()
+angular_velocities = angular_velocity_from_rotations(rotation_matrices, delta_t)
+duration = time.perf_counter() - start
+
+assert np.allclose(angular_velocities, angular_velocities_loop, atol=1e-10)
+print(f"frame by frame: {duration_loop * 1000:.1f} ms, angular_velocity_from_rotations: {duration * 1000:.2f} ms")
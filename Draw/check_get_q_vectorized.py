@@ -0,0 +1,26 @@
+import pickle
+import time
+import numpy as np
+from TrampolineAcrobaticVariability.Function.Function_Class_Basics import get_q, get_q_biorbd
+
+chemin_fichier_pkl = "/home/lim/disk/Eye-tracking/Results/AnBe/42/55d81c96_0_0-49_552__42__0__eyetracking_metrics.pkl"
+
+with open(chemin_fichier_pkl, "rb") as fichier_pkl:
+    eye_tracking_metrics = pickle.load(fichier_pkl)
+
+Xsens_orientation_per_move = eye_tracking_metrics["Xsens_orientation_per_move"]
+
+start = time.perf_counter()
+q_biorbd = get_q_biorbd(Xsens_orientation_per_move)
+time_biorbd = time.perf_counter() - start
+
+start = time.perf_counter()
+q = get_q(Xsens_orientation_per_move)
+time_vectorized = time.perf_counter() - start
+
+# Les angles sont compares modulo 2 pi
+difference = np.angle(np.exp(1j * (q - q_biorbd)))
+print(f"Nombre de frames : {Xsens_orientation_per_move.shape[0]}")
+print(f"Ecart maximal : {np.max(np.abs(difference))} rad")
+print(f"biorbd : {time_biorbd:.3f} s, vectorise : {time_vectorized:.4f} s")
+assert np.allclose(difference, 0, atol=1e-8), "get_q ne correspond pas a get_q_biorbd"
@@ -0,0 +1,77 @@
+import time
+import numpy as np
+import biorbd
+from TrampolineAcrobaticVariability.Function.Function_build_model import convert_marker_to_local_frame
+from TrampolineAcrobaticVariability.Function.Function_Class_Basics import find_index
+from TrampolineAcrobaticVariability.Function.Function_rotation import euler_to_rotation_matrix
+from TrampolineAcrobaticVariability.Function.Function_kinematics import ModelKinematics, joint_centers_in_pelvis_frame
+
+home_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
+participant_name = "Sarah"
+model_path = f"{home_path}{participant_name}/New{participant_name}Model.s2mMod"
+
+
+def markers_per_frame(model, Q):
+    # Ancienne methode : un appel a model.markers par frame
+    n_markers = model.nbMarkers()
+    markers_JC = np.ndarray((3, n_markers, Q.shape[1]))
+    for i in range(Q.shape[1]):
+        newQ = biorbd.GeneralizedCoordinates(Q[:, i])
+        markers_reconstructed = model.markers(newQ)
+        for m, marker_recons in enumerate(markers_reconstructed):
+            markers_JC[:, m, i] = marker_recons.to_array()
+    return markers_JC
+
+
+def joint_centers_per_frame(markers_JC, movement_matrix, Q_complet, desired_order):
+    # Ancienne methode : find_index et convert_marker_to_local_frame pour chaque marqueur de chaque frame
+    n_markers, nb_frames = markers_JC.shape[1], markers_JC.shape[2]
+    Jc_in_pelvis_frame = np.ndarray((3, n_markers, nb_frames))
+    for i in range(nb_frames):
+        mid_hip_pos = (markers_JC[:, find_index("JC_CuisseD", desired_order), i] + markers_JC[:, find_index("JC_CuisseG", desired_order), i]) / 2
+        for idx, jcname in enumerate(desired_order):
+            if idx == find_index("JC_pelvis", desired_order):
+                Jc_in_pelvis_frame[:, idx, i] = Q_complet[3:6, i]
+            else:
+                P2_prime = convert_marker_to_local_frame(mid_hip_pos, movement_matrix[find_index("JC_pelvis", desired_order), i, :, :], markers_JC[:, idx, i])
+                Jc_in_pelvis_frame[:, idx, i] = P2_prime
+    return Jc_in_pelvis_frame
+
+
+model = biorbd.Model(model_path)
+model_kinematics = ModelKinematics(model)
+desired_order = model_kinematics.marker_names
+print(f"{model_path} : {model.nbQ()} ddl, {model.nbSegment()} segments, {model.nbMarkers()} marqueurs")
+assert model_kinematics.nb_q == model.nbQ()
+
+n_frames = 1000
+rng = np.random.default_rng(0)
+Q = rng.uniform(-np.pi, np.pi, (model.nbQ(), n_frames))
+# Matrices de rotation quelconques, indexees comme movement_matrix par l'indice du marqueur JC_pelvis
+movement_matrix = euler_to_rotation_matrix(
+    rng.uniform(-np.pi, np.pi, (len(desired_order) * n_frames, 3)), "xyz"
+).reshape(len(desired_order), n_frames, 3, 3)
+
+start = time.perf_counter()
+markers_reference = markers_per_frame(model, Q)
+time_loop = time.perf_counter() - start
+
+start = time.perf_counter()
+markers_JC = model_kinematics.markers(Q)
+time_kinematics = time.perf_counter() - start
+
+print(f"Marqueurs : model.markers par frame {time_loop:.3f} s, ModelKinematics {time_kinematics:.3f} s")
+print(f"Ecart maximal : {np.max(np.abs(markers_JC - markers_reference))}")
+assert np.allclose(markers_JC, markers_reference, rtol=0, atol=1e-10)
+
+start = time.perf_counter()
+Jc_reference = joint_centers_per_frame(markers_reference, movement_matrix, Q, desired_order)
+time_loop = time.perf_counter() - start
+
+start = time.perf_counter()
+Jc_in_pelvis_frame = joint_centers_in_pelvis_frame(markers_reference, movement_matrix, Q, desired_order)
+time_kinematics = time.perf_counter() - start
+
+print(f"Repere du pelvis : boucle {time_loop:.3f} s, joint_centers_in_pelvis_frame {time_kinematics:.3f} s")
+print(f"Ecart maximal : {np.max(np.abs(Jc_in_pelvis_frame - Jc_reference))}")
+assert np.allclose(Jc_in_pelvis_frame, Jc_reference, rtol=0, atol=1e-10)
@@ -0,0 +1,69 @@
+import time
+import numpy as np
+from TrampolineAcrobaticVariability.Function.Function_build_model import (
+    build_segment_frames,
+    predictive_hip_joint_center_location,
+    get_orientation_hip,
+    get_orientation_knee_right,
+    get_orientation_knee_left,
+    get_orientation_ankle,
+    get_orientation_thorax,
+    get_orientation_head,
+    get_orientation_shoulder,
+    get_orientation_elbow,
+    get_orientation_wrist,
+)
+
+
+def get_all_frames_per_function(pos_marker, marker_names, is_y_up):
+    # Ancienne methode : une fonction get_orientation_* par segment
+    hjc_right, hjc_left, pelvic_origin, rot_pelvis = predictive_hip_joint_center_location(pos_marker, marker_names)
+    rot_thorax, manu = get_orientation_thorax(pos_marker, marker_names, is_y_up)
+    rot_head, jc_head = get_orientation_head(pos_marker, marker_names, is_y_up)
+    rot_shoulder_right, mid_acr_right = get_orientation_shoulder(pos_marker, marker_names, True, is_y_up)
+    rot_elbow_right, mid_epi_right = get_orientation_elbow(pos_marker, marker_names, True, is_y_up)
+    rot_wrist_right, mid_ul_rad_right = get_orientation_wrist(pos_marker, marker_names, True, is_y_up)
+    rot_shoulder_left, mid_acr_left = get_orientation_shoulder(pos_marker, marker_names, False, is_y_up)
+    rot_elbow_left, mid_epi_left = get_orientation_elbow(pos_marker, marker_names, False, is_y_up)
+    rot_wrist_left, mid_ul_rad_left = get_orientation_wrist(pos_marker, marker_names, False, is_y_up)
+    rot_hip_right = get_orientation_hip(pos_marker, marker_names, hjc_right, True, is_y_up)
+    rot_knee_right, mid_cond_right = get_orientation_knee_right(pos_marker, marker_names, is_y_up)
+    rot_ankle_right, mid_mal_right = get_orientation_ankle(pos_marker, marker_names, True, is_y_up)
+    rot_hip_left = get_orientation_hip(pos_marker, marker_names, hjc_left, False, is_y_up)
+    rot_knee_left, mid_cond_left = get_orientation_knee_left(pos_marker, marker_names, is_y_up)
+    rot_ankle_left, mid_mal_left = get_orientation_ankle(pos_marker, marker_names, False, is_y_up)
+
+    rot_mat = np.stack([
+        rot_pelvis, rot_thorax, rot_head, rot_shoulder_right, rot_elbow_right, rot_wrist_right, rot_shoulder_left,
+        rot_elbow_left, rot_wrist_left, rot_hip_right, rot_knee_right, rot_ankle_right, rot_hip_left, rot_knee_left,
+        rot_ankle_left,
+    ])
+    joint_center = np.stack([
+        pelvic_origin, manu, jc_head, mid_acr_right, mid_epi_right, mid_ul_rad_right, mid_acr_left, mid_epi_left,
+        mid_ul_rad_left, hjc_right, mid_cond_right, mid_mal_right, hjc_left, mid_cond_left, mid_mal_left,
+    ])
+    return rot_mat, joint_center
+
+
+marker_names = [
+    "EIASD", "EIASG", "EIPSD", "EIPSG", "MANU", "C7", "XIPHOIDE", "D10", "GLABELLE", "TEMPD", "TEMPG", "ZYGD",
+    "ZYGG", "ACRANTD", "ACRPOSTD", "EPICOND", "EPITROD", "ULNAD", "RADIUSD", "MIDMETAC3D", "ACRANTG", "ACRPOSTG",
+    "EPICONG", "EPITROG", "ULNAG", "RADIUSG", "MIDMETAC3G", "CONDINTD", "CONDEXTD", "MALINTD", "MALEXTD", "CALCD",
+    "METAT1D", "METAT5D", "CONDINTG", "CONEXTG", "MALINTG", "MALEXTG", "CALCG", "METAT1G", "METAT5G",
+]
+n_frames = 2000
+pos_marker = np.random.default_rng(0).standard_normal((3, len(marker_names), n_frames))
+
+for is_y_up in (False, True):
+    start = time.perf_counter()
+    rot_mat_reference, joint_center_reference = get_all_frames_per_function(pos_marker, marker_names, is_y_up)
+    time_functions = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rot_mat, joint_center = build_segment_frames(pos_marker, marker_names, is_y_up)
+    time_engine = time.perf_counter() - start
+
+    print(f"is_y_up={is_y_up} : fonctions {time_functions:.3f} s, build_segment_frames {time_engine:.3f} s")
+    print(f"Ecart maximal : {np.max(np.abs(rot_mat - rot_mat_reference))}, "
+          f"{np.max(np.abs(joint_center - joint_center_reference))}")
+    assert np.array_equal(rot_mat, rot_mat_reference) and np.array_equal(joint_center, joint_center_reference)
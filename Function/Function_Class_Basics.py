@@ -3,65 +3,116 @@ import pandas as pd
 import numpy as np
 import biorbd
 from .Function_draw import column_names
+from .Function_rotation import (
+    quaternion_to_rotation_matrix,
+    rotation_matrix_z,
+    relative_rotation,
+    rotation_matrix_to_euler,
+)
+from .Function_resample import resample
 from scipy.integrate import simpson
-from scipy.interpolate import interp1d
 
 
 class OrderMatData:
-    def __init__(self, dataframe):
-        self.dataframe = dataframe
+    def __init__(self, dataframe, names=None):
+        # Les donnees sont gardees dans un tableau numpy contigu (temps x colonnes) ou (essais x temps x colonnes)
+        if isinstance(dataframe, pd.DataFrame):
+            names = dataframe.columns.tolist()
+            dataframe = dataframe.to_numpy(dtype=float)
+        self.data = np.ascontiguousarray(dataframe, dtype=float)
+        self.column_names = list(names)
         # Mapping des indices aux suffixes attendus
         self.index_suffix_map = {0: "X", 1: "Y", 2: "Z"}
 
+        # Index nom de colonne -> position et (segment, axe) -> position, construits une seule fois
+        self.column_index = {name: i for i, name in enumerate(self.column_names)}
+        self.segment_axis_index = {}
+        for i, name in enumerate(self.column_names):
+            segment, _, suffix = name.rpartition("_")
+            self.segment_axis_index.setdefault((" ".join(segment.split()), suffix), i)
+        self._prefix_cache = {}
+        self._column_cache = {}
+
+    @classmethod
+    def stack(cls, data_instances):
+        """
+        Stack instances with the same columns and number of frames into a single (trials x time x columns) instance.
+        """
+        names = data_instances[0].column_names
+        for instance in data_instances:
+            if instance.column_names != names:
+                raise ValueError("All the instances must have the same columns to be stacked.")
+        return cls(np.stack([instance.data for instance in data_instances]), names)
+
+    @property
+    def dataframe(self):
+        if self.data.ndim != 2:
+            raise ValueError("Only an instance of a single trial can be converted to a DataFrame.")
+        return pd.DataFrame(self.data, columns=self.column_names, copy=False)
+
+    def _prefix_positions(self, prefix):
+        if prefix not in self._prefix_cache:
+            self._prefix_cache[prefix] = [
+                i for i, name in enumerate(self.column_names) if name.startswith(prefix)
+            ]
+        return self._prefix_cache[prefix]
+
     def __getitem__(self, key):
         if isinstance(key, list):
-            # Initialiser une liste pour stocker tous les noms de colonnes correspondants
-            matching_columns = []
+            # Initialiser une liste pour stocker toutes les positions des colonnes correspondantes
+            positions = []
             for prefix in key:
-                matching_columns += [
-                    col for col in self.dataframe.columns if col.startswith(prefix)
-                ]
-            if not matching_columns:
+                positions += self._prefix_positions(prefix)
+            if not positions:
                 raise KeyError(f"Variables {key} not found.")
         else:
             # Traiter key comme une chaîne de caractères unique
-            matching_columns = [
-                col for col in self.dataframe.columns if col.startswith(key)
-            ]
-            if not matching_columns:
+            positions = self._prefix_positions(key)
+            if not positions:
                 raise KeyError(f"Variable {key} not found.")
 
-        return self.dataframe[matching_columns]
+        # Des colonnes consecutives sont retournees sans copie
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            values = self.data[..., positions[0]: positions[-1] + 1]
+        else:
+            values = self.data[..., positions]
+        if values.ndim == 2:
+            return pd.DataFrame(values, columns=[self.column_names[i] for i in positions], copy=False)
+        return values
 
     def get_column_names(self):
-        return self.dataframe.columns.tolist()
+        return self.column_names
 
-    def get_column_by_index(self, key, index):
+    def get_column_position(self, key, index):
         # Vérifie si l'index est valide
         if index not in self.index_suffix_map:
             raise KeyError(f"Invalid index {index}.")
 
-        # Nettoie la clé en supprimant les espaces de début et de fin, et les espaces multiples
-        cleaned_key = " ".join(key.strip().split())
-
-        expected_suffix = self.index_suffix_map[index]
-        column_name = f"{cleaned_key}_{expected_suffix}"
-
-        if column_name not in self.dataframe.columns:
-            # Essayez de gérer les espaces supplémentaires dans les noms de colonnes du DataFrame
-            matching_columns = [col for col in self.dataframe.columns if
-                                col.replace(" ", "").startswith(cleaned_key.replace(" ", "")) and col.endswith(
-                                    expected_suffix)]
-            if matching_columns:
+        if (key, index) not in self._column_cache:
+            # Nettoie la clé en supprimant les espaces de début et de fin, et les espaces multiples
+            cleaned_key = " ".join(key.strip().split())
+            expected_suffix = self.index_suffix_map[index]
+            position = self.segment_axis_index.get((cleaned_key, expected_suffix))
+
+            if position is None:
+                # Essayez de gérer les espaces supplémentaires dans les noms de colonnes
+                matching_positions = [i for i, col in enumerate(self.column_names) if
+                                      col.replace(" ", "").startswith(cleaned_key.replace(" ", "")) and col.endswith(
+                                          expected_suffix)]
+                if not matching_positions:
+                    raise KeyError(f"Column {cleaned_key}_{expected_suffix} does not exist.")
                 # Si des colonnes correspondantes sont trouvées, utilisez la première correspondance
-                return self.dataframe[matching_columns[0]]
-            else:
-                raise KeyError(f"Column {column_name} does not exist.")
+                position = matching_positions[0]
+            self._column_cache[(key, index)] = position
 
-        return self.dataframe[column_name]
+        return self._column_cache[(key, index)]
+
+    def get_column_by_index(self, key, index):
+        # Vue sans copie sur la colonne (temps,) ou (essais x temps) pour une instance empilee
+        return self.data[..., self.get_column_position(key, index)]
 
     def to_numpy_array(self):
-        return self.dataframe.to_numpy()
+        return self.data
 
 
 def load_and_interpolate(file, interval, num_points=100):
@@ -86,36 +137,30 @@ def load_and_interpolate(file, interval, num_points=100):
     # df.columns = column_names
     Euler_Sequence = data["Euler_Sequence"]
 
-    column_names = []
+    names = []
     for segment, sequence in Euler_Sequence:
         segment = segment.strip()
         for axis in sequence.strip():
-            column_names.append(f"{segment}_{axis.upper()}")
+            names.append(f"{segment}_{axis.upper()}")
 
     # Select data in specify interval
     df_selected = df.iloc[interval[0] : interval[1]]
 
-    # Interpolate each column to have a uniform number of points
-    df_interpolated = df_selected.apply(
-        lambda x: np.interp(np.linspace(0, 1, num_points), np.linspace(0, 1, len(x)), x)
-    )
-
-    df_interpolated.columns = column_names
-    my_data = OrderMatData(df_interpolated)
+    # Interpolate all the columns at once to have a uniform number of points
+    my_data = OrderMatData(resample(df_selected.to_numpy(), num_points), names)
     return my_data
 
 
-def load_and_interpolate_for_point(file_path, num_points=100, include_expertise_laterality_length=False):
-    data_loaded = scipy.io.loadmat(file_path)
+def load_and_interpolate_for_point(file_path, num_points=100, include_expertise_laterality_length=False, store=None):
+    # Avec un TrialStore, file_path est l'indice de l'essai retourne par store.trials
+    data_loaded = store.load(file_path) if store is not None else scipy.io.loadmat(file_path)
     JC = data_loaded["Jc_in_pelvis_frame"]
     Order_JC = data_loaded["JC_order"]
 
-    Xsens_position = pd.DataFrame((JC.transpose(1, 0, 2).reshape(-1, JC.shape[2])).T)
+    Xsens_position = (JC.transpose(1, 0, 2).reshape(-1, JC.shape[2])).T
     duration = len(Xsens_position)/60
 
-    Xsens_position = Xsens_position.apply(
-        lambda x: np.interp(np.linspace(0, 1, num_points), np.linspace(0, 1, len(x)), x)
-    )
+    Xsens_position = resample(Xsens_position, num_points)
 
     complete_order = []
     for joint_center in Order_JC:
@@ -139,16 +184,27 @@ def load_and_interpolate_for_point(file_path, num_points=100, include_expertise_
 
 def calculate_mean_std(data_instances, member, axis):
     """
-    Calculates the mean and std for a given member and an axes on all data instances
+    Calculates the mean and std for a given member and an axes on all data instances.
+    data_instances is either a list of OrderMatData or an instance stacked with OrderMatData.stack.
     """
-    data_arrays = [
-        instance.get_column_by_index(member, axis) for instance in data_instances
-    ]
+    if isinstance(data_instances, OrderMatData):
+        data_arrays = data_instances.get_column_by_index(member, axis)
+    else:
+        data_arrays = np.stack([instance.get_column_by_index(member, axis) for instance in data_instances])
     Mean_Data = np.mean(data_arrays, axis=0)
     Std_Dev_Data = np.std(data_arrays, axis=0)
     return Mean_Data, Std_Dev_Data
 
 
+def calculate_mean_std_all(data_instances):
+    """
+    Mean and std over the trials of every column at once, each of shape (time x columns).
+    """
+    if not isinstance(data_instances, OrderMatData):
+        data_instances = OrderMatData.stack(data_instances)
+    return np.mean(data_instances.data, axis=0), np.std(data_instances.data, axis=0)
+
+
 def calcul_stats(data):
     # Convertir en array 3D pour faciliter les calculs (participants, essais, temps)
     data_array = np.array(data)
@@ -158,39 +214,70 @@ def calcul_stats(data):
     return moyenne, ecart_type
 
 
+parent_list_xsens_full = {
+    "Pelvis": None,  # 0
+    "L5": [0, "Pelvis"],  # 1
+    "L3": [1, "L5"],  # 2
+    "T12": [2, "L3"],  # 3
+    "T8": [3, "T12"],  # 4
+    "Neck": [4, "T8"],  # 5
+    "Head": [5, "Neck"],  # 6
+    "ShoulderR": [4, "T8"],  # 7
+    "UpperArmR": [7, "ShoulderR"],  # 8
+    "LowerArmR": [8, "UpperArmR"],  # 9
+    "HandR": [9, "LowerArmR"],  # 10
+    "ShoulderL": [4, "T8"],  # 11
+    "UpperArmL": [11, "ShoulderR"],  # 12
+    "LowerArmL": [12, "UpperArmR"],  # 13
+    "HandL": [13, "LowerArmR"],  # 14
+    "UpperLegR": [0, "Pelvis"],  # 15
+    "LowerLegR": [15, "UpperLegR"],  # 16
+    "FootR": [16, "LowerLegR"],  # 17
+    "ToesR": [17, "FootR"],  # 18
+    "UpperLegL": [0, "Pelvis"],  # 19
+    "LowerLegL": [19, "UpperLegL"],  # 20
+    "FootL": [20, "LowerLegL"],  # 21
+    "ToesL": [21, "FootL"],  # 22
+}
+
+
 def get_q(Xsens_orientation_per_move):
     """
     This function returns de generalized coordinates in the sequence XYZ (biorbd) from the quaternion of the orientation
     of the Xsens segments.
     The translation is left empty as it has to be computed otherwise.
     I am not sure if I would use this for kinematics analysis, but for visualisation it is not that bad.
+    All the frames and segments are converted at once, get_q_biorbd is the per-frame reference implementation.
+    """
+    nb_segments = len(parent_list_xsens_full)
+    nb_frames = Xsens_orientation_per_move.shape[0]
+    quaternions = Xsens_orientation_per_move[:, : nb_segments * 4].reshape(nb_frames, nb_segments, 4)
+
+    # (nb_segments, nb_frames, 3, 3)
+    rotation_matrices = rotation_matrix_z(-np.pi / 2) @ quaternion_to_rotation_matrix(quaternions.transpose(1, 0, 2))
+
+    parent_matrices = np.empty_like(rotation_matrices)
+    for i_segment, parent_info in enumerate(parent_list_xsens_full.values()):
+        if parent_info is None:
+            parent_matrices[i_segment] = np.eye(3)
+        else:
+            parent_matrices[i_segment] = rotation_matrices[parent_info[0]]
+
+    RotMat_between = relative_rotation(parent_matrices, rotation_matrices)
+    Q = rotation_matrix_to_euler(RotMat_between, "xyz")
+    return Q.transpose(0, 2, 1).reshape(nb_segments * 3, nb_frames)
+
+
+def get_q_biorbd(Xsens_orientation_per_move):
+    """
+    This function returns de generalized coordinates in the sequence XYZ (biorbd) from the quaternion of the orientation
+    of the Xsens segments.
+    The translation is left empty as it has to be computed otherwise.
+    I am not sure if I would use this for kinematics analysis, but for visualisation it is not that bad.
+    Frame by frame version with biorbd, kept to check the results of get_q.
     """
 
-    parent_idx_list = {
-        "Pelvis": None,  # 0
-        "L5": [0, "Pelvis"],  # 1
-        "L3": [1, "L5"],  # 2
-        "T12": [2, "L3"],  # 3
-        "T8": [3, "T12"],  # 4
-        "Neck": [4, "T8"],  # 5
-        "Head": [5, "Neck"],  # 6
-        "ShoulderR": [4, "T8"],  # 7
-        "UpperArmR": [7, "ShoulderR"],  # 8
-        "LowerArmR": [8, "UpperArmR"],  # 9
-        "HandR": [9, "LowerArmR"],  # 10
-        "ShoulderL": [4, "T8"],  # 11
-        "UpperArmL": [11, "ShoulderR"],  # 12
-        "LowerArmL": [12, "UpperArmR"],  # 13
-        "HandL": [13, "LowerArmR"],  # 14
-        "UpperLegR": [0, "Pelvis"],  # 15
-        "LowerLegR": [15, "UpperLegR"],  # 16
-        "FootR": [16, "LowerLegR"],  # 17
-        "ToesR": [17, "FootR"],  # 18
-        "UpperLegL": [0, "Pelvis"],  # 19
-        "LowerLegL": [19, "UpperLegL"],  # 20
-        "FootL": [20, "LowerLegL"],  # 21
-        "ToesL": [21, "FootL"],  # 22
-    }
+    parent_idx_list = parent_list_xsens_full
 
     nb_frames = Xsens_orientation_per_move.shape[0]
     Q = np.zeros((23 * 3, nb_frames))
@@ -240,15 +327,7 @@ def get_q(Xsens_orientation_per_move):
     return Q
 
 
-def recons_kalman(n_frames, num_markers, markers_xsens, model, initial_guess):
-    markersOverFrames = []
-    for i in range(n_frames):
-        node_segment = []
-        for j in range(num_markers):
-            node_segment.append(biorbd.NodeSegment(markers_xsens[:, j, i].T))
-        markersOverFrames.append(node_segment)
-
-    freq = 200
+def recons_kalman(n_frames, num_markers, markers_xsens, model, initial_guess, freq=200):
     params = biorbd.KalmanParam(freq)
     kalman = biorbd.KalmanReconsMarkers(model, params)
     kalman.setInitState(initial_guess[0], initial_guess[1], initial_guess[2])
@@ -256,9 +335,11 @@ def recons_kalman(n_frames, num_markers, markers_xsens, model, initial_guess):
     Q = biorbd.GeneralizedCoordinates(model)
     Qdot = biorbd.GeneralizedVelocity(model)
     Qddot = biorbd.GeneralizedAcceleration(model)
-    q_recons = np.ndarray((model.nbQ(), len(markersOverFrames)))
-    qdot_recons = np.ndarray((model.nbQ(), len(markersOverFrames)))
-    for i, targetMarkers in enumerate(markersOverFrames):
+    q_recons = np.ndarray((model.nbQ(), n_frames))
+    qdot_recons = np.ndarray((model.nbQ(), n_frames))
+    for i in range(n_frames):
+        # Les NodeSegment sont construits frame par frame plutot que pour tout l'essai
+        targetMarkers = [biorbd.NodeSegment(markers_xsens[:, j, i].T) for j in range(num_markers)]
         kalman.reconstructFrame(model, targetMarkers, Q, Qdot, Qddot)
         q_recons[:, i] = Q.to_array()
         qdot_recons[:, i] = Qdot.to_array()
@@ -278,18 +359,10 @@ def calculate_rmsd(markers, pos_recons):
         markers.shape == pos_recons.shape
     ), "Les tableaux doivent avoir la même forme."
 
-    n_frames = markers.shape[2]
-    rmsd_per_frame = np.zeros(n_frames)
-
-    for i in range(n_frames):
-        # Calculer la différence entre les ensembles de marqueurs pour le cadre i
-        diff = markers[:, :, i] - pos_recons[:, :, i]
-        # Calculer la norme au carré de la différence pour chaque marqueur
-        squared_diff = np.nansum(diff**2, axis=0)
-        # Calculer la moyenne des différences au carré
-        mean_squared_diff = np.mean(squared_diff)
-        # Calculer la racine carrée de la moyenne des différences au carré pour obtenir la RMSD
-        rmsd_per_frame[i] = np.sqrt(mean_squared_diff)
+    # Norme au carré de la différence pour chaque marqueur et chaque frame (un marqueur manquant compte pour 0)
+    squared_diff = np.nansum((markers - pos_recons) ** 2, axis=0)
+    # Racine carrée de la moyenne sur les marqueurs pour obtenir la RMSD de chaque frame
+    rmsd_per_frame = np.sqrt(np.mean(squared_diff, axis=0))
 
     return rmsd_per_frame
 
@@ -380,16 +453,8 @@ def calculate_scores(fd, fpca_components, dx):
 
 
 def normaliser_essai(essai, nombre_points=100):
-    # Créer un vecteur linéaire de points basé sur la longueur originale de l'essai
-    x_original = np.linspace(0, 1, num=len(essai))
-    # Créer un vecteur linéaire de points pour la longueur cible
-    x_nouveau = np.linspace(0, 1, num=nombre_points)
-
-    # Interpolation linéaire
-    fonction_interpolation = interp1d(x_original, essai, kind='linear')
-    essai_normalise = fonction_interpolation(x_nouveau)
-
-    return essai_normalise
+    # Interpolation linéaire sur le dernier axe, comme interp1d
+    return resample(essai, nombre_points, axis=-1)
 
 
 def check_matrix_orthogonality(matrix, i_segment="segment", matrix_name="Matrix"):
@@ -0,0 +1,108 @@
+import numpy as np
+from .Function_rotation import euler_to_rotation_matrix
+
+
+def euler_rate_matrix(angles, sequence="xyz"):
+    """
+    Matrix giving the angular velocity in the global frame from the Euler rates, for stacked angles.
+    For R = R_a0(q0) @ R_a1(q1) @ R_a2(q2), its columns are e_a0, R_a0 @ e_a1 and R_a0 @ R_a1 @ e_a2. In xyz it is
+    the matrix of biorbd.Quaternion.eulerDotToOmega:
+    [[1, 0, sin(q1)], [0, cos(q0), -sin(q0) cos(q1)], [0, sin(q0), cos(q0) cos(q1)]].
+
+    Args:
+        angles (np.ndarray): Euler angles of shape (..., 3).
+        sequence (str): Euler sequence of 3 axes, e.g. "xyz".
+
+    Returns:
+        np.ndarray: Matrices of shape (..., 3, 3).
+    """
+    angles = np.asarray(angles, dtype=float)
+    if len(sequence) != 3:
+        raise NotImplementedError(f"The Euler sequence {sequence} is not implemented yet, please try a 3 axes sequence")
+
+    base = np.empty(angles.shape[:-1] + (3, 3))
+    for i_axis, axis in enumerate(sequence):
+        # Axe de la rotation i exprime dans le repere global : rotations precedentes appliquees au vecteur unitaire
+        previous_rotations = euler_to_rotation_matrix(angles[..., :i_axis], sequence[:i_axis])
+        base[..., :, i_axis] = previous_rotations[..., :, "xyz".index(axis)]
+    return base
+
+
+def euler_rates_to_omega(angles, euler_rates, sequence="xyz", in_body_frame=False):
+    """
+    Angular velocity from Euler angles and Euler rates for whole trials at once, same as
+    biorbd.Quaternion.eulerDotToOmega applied frame by frame.
+
+    Args:
+        angles (np.ndarray): Euler angles of shape (..., 3), e.g. (n_trials, n_frames, 3).
+        euler_rates (np.ndarray): Time derivatives of the Euler angles, same shape.
+        sequence (str): Euler sequence of 3 axes.
+        in_body_frame (bool): If True, the angular velocity is expressed in the frame of the segment (R.T @ omega).
+
+    Returns:
+        np.ndarray: Angular velocities of shape (..., 3). Their norm is np.linalg.norm(omega, axis=-1).
+    """
+    angles = np.asarray(angles, dtype=float)
+    omega = np.einsum("...ij,...j->...i", euler_rate_matrix(angles, sequence), np.asarray(euler_rates, dtype=float))
+    if in_body_frame:
+        omega = np.einsum("...ji,...j->...i", euler_to_rotation_matrix(angles, sequence), omega)
+    return omega
+
+
+def rotation_matrix_to_rotvec(rotation_matrices):
+    """
+    Rotation vectors (axis * angle, angle in [0, pi]) of stacked rotation matrices (..., 3, 3), same result as
+    scipy.spatial.transform.Rotation.from_matrix(...).as_rotvec(). The quaternion is taken from the largest of its
+    components so the result stays accurate near 0 and pi.
+    """
+    r = np.asarray(rotation_matrices, dtype=float)
+    trace = r[..., 0, 0] + r[..., 1, 1] + r[..., 2, 2]
+    decision = np.stack((r[..., 0, 0], r[..., 1, 1], r[..., 2, 2], trace), axis=-1)
+    choice = np.argmax(decision, axis=-1)
+
+    quaternions = np.empty(r.shape[:-2] + (4,))
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        mask = choice == i
+        quaternions[mask, i] = 1 - decision[mask, 3] + 2 * r[mask, i, i]
+        quaternions[mask, j] = r[mask, j, i] + r[mask, i, j]
+        quaternions[mask, k] = r[mask, k, i] + r[mask, i, k]
+        quaternions[mask, 3] = r[mask, k, j] - r[mask, j, k]
+    mask = choice == 3
+    quaternions[mask, 0] = r[mask, 2, 1] - r[mask, 1, 2]
+    quaternions[mask, 1] = r[mask, 0, 2] - r[mask, 2, 0]
+    quaternions[mask, 2] = r[mask, 1, 0] - r[mask, 0, 1]
+    quaternions[mask, 3] = 1 + decision[mask, 3]
+
+    # Quaternion (x, y, z, w) avec w >= 0 pour obtenir un angle dans [0, pi]
+    quaternions /= np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    quaternions[quaternions[..., 3] < 0] *= -1
+    vector_norm = np.linalg.norm(quaternions[..., :3], axis=-1)
+    angle = 2 * np.arctan2(vector_norm, quaternions[..., 3])
+
+    # Pres de 0, angle / sin(angle / 2) est remplace par son developpement limite
+    small_angle = angle <= 1e-3
+    angle_squared = angle * angle
+    scale = np.where(
+        small_angle,
+        2 + angle_squared / 12 + 7 * angle_squared * angle_squared / 2880,
+        angle / np.sin(np.where(small_angle, 1, angle / 2)),
+    )
+    return scale[..., np.newaxis] * quaternions[..., :3]
+
+
+def angular_velocity_from_rotations(rotation_matrices, delta_t):
+    """
+    Angular velocity in the global frame between consecutive frames, from the rotation R_i @ R_(i-1).T.
+    Batched replacement of the frame by frame loop with np.linalg.inv and scipy Rotation.
+
+    Args:
+        rotation_matrices (np.ndarray): Rotation matrices of shape (..., n_frames, 3, 3).
+        delta_t (float): Time between two frames in s.
+
+    Returns:
+        np.ndarray: Angular velocities in rad/s of shape (..., n_frames - 1, 3).
+    """
+    rotation_matrices = np.asarray(rotation_matrices, dtype=float)
+    delta_rotation = rotation_matrices[..., 1:, :, :] @ np.swapaxes(rotation_matrices[..., :-1, :, :], -1, -2)
+    return rotation_matrix_to_rotvec(delta_rotation) / delta_t
@@ -2,22 +2,23 @@ import os
 import numpy as np
 import biorbd
 import ezc3d
-from .Function_Class_Basics import find_index, normalise_vecteurs, calculate_rmsd, check_matrix_orthogonality
+from functools import lru_cache
+from .Function_Class_Basics import (
+    find_index,
+    normalise_vecteurs,
+    check_matrix_orthogonality,
+    recons_kalman,
+    parent_list_marker,
+)
+from .Function_cache import kalman_cache_key, hash_inputs
+from .Function_kinematics import check_rotation_matrices
+from .Function_quality import quality_by_frame, reconstruction_quality, save_quality_record, load_quality_record
 from scipy.linalg import svd
 
 
 def recons_kalman_with_marker(
-    n_frames, num_markers, markers_xsens, model, initial_guess
+    n_frames, num_markers, markers_xsens, model, initial_guess, freq=200
 ):
-    # Préparation comme avant
-    markersOverFrames = []
-    for i in range(n_frames):
-        node_segment = []
-        for j in range(num_markers):
-            node_segment.append(biorbd.NodeSegment(markers_xsens[:, j, i].T))
-        markersOverFrames.append(node_segment)
-
-    freq = 200
     params = biorbd.KalmanParam(freq)
     kalman = biorbd.KalmanReconsMarkers(model, params)
     kalman.setInitState(initial_guess[0], initial_guess[1], initial_guess[2])
@@ -25,13 +26,15 @@ def recons_kalman_with_marker(
     Q = biorbd.GeneralizedCoordinates(model)
     Qdot = biorbd.GeneralizedVelocity(model)
     Qddot = biorbd.GeneralizedAcceleration(model)
-    q_recons = np.ndarray((model.nbQ(), len(markersOverFrames)))
-    qdot_recons = np.ndarray((model.nbQ(), len(markersOverFrames)))
+    q_recons = np.ndarray((model.nbQ(), n_frames))
+    qdot_recons = np.ndarray((model.nbQ(), n_frames))
     markers_recons = np.ndarray(
-        (3, num_markers, len(markersOverFrames))
+        (3, num_markers, n_frames)
     )  # Pour stocker les positions reconstruites des marqueurs
 
-    for i, targetMarkers in enumerate(markersOverFrames):
+    for i in range(n_frames):
+        # Les NodeSegment sont construits frame par frame plutot que pour tout l'essai
+        targetMarkers = [biorbd.NodeSegment(markers_xsens[:, j, i].T) for j in range(num_markers)]
         kalman.reconstructFrame(model, targetMarkers, Q, Qdot, Qddot)
         q_recons[:, i] = Q.to_array()
         qdot_recons[:, i] = Qdot.to_array()
@@ -682,63 +685,403 @@ def get_orientation_shoulder(pos_marker, marker_name_list, is_right_side, is_y_u
     return matrices_rotation, mid_acr
 
 
-def get_all_matrice(file_path, interval, model, is_y_up):
-    file_name = os.path.basename(file_path).split(".")[0]
-    print(f"{file_name} is running")
-    c = ezc3d.c3d(file_path)
-    point_data = c["data"]["points"][:, :, int(interval[0]): int(interval[1])]
-    n_markers = point_data.shape[1]
-    nf_mocap = point_data.shape[2]
-    f_mocap = c["parameters"]["POINT"]["RATE"]["value"][0]
-    point_labels = c["parameters"]["POINT"]["LABELS"]
-    # Extraire les noms de marqueurs utiles de 'point_labels'
-    useful_labels = [
-        label for label in point_labels["value"] if not label.startswith("*")
-    ]
+def _limb_segment(name, variables, origin, columns_y_up, columns_z_up, check_orthogonality=False):
+    return {
+        "name": name,
+        "variables": variables,
+        "origin": origin,
+        "columns": {True: columns_y_up, False: columns_z_up},
+        "check_orthogonality": check_orthogonality,
+    }
+
+
+# Description declarative des 15 reperes segmentaires, dans l'ordre de parent_list_marker.
+# Chaque variable est une expression sur les marqueurs (noms en majuscules), les variables deja calculees du segment
+# ou celles d'un segment precedent ("pelvis.hjc_right") :
+#   ("mid", a, b) = (a + b) / 2, ("sub", a, b) = a - b, ("cross", a, b), ("unit", a) normalise, ("neg", a) = -a,
+#   ("hip_joint_center", is_right_side, origine, x, y, z) methode predictive de calculate_hjc.
+# "columns" donne les axes colonnes de la matrice de rotation selon is_y_up.
+SEGMENT_FRAMES = [
+    _limb_segment(
+        "pelvis",
+        [
+            ("mid_eias", ("mid", "EIASD", "EIASG")),
+            ("mid_eips", ("mid", "EIPSD", "EIPSG")),
+            ("b1", ("sub", "mid_eias", "mid_eips")),
+            ("y", ("unit", ("sub", "EIASG", "EIASD"))),
+            ("x", ("unit", ("cross", "b1", "y"))),
+            ("z", ("unit", ("cross", "y", "x"))),
+            ("hjc_right", ("hip_joint_center", True, "mid_eias", "x", "y", "z")),
+            ("hjc_left", ("hip_joint_center", False, "mid_eias", "x", "y", "z")),
+            ("y_neg", ("neg", "y")),
+        ],
+        "mid_eias",
+        ("y_neg", "z", "x"),
+        ("y_neg", "z", "x"),
+    ),
+    _limb_segment(
+        "thorax",
+        [
+            ("mid_lower_stern", ("mid", "XIPHOIDE", "D10")),
+            ("mid_upper_stern", ("mid", "MANU", "C7")),
+            ("y", ("unit", ("sub", "mid_upper_stern", "mid_lower_stern"))),
+            ("v1", ("sub", "mid_lower_stern", "C7")),
+            ("v2", ("sub", "mid_lower_stern", "MANU")),
+            ("z", ("unit", ("cross", "v2", "v1"))),
+            ("x", ("neg", ("unit", ("cross", "z", "y")))),
+        ],
+        "mid_lower_stern",
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    ),
+    _limb_segment(
+        "head",
+        [
+            ("jc_head", ("mid", "C7", "GLABELLE")),
+            ("mid_zyg", ("mid", "ZYGD", "ZYGG")),
+            ("mid_temp", ("mid", "TEMPD", "TEMPG")),
+            ("z", ("unit", ("sub", "TEMPD", "TEMPG"))),
+            ("y0", ("unit", ("sub", "mid_zyg", "mid_temp"))),
+            ("x", ("neg", ("unit", ("cross", "y0", "z")))),
+            ("y", ("neg", ("unit", ("cross", "x", "z")))),
+        ],
+        "jc_head",
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    ),
+]
 
-    sample_label = useful_labels[0]
-    typical_dimensions = point_data[0][
-        find_index(sample_label, point_labels["value"])
-    ].shape[0]
 
-    desired_order = [
-        model.markerNames()[i].to_string() for i in range(model.nbMarkers())
-    ]
+def _shoulder_frame(side):
+    is_right_side = side == "D"
+    return _limb_segment(
+        f"shoulder_{side}",
+        [
+            ("mid_acr", ("mid", f"ACRANT{side}", f"ACRPOST{side}")),
+            ("mid_epi", ("mid", f"EPICON{side}", f"EPITRO{side}")),
+            ("y", ("unit", ("sub", "mid_acr", "mid_epi"))),
+            ("v1", ("sub", "mid_acr", f"EPITRO{side}")),
+            ("v2", ("sub", "mid_acr", f"EPICON{side}")),
+            ("x0", ("unit", ("cross", "v2", "v1") if is_right_side else ("cross", "v1", "v2"))),
+            ("z", ("unit", ("cross", "x0", "y"))),
+            ("x", ("unit", ("cross", "y", "z"))),
+        ],
+        "mid_acr",
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    )
+
+
+def _elbow_frame(side):
+    is_right_side = side == "D"
+    return _limb_segment(
+        f"elbow_{side}",
+        [
+            ("mid_epi", ("mid", f"EPICON{side}", f"EPITRO{side}")),
+            ("mid_ul_rad", ("mid", f"ULNA{side}", f"RADIUS{side}")),
+            ("v1", ("sub", "mid_epi", f"ULNA{side}")),
+            ("v2", ("sub", "mid_epi", f"RADIUS{side}")),
+            ("x0", ("unit", ("cross", "v2", "v1"))),
+            (
+                "y",
+                ("unit", ("sub", "mid_epi", "mid_ul_rad"))
+                if is_right_side
+                else ("neg", ("unit", ("sub", "mid_ul_rad", "mid_epi"))),
+            ),
+            ("z", ("unit", ("cross", "x0", "y")) if is_right_side else ("neg", ("unit", ("cross", "x0", "y")))),
+            ("x", ("unit", ("cross", "y", "z"))),
+        ],
+        "mid_epi",
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    )
+
+
+def _wrist_frame(side):
+    is_right_side = side == "D"
+    return _limb_segment(
+        f"wrist_{side}",
+        [
+            ("mid_ul_rad", ("mid", f"ULNA{side}", f"RADIUS{side}")),
+            (
+                "z0",
+                ("unit", ("sub", f"RADIUS{side}", f"ULNA{side}"))
+                if is_right_side
+                else ("unit", ("sub", f"ULNA{side}", f"RADIUS{side}")),
+            ),
+            ("y", ("unit", ("sub", f"MIDMETAC3{side}", "mid_ul_rad"))),
+            ("x", ("unit", ("cross", "z0", "y"))),
+            ("z", ("unit", ("cross", "y", "x"))),
+            ("y_up", ("unit", ("cross", "z", "x"))),
+        ],
+        "mid_ul_rad",
+        ("x", "y_up", "z"),
+        ("z", "y", "x"),
+        check_orthogonality=True,
+    )
+
+
+def _hip_frame(side):
+    is_right_side = side == "D"
+    hjc = "pelvis.hjc_right" if is_right_side else "pelvis.hjc_left"
+    # Le marqueur externe du condyle gauche s'appelle CONEXTG dans les modeles
+    condext = "CONDEXTD" if is_right_side else "CONEXTG"
+    return _limb_segment(
+        f"hip_{side}",
+        [
+            ("mid_cond", ("mid", condext, f"CONDINT{side}")),
+            ("y", ("neg", ("unit", ("sub", "mid_cond", hjc)))),
+            ("v1", ("sub", hjc, condext)),
+            ("v2", ("sub", hjc, f"CONDINT{side}")),
+            ("plan_center_cond", ("cross", "v1", "v2")),
+            (
+                "z",
+                ("neg", ("unit", ("cross", "y", "plan_center_cond")))
+                if is_right_side
+                else ("unit", ("cross", "y", "plan_center_cond")),
+            ),
+            ("x", ("neg", ("unit", ("cross", "z", "y")))),
+        ],
+        hjc,
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    )
+
+
+def _knee_frame(side):
+    is_right_side = side == "D"
+    condext = "CONDEXTD" if is_right_side else "CONEXTG"
+    return _limb_segment(
+        f"knee_{side}",
+        [
+            (
+                "z0",
+                ("unit", ("sub", f"CONDINT{side}", condext))
+                if is_right_side
+                else ("unit", ("sub", condext, f"CONDINT{side}")),
+            ),
+            ("mid_cond", ("mid", condext, f"CONDINT{side}")),
+            ("mid_mal", ("mid", f"MALEXT{side}", f"MALINT{side}")),
+            ("y", ("unit", ("sub", "mid_cond", "mid_mal"))),
+            ("x", ("unit", ("cross", "z0", "y"))),
+            ("z", ("unit", ("cross", "x", "y"))),
+        ],
+        "mid_cond",
+        ("x", "y", "z"),
+        ("z", "x", "y"),
+    )
+
+
+def _ankle_frame(side):
+    is_right_side = side == "D"
+    return _limb_segment(
+        f"ankle_{side}",
+        [
+            ("mid_meta", ("mid", f"METAT1{side}", f"METAT5{side}")),
+            ("mid_mal", ("mid", f"MALINT{side}", f"MALEXT{side}")),
+            (
+                "z",
+                ("unit", ("sub", f"MALEXT{side}", f"MALINT{side}"))
+                if is_right_side
+                else ("unit", ("sub", f"MALINT{side}", f"MALEXT{side}")),
+            ),
+            ("x0", ("unit", ("sub", "mid_meta", f"CALC{side}"))),
+            ("y", ("neg", ("unit", ("cross", "x0", "z")))),
+            ("x", ("unit", ("cross", "z", "y"))),
+        ],
+        "mid_mal",
+        # Avec y vers le haut x et y sont inverses pour avoir la rotation int/ext sur y
+        ("y", "x", "z"),
+        ("z", "y", "x"),
+    )
+
+
+SEGMENT_FRAMES += [
+    _shoulder_frame("D"),
+    _elbow_frame("D"),
+    _wrist_frame("D"),
+    _shoulder_frame("G"),
+    _elbow_frame("G"),
+    _wrist_frame("G"),
+    _hip_frame("D"),
+    _knee_frame("D"),
+    _ankle_frame("D"),
+    _hip_frame("G"),
+    _knee_frame("G"),
+    _ankle_frame("G"),
+]
+
+
+@lru_cache(maxsize=None)
+def _marker_indices(marker_names):
+    return {name: index for index, name in enumerate(marker_names)}
+
+
+def _evaluate_frame_expression(expression, variables, frames, markers):
+    if isinstance(expression, str):
+        if expression in variables:
+            return variables[expression]
+        if "." in expression:
+            segment_name, variable_name = expression.split(".")
+            return frames[segment_name][variable_name]
+        return markers(expression)
+
+    operation, *arguments = expression
+    if operation == "hip_joint_center":
+        is_right_side, origin, *axes = arguments
+        matrices_rotation_for_hjc = np.stack([variables[axis] for axis in axes], axis=-1)
+        return markers.hip_joint_center(is_right_side, matrices_rotation_for_hjc, variables[origin])
+
+    values = [_evaluate_frame_expression(argument, variables, frames, markers) for argument in arguments]
+    if operation == "mid":
+        return (values[0] + values[1]) / 2
+    elif operation == "sub":
+        return values[0] - values[1]
+    elif operation == "cross":
+        return np.cross(values[0], values[1])
+    elif operation == "unit":
+        return normalise_vecteurs(values[0])
+    elif operation == "neg":
+        return -values[0]
+    raise NotImplementedError(f"The operation {operation} is not implemented in the segment frames")
+
+
+class _MarkerAccessor:
+    # Positions (n_frames, 3) des marqueurs, extraites une seule fois par appel de build_segment_frames
+    def __init__(self, pos_marker, marker_name_list):
+        self.pos_marker = pos_marker
+        self.indices = _marker_indices(tuple(marker_name_list))
+        self.positions = {}
+
+    def __call__(self, marker_name):
+        if marker_name not in self.positions:
+            self.positions[marker_name] = self.pos_marker[:, self.indices[marker_name], :].T
+        return self.positions[marker_name]
+
+    def hip_joint_center(self, is_right_side, matrices_rotation_for_hjc, origin):
+        hip_joint_center_local = calculate_hjc(
+            self.pos_marker,
+            self.indices["EIASD"],
+            self.indices["EIASG"],
+            self.indices["CONDINTD"],
+            self.indices["CONDINTG"],
+            self.indices["MALINTD"],
+            self.indices["MALINTG"],
+            is_right_side,
+        )
+        return transform_point(hip_joint_center_local, matrices_rotation_for_hjc, origin)
+
+
+def build_segment_frames(pos_marker, marker_name_list, is_y_up, segment_frames=SEGMENT_FRAMES):
+    """
+    Build the rotation matrix and the joint center of every segment of segment_frames for all the frames.
 
-    n_markers_desired = len(desired_order)
-    reordered_point_data = np.full((4, n_markers_desired, typical_dimensions), np.nan)
+    Args:
+        pos_marker (np.ndarray): Marker positions of shape (3, n_markers, n_frames).
+        marker_name_list (list): Names of the markers in the order of pos_marker.
+        is_y_up (bool): Vertical axis of the segment frames, selects the "columns" of each segment.
+        segment_frames (list): Declarative description of the segments, SEGMENT_FRAMES by default.
 
+    Returns:
+        tuple: Rotation matrices of shape (n_segments, n_frames, 3, 3) and joint centers of shape
+            (n_segments, n_frames, 3), in the order of segment_frames.
+    """
+    n_frames = pos_marker.shape[2]
+    markers = _MarkerAccessor(pos_marker, marker_name_list)
+    rot_mat = np.empty((len(segment_frames), n_frames, 3, 3))
+    articular_joint_center = np.empty((len(segment_frames), n_frames, 3))
+
+    frames = {}
+    for i_segment, segment in enumerate(segment_frames):
+        variables = {}
+        for variable_name, expression in segment["variables"]:
+            variables[variable_name] = _evaluate_frame_expression(expression, variables, frames, markers)
+        frames[segment["name"]] = variables
+
+        for i_axis, axis in enumerate(segment["columns"][bool(is_y_up)]):
+            rot_mat[i_segment, :, :, i_axis] = variables[axis]
+        articular_joint_center[i_segment] = _evaluate_frame_expression(segment["origin"], variables, frames, markers)
+
+        if segment["check_orthogonality"]:
+            check_rotation_matrices(rot_mat[i_segment], f"Repere {segment['name']}")
+
+    return rot_mat, articular_joint_center
+
+
+@lru_cache(maxsize=None)
+def c3d_label_mapping(point_labels, desired_order):
+    """
+    Index in point_labels of each marker of desired_order, -1 if the marker is not found.
+    A marker is matched to the first label (not starting with "*") containing its name. The mapping only depends on
+    the label set of the c3d and on the model markers, it is computed once per (model, label set).
+
+    Args:
+        point_labels (tuple): Labels of the points of the c3d file.
+        desired_order (tuple): Names of the markers of the model.
+
+    Returns:
+        np.ndarray: Indices of shape (n_markers,).
+    """
+    useful_labels = [
+        (index, label) for index, label in enumerate(point_labels) if not label.startswith("*")
+    ]
+    label_indices = np.full(len(desired_order), -1, dtype=int)
     for i, marker in enumerate(desired_order):
-        marker_found = False
-        for label in useful_labels:
+        for index, label in useful_labels:
             if marker in label:  # Vérifie si marker est une sous-chaîne de label.
-                original_index = find_index(label, point_labels["value"])
-                reordered_point_data[:, i, :] = point_data[:, original_index, :]
-                marker_found = True
+                label_indices[i] = index
                 break
-
-        if not marker_found:
+        else:
             print(
                 f"Le marqueur '{marker}' n'a pas été trouvé et a été initialisé avec NaN."
             )
-            pass
+    return label_indices
 
-    n_markers_reordered = reordered_point_data.shape[1]
 
-    # Ne prendre que les 3 premiere colonnes et divise par 1000
-    markers = np.zeros((3, n_markers_reordered, nf_mocap))
-    for i in range(nf_mocap):
-        for j in range(n_markers_reordered):
-            markers[:, j, i] = reordered_point_data[:3, j, i]
-            # markers[:, j, nf_mocap-1-i] = reordered_point_data[:3, j, i]
-    markers = markers / 1000
+def reorder_markers(point_data, label_indices, reverse_time=False):
+    """
+    Markers of point_data (4 or 3, n_labels, n_frames) in mm reordered with label_indices, in meters.
+    The markers not found (index -1) are NaN.
+    """
+    found = label_indices >= 0
+    markers = np.full((3, len(label_indices), point_data.shape[2]), np.nan)
+    markers[:, found, :] = point_data[:3, label_indices[found], :]
+    if reverse_time:
+        markers = markers[:, :, ::-1]
+    return markers / 1000
 
-    frame_index = 0
-    # frame_index = nf_mocap-1
+
+def load_markers_from_c3d(file_path, interval, desired_order, reverse_time=False):
+    """
+    Load the markers of a c3d file in the order of the model markers.
+
+    Args:
+        file_path (str): Path to the .c3d file.
+        interval (tuple): First and last frame of the acrobatics.
+        desired_order (list): Names of the markers of the model.
+        reverse_time (bool): If True, the frames are returned from the last to the first.
+
+    Returns:
+        np.ndarray: Markers positions in meters, shape (3, n_markers, n_frames).
+    """
+    c = ezc3d.c3d(file_path)
+    # Seul l'intervalle de l'acrobatie est copie, le reste de la session n'est qu'une vue
+    point_data = c["data"]["points"][:3, :, int(interval[0]): int(interval[1])]
+    point_labels = tuple(c["parameters"]["POINT"]["LABELS"]["value"])
+
+    label_indices = c3d_label_mapping(point_labels, tuple(desired_order))
+    return reorder_markers(point_data, label_indices, reverse_time)
+
+
+def get_initial_guess(model, markers, frame_index=0):
+    """
+    Solve the inverse kinematics on one frame to initialise the Kalman filter.
+    """
+    n_markers = markers.shape[1]
     start_frame = markers[:, :, frame_index : frame_index + 1]
-    if start_frame.shape != (3, n_markers_reordered, 1):
+    if start_frame.shape != (3, n_markers, 1):
         raise ValueError(
-            f"Dimension incorrecte pour 'specific_frame'. Attendu: (3, {n_markers_reordered}, 1), Obtenu: "
+            f"Dimension incorrecte pour 'specific_frame'. Attendu: (3, {n_markers}, 1), Obtenu: "
             f"{start_frame.shape}"
         )
 
@@ -753,112 +1096,100 @@ def get_all_matrice(file_path, interval, model, is_y_up):
     Qddot_1d = np.zeros(Q_1d.shape)
 
     # Créer initial_guess avec ces vecteurs 1D
-    initial_guess = (Q_1d, Qdot_1d, Qddot_1d)
+    return Q_1d, Qdot_1d, Qddot_1d
 
-    q_recons, qdot_recons, pos_recons = recons_kalman_with_marker(
-        nf_mocap, n_markers_reordered, markers, model, initial_guess
-    )
 
-    rmsd_by_frame = calculate_rmsd(markers, pos_recons)
+def recons_kalman_from_c3d(file_path, interval, model, reverse_time=False, freq=200):
+    """
+    Kalman reconstruction of the generalized coordinates of one acrobatics of a c3d file.
+    If reverse_time is True, the filter runs from the last frame to the first one and is initialised on the first frame.
+    """
+    file_name = os.path.basename(file_path).split(".")[0]
+    print(f"{file_name} is running")
+    desired_order = [
+        model.markerNames()[i].to_string() for i in range(model.nbMarkers())
+    ]
+    markers = load_markers_from_c3d(file_path, interval, desired_order, reverse_time)
+    n_markers = markers.shape[1]
+    nf_mocap = markers.shape[2]
+
+    frame_index = nf_mocap - 1 if reverse_time else 0
+    initial_guess = get_initial_guess(model, markers, frame_index)
 
-    origine = np.zeros((q_recons.shape[1], 3))
-    matrice_origin = np.array([np.eye(3) for _ in range(q_recons.shape[1])])
+    return recons_kalman(nf_mocap, n_markers, markers, model, initial_guess, freq)
 
-    (
-        hip_right_joint_center,
-        hip_left_joint_center,
-        pelvic_origin,
-        matrices_rotation_pelvic,
-    ) = predictive_hip_joint_center_location(pos_recons, desired_order)
 
-    matrices_rotation_hip_right = get_orientation_hip(
-        pos_recons, desired_order, hip_right_joint_center, True, is_y_up
-    )
-    matrices_rotation_hip_left = get_orientation_hip(
-        pos_recons, desired_order, hip_left_joint_center, False, is_y_up
-    )
+def reconstruct_trial(file_path, interval, model, freq=200, cache=None, save_quality=False):
+    """
+    Kalman reconstruction of one acrobatics with the reconstructed markers.
+
+    Args:
+        file_path (str): Path to the .c3d file.
+        interval (tuple): First and last frame of the acrobatics.
+        model (biorbd.Model): Model used for the reconstruction.
+        freq (int): Frequency given to the Kalman filter.
+        cache (ArrayCache): If given, the result is looked up in the cache with a key computed from the content of the
+            c3d and model files, the interval and the frequency, and stored in it after a reconstruction with the
+            per-frame residuals (quality_by_frame).
+        save_quality (bool): Write the quality record of the trial (<trial>_quality.json) after a reconstruction.
+            On a cache hit it is rebuilt from the cached markers only if it is missing or from another interval.
+
+    Returns:
+        tuple: q_recons, qdot_recons, pos_recons and the experimental markers in meters.
+    """
+    desired_order = [
+        model.markerNames()[i].to_string() for i in range(model.nbMarkers())
+    ]
 
-    matrices_rotation_knee_right, mid_cond_right = get_orientation_knee_right(
-        pos_recons, desired_order, is_y_up
-    )
-    matrices_rotation_knee_left, mid_cond_left = get_orientation_knee_left(
-        pos_recons, desired_order, is_y_up
-    )
+    if cache is not None:
+        key = kalman_cache_key(file_path, interval, model.path().absolutePath().to_string(), freq)
+        cached = cache.get(key)
+        if cached is not None:
+            # Record supprime, cache rempli sans record ou record d'un autre intervalle du meme c3d
+            if save_quality and load_quality_record(file_path, interval) is None:
+                quality = reconstruction_quality(cached["markers"], cached["pos_recons"], desired_order)
+                save_quality_record(file_path, interval, quality)
+            return cached["q_recons"], cached["qdot_recons"], cached["pos_recons"], cached["markers"]
+    markers = load_markers_from_c3d(file_path, interval, desired_order)
+    n_markers_reordered = markers.shape[1]
+    nf_mocap = markers.shape[2]
+
+    initial_guess = get_initial_guess(model, markers, frame_index=0)
 
-    matrices_rotation_ankle_right, mid_mal_right = get_orientation_ankle(
-        pos_recons, desired_order, True, is_y_up
-    )
-    matrices_rotation_ankle_left, mid_mal_left = get_orientation_ankle(
-        pos_recons, desired_order, False, is_y_up
+    q_recons, qdot_recons, pos_recons = recons_kalman_with_marker(
+        nf_mocap, n_markers_reordered, markers, model, initial_guess, freq
     )
 
-    matrices_rotation_thorax, manu = get_orientation_thorax(pos_recons, desired_order, is_y_up)
+    if cache is not None:
+        cache.put(
+            key,
+            q_recons=q_recons,
+            qdot_recons=qdot_recons,
+            pos_recons=pos_recons,
+            markers=markers,
+            **quality_by_frame(markers, pos_recons),
+        )
 
-    matrices_rotation_head, head_joint_center = get_orientation_head(
-        pos_recons, desired_order, is_y_up
-    )
+    # Residus de la reconstruction enregistres a cote de l'essai (<essai>_quality.json)
+    if save_quality:
+        save_quality_record(file_path, interval, reconstruction_quality(markers, pos_recons, desired_order))
 
-    matrices_rotation_shoulder_right, mid_acr_right = get_orientation_shoulder(
-        pos_recons, desired_order, True, is_y_up
-    )
-    matrices_rotation_shoulder_left, mid_acr_left = get_orientation_shoulder(
-        pos_recons, desired_order, False, is_y_up
-    )
+    return q_recons, qdot_recons, pos_recons, markers
 
-    matrices_rotation_elbow_right, mid_epi_right = get_orientation_elbow(
-        pos_recons, desired_order, True, is_y_up
-    )
-    matrices_rotation_elbow_left, mid_epi_left = get_orientation_elbow(
-        pos_recons, desired_order, False, is_y_up
-    )
 
-    matrices_rotation_wrist_right, mid_ul_rad_right = get_orientation_wrist(
-        pos_recons, desired_order, True, is_y_up
-    )
-    matrices_rotation_wrist_left, mid_ul_rad_left = get_orientation_wrist(
-        pos_recons, desired_order, False, is_y_up
-    )
+def get_all_matrice(file_path, interval, model, is_y_up, freq=200, cache=None, save_quality=True):
+    file_name = os.path.basename(file_path).split(".")[0]
+    print(f"{file_name} is running")
 
-    rot_mat = np.stack(
-        [
-            matrices_rotation_pelvic,
-            matrices_rotation_thorax,
-            matrices_rotation_head,
-            matrices_rotation_shoulder_right,
-            matrices_rotation_elbow_right,
-            matrices_rotation_wrist_right,
-            matrices_rotation_shoulder_left,
-            matrices_rotation_elbow_left,
-            matrices_rotation_wrist_left,
-            matrices_rotation_hip_right,
-            matrices_rotation_knee_right,
-            matrices_rotation_ankle_right,
-            matrices_rotation_hip_left,
-            matrices_rotation_knee_left,
-            matrices_rotation_ankle_left,
-        ],
-        axis=0,
+    desired_order = [
+        model.markerNames()[i].to_string() for i in range(model.nbMarkers())
+    ]
+    q_recons, qdot_recons, pos_recons, markers = reconstruct_trial(
+        file_path, interval, model, freq, cache, save_quality
     )
 
-    articular_joint_center = np.stack(
-        [
-            pelvic_origin,
-            manu,
-            head_joint_center,
-            mid_acr_right,
-            mid_epi_right,
-            mid_ul_rad_right,
-            mid_acr_left,
-            mid_epi_left,
-            mid_ul_rad_left,
-            hip_right_joint_center,
-            mid_cond_right,
-            mid_mal_right,
-            hip_left_joint_center,
-            mid_cond_left,
-            mid_mal_left,
-        ]
-    )
+    # Les 15 reperes segmentaires de toutes les frames en une passe
+    rot_mat, articular_joint_center = build_segment_frames(pos_recons, desired_order, is_y_up)
 
     return rot_mat, articular_joint_center, pos_recons
 
@@ -921,3 +1252,74 @@ def calculer_rotation_et_angle(i_segment, quat_array, move_orientation=None):
 
 def calculer_rotation_relative(R1, R2):
     return np.linalg.inv(R1) @ R2
+
+
+def compute_relax_reference(file_path_relax, interval_relax, model, is_y_up, cache=None):
+    """
+    Reference pose of a participant from the Relax trial: mean rotation matrix and joint center of each segment, and
+    rotation / position / RT matrix of each segment in its parent frame (parent_list_marker).
+    """
+    # La reconstruction du Relax n'a pas de record de qualite, seules les acrobaties sont dans le resume de cohorte
+    rot_mat, articular_joint_center, pos_marker_relax = get_all_matrice(
+        file_path_relax, interval_relax, model, is_y_up, cache=cache, save_quality=False
+    )
+
+    nb_mat = rot_mat.shape[0]
+    relax_matrix = np.zeros((nb_mat, 3, 3))
+    for i in range(nb_mat):
+        relax_matrix[i] = average_rotation_matrix(rot_mat[i])
+
+    relax_joint_center = np.mean(articular_joint_center, axis=1)
+
+    matrix_in_parent_frame = np.zeros((nb_mat, 3, 3))
+    joint_center_in_parent_frame = np.zeros((nb_mat, 3))
+    rot_trans_matrix = np.tile(np.eye(4), (nb_mat, 1, 1))
+
+    for index, (joint, parent_info) in enumerate(parent_list_marker.items()):
+        if parent_info is not None:
+            parent_index, parent_name = parent_info
+            P2_in_P1, R2_in_R1 = convert_to_local_frame(relax_joint_center[parent_index], relax_matrix[parent_index],
+                                                        relax_joint_center[index], relax_matrix[index])
+            matrix_in_parent_frame[index] = R2_in_R1
+            joint_center_in_parent_frame[index] = P2_in_P1
+            rot_trans_matrix[index, :3, :3] = R2_in_R1
+            rot_trans_matrix[index, :3, 3] = P2_in_P1
+        else:
+            matrix_in_parent_frame[index] = relax_matrix[index]
+            joint_center_in_parent_frame[index] = relax_joint_center[index]
+            rot_trans_matrix[index, :3, :3] = relax_matrix[index]
+
+    return {
+        "relax_matrix": relax_matrix,
+        "relax_joint_center": relax_joint_center,
+        "matrix_in_parent_frame": matrix_in_parent_frame,
+        "joint_center_in_parent_frame": joint_center_in_parent_frame,
+        "rot_trans_matrix": rot_trans_matrix,
+    }
+
+
+def relax_reference_path(model_path):
+    return f"{os.path.splitext(model_path)[0]}_relax_reference.npz"
+
+
+def load_relax_reference(file_path_relax, interval_relax, model, is_y_up, cache=None):
+    """
+    Reference pose of the participant stored next to its model (<model>_relax_reference.npz).
+    It is computed with compute_relax_reference only if the file does not exist or if the Relax c3d, the model, the
+    interval or is_y_up changed since it was saved.
+    """
+    model_path = model.path().absolutePath().to_string()
+    reference_path = relax_reference_path(model_path)
+    key = hash_inputs(
+        file_paths=[file_path_relax, model_path],
+        values=["relax", int(interval_relax[0]), int(interval_relax[1]), bool(is_y_up)],
+    )
+
+    if os.path.exists(reference_path):
+        with np.load(reference_path) as data:
+            if str(data["key"]) == key:
+                return {name: data[name] for name in data.files if name != "key"}
+
+    reference = compute_relax_reference(file_path_relax, interval_relax, model, is_y_up, cache)
+    np.savez(reference_path, key=key, **reference)
+    return reference
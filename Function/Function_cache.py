@@ -0,0 +1,147 @@
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _file_digest(file_path, size, mtime_ns):
+    # size et mtime_ns font partie de la cle du lru_cache : un fichier modifie est hashe a nouveau
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(file_path):
+    """
+    sha256 of the content of a file, memoized as long as its size and modification time do not change.
+    """
+    stat = os.stat(file_path)
+    return _file_digest(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def hash_inputs(file_paths=(), values=()):
+    """
+    Key of a cache entry from the content of some files and a list of values (converted with repr).
+    """
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        digest.update(file_digest(file_path).encode())
+    for value in values:
+        digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+def kalman_cache_key(c3d_path, interval, model_path, freq):
+    """
+    Key of a Kalman reconstruction: c3d content, interval of the acrobatics, .s2mMod content and Kalman frequency.
+    """
+    return hash_inputs(
+        file_paths=[c3d_path, model_path],
+        values=["kalman", int(interval[0]), int(interval[1]), float(freq)],
+    )
+
+
+class ArrayCache:
+    """
+    On-disk cache of numpy arrays (one .npz file per key) with a size-bounded least recently used eviction.
+    The modification time of a file is its last access, it is updated at each hit.
+    """
+
+    def __init__(self, cache_dir, max_size_bytes=5 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        return arrays
+
+    def put(self, key, **arrays):
+        # Ecriture dans un fichier temporaire puis renommage, un autre processus ne lit jamais un fichier incomplet
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def entries(self):
+        """
+        List of (key, size in bytes, last access time) from the most to the least recently used.
+        """
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+            except FileNotFoundError:
+                continue
+            entries.append((file_name[: -len(".npz")], stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2], reverse=True)
+
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total_size = sum(entry[1] for entry in entries)
+        while entries and total_size > self.max_size_bytes:
+            key, size, _ = entries.pop()
+            self.remove(key)
+            total_size -= size
+
+    def remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, older_than_days=None):
+        """
+        Remove all the entries, or only those not used for more than older_than_days days. Returns the number removed.
+        """
+        n_removed = 0
+        for key, _, last_access in self.entries():
+            if older_than_days is None or time.time() - last_access > older_than_days * 24 * 3600:
+                self.remove(key)
+                n_removed += 1
+        return n_removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge a cache of reconstructed trajectories")
+    parser.add_argument("cache_dir", help="Directory of the cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("info", help="List the entries of the cache")
+    purge_parser = subparsers.add_parser("purge", help="Remove entries of the cache")
+    purge_parser.add_argument("--older-than", type=float, default=None, help="Only remove entries unused for N days")
+    args = parser.parse_args()
+
+    cache = ArrayCache(args.cache_dir, max_size_bytes=float("inf"))
+    if args.command == "info":
+        entries = cache.entries()
+        for key, size, last_access in entries:
+            print(f"{key}  {size / 1024**2:8.1f} MB  {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_access))}")
+        print(f"{len(entries)} entries, {sum(entry[1] for entry in entries) / 1024**2:.1f} MB")
+    else:
+        n_removed = cache.purge(args.older_than)
+        print(f"{n_removed} entries removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import re
+import pickle
+import sqlite3
+import pandas as pd
+
+
+XSENS_FREQUENCY = 60
+# Fichiers de resultats ecrits par Xsens_analysis.py, ex: results_831<_rotation.csv
+RESULT_FILE_PATTERN = re.compile(r"results_(?P<acrobatics>.+)_(?P<kind>[a-z]+)\.csv$")
+
+
+def trial_files(pkl_path):
+    """
+    .pkl trials of pkl_path/<participant>/<acrobatics>/..., found by walking the directories without reading them.
+
+    Returns:
+        list: (absolute path, participant, acrobatics) sorted by participant, acrobatics and trial name.
+    """
+    files_found = []
+    for participant in sorted(os.listdir(pkl_path)):
+        participant_path = os.path.join(pkl_path, participant)
+        if not os.path.isdir(participant_path):
+            continue
+        for acrobatics in sorted(os.listdir(participant_path)):
+            acrobatics_path = os.path.join(participant_path, acrobatics)
+            if not os.path.isdir(acrobatics_path):
+                continue
+            acrobatics_files = []
+            for root, dirs, files in os.walk(acrobatics_path):
+                for file in files:
+                    if file.endswith(".pkl"):
+                        acrobatics_files.append(os.path.abspath(os.path.join(root, file)))
+            # Meme ordre que TrialCatalog.trials (participant, acrobatie, nom de l'essai)
+            acrobatics_files.sort(key=lambda path: os.path.splitext(os.path.basename(path))[0])
+            files_found += [(path, participant, acrobatics) for path in acrobatics_files]
+    return files_found
+
+
+class TrialCatalog:
+    """
+    Persistent SQLite catalog of the trials (one Xsens .pkl file per trial) and of the derived result files.
+
+    The catalog is updated incrementally: only the files whose modification time changed since the last update are
+    read again, the others are kept from the database. Scripts then select their trials with a query instead of
+    walking the data directories.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trials (
+                path TEXT PRIMARY KEY,
+                participant TEXT,
+                acrobatics TEXT,
+                trial TEXT,
+                expertise TEXT,
+                laterality TEXT,
+                n_frames INTEGER,
+                duration REAL,
+                mtime REAL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_files (
+                path TEXT PRIMARY KEY,
+                acrobatics TEXT,
+                kind TEXT,
+                mtime REAL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def _known_mtimes(self, table):
+        return dict(self.connection.execute(f"SELECT path, mtime FROM {table}").fetchall())
+
+    def _remove_missing(self, table, known_mtimes, found_paths, root_path):
+        root_path = os.path.abspath(root_path)
+        missing = [
+            (path,) for path in known_mtimes if path not in found_paths and path.startswith(root_path + os.sep)
+        ]
+        self.connection.executemany(f"DELETE FROM {table} WHERE path = ?", missing)
+        return len(missing)
+
+    def update_trials(self, pkl_path):
+        """
+        Add or refresh the .pkl trials of pkl_path/<participant>/<acrobatics>/... and remove the deleted ones.
+
+        Returns:
+            tuple: Number of trials read again and number of trials removed.
+        """
+        known_mtimes = self._known_mtimes("trials")
+        found_paths = set()
+        n_updated = 0
+        for path, participant, acrobatics in trial_files(pkl_path):
+            found_paths.add(path)
+            mtime = os.path.getmtime(path)
+            if known_mtimes.get(path) == mtime:
+                continue
+            self._add_trial(path, participant, acrobatics, mtime)
+            n_updated += 1
+
+        n_removed = self._remove_missing("trials", known_mtimes, found_paths, pkl_path)
+        self.connection.commit()
+        return n_updated, n_removed
+
+    def update_trials_from_rows(self, pkl_path, rows):
+        """
+        Same update as update_trials, but the metadata of the trials are given in rows (e.g. taken from the outputs of
+        the conversion workers) instead of read from their .pkl files. A trial without row keeps its previous entry.
+
+        Args:
+            pkl_path (str): Directory of the .pkl trials, the trials no longer in it are removed.
+            rows (list): One dict per trial with path, participant, acrobatics, expertise, laterality and n_frames.
+
+        Returns:
+            tuple: Number of trials refreshed and number of trials removed.
+        """
+        known_mtimes = self._known_mtimes("trials")
+        found_paths = {path for path, _, _ in trial_files(pkl_path)}
+        n_updated = 0
+        for row in rows:
+            path = os.path.abspath(row["path"])
+            mtime = os.path.getmtime(path)
+            if known_mtimes.get(path) == mtime:
+                continue
+            self._insert_trial(
+                path, row["participant"], row["acrobatics"], row["expertise"], row["laterality"], row["n_frames"], mtime
+            )
+            n_updated += 1
+
+        n_removed = self._remove_missing("trials", known_mtimes, found_paths, pkl_path)
+        self.connection.commit()
+        return n_updated, n_removed
+
+    def _add_trial(self, path, participant, acrobatics, mtime):
+        with open(path, "rb") as fichier_pkl:
+            eye_tracking_metrics = pickle.load(fichier_pkl)
+        n_frames = eye_tracking_metrics["Xsens_position_rotated_per_move"].shape[0]
+        self._insert_trial(
+            path,
+            participant,
+            acrobatics,
+            eye_tracking_metrics["subject_expertise"],
+            eye_tracking_metrics["laterality"],
+            n_frames,
+            mtime,
+        )
+
+    def _insert_trial(self, path, participant, acrobatics, expertise, laterality, n_frames, mtime):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                participant,
+                acrobatics,
+                os.path.splitext(os.path.basename(path))[0],
+                str(expertise),
+                str(laterality),
+                int(n_frames),
+                n_frames / XSENS_FREQUENCY,
+                mtime,
+            ),
+        )
+
+    def update_result_files(self, results_path):
+        """
+        Add or refresh the result files results_<acrobatics>_<kind>.csv found in results_path.
+        """
+        known_mtimes = self._known_mtimes("result_files")
+        found_paths = set()
+        for root, dirs, files in os.walk(results_path):
+            for file in files:
+                match = RESULT_FILE_PATTERN.match(file)
+                if match is None:
+                    continue
+                path = os.path.abspath(os.path.join(root, file))
+                found_paths.add(path)
+                mtime = os.path.getmtime(path)
+                if known_mtimes.get(path) != mtime:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO result_files VALUES (?, ?, ?, ?)",
+                        (path, match.group("acrobatics"), match.group("kind"), mtime),
+                    )
+
+        self._remove_missing("result_files", known_mtimes, found_paths, results_path)
+        self.connection.commit()
+
+    def trials(self, mvt=None, participant=None, expertise=None, laterality=None):
+        """
+        Trials matching all the given criteria, as a DataFrame with the columns of the trials table, sorted by
+        participant, acrobatics and trial.
+        """
+        conditions = []
+        parameters = []
+        for column, value in (
+            ("acrobatics", mvt),
+            ("participant", participant),
+            ("expertise", expertise),
+            ("laterality", laterality),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        query = "SELECT * FROM trials"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY participant, acrobatics, trial"
+        return pd.read_sql_query(query, self.connection, params=parameters)
+
+    def participants(self, mvt=None):
+        return self.trials(mvt=mvt)["participant"].unique().tolist()
+
+    def result_files(self, kind, order=None):
+        """
+        Paths of the result files of a kind ("position", "rotation"...). With order, the files are sorted as the
+        acrobatics of order and those not in order are put at the end.
+        """
+        rows = self.connection.execute(
+            "SELECT path, acrobatics FROM result_files WHERE kind = ? ORDER BY path", (kind,)
+        ).fetchall()
+        if order is not None:
+            order_index = {key: index for index, key in enumerate(order)}
+            rows = sorted(rows, key=lambda row: order_index.get(row[1], float("inf")))
+        return [path for path, _ in rows]
@@ -1,5 +1,9 @@
 from PIL import Image, ImageDraw
 import math
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.patches import Polygon
 
 
 lines_info = {
@@ -210,6 +214,157 @@ def create_composite_image(
     return save_path
 
 
+class BodyCompositeFigure:
+    """
+    Composite of the mean +- std graphs of all the segments around the body image, drawn in a single figure.
+
+    The axes of the segments are laid out at the pixel positions of graph_images_info and the figure, its lines, std
+    areas, legend and the arrows of lines_info are created once. update only changes the data of the artists, so the
+    composite of each acrobatics is written with one savefig instead of one PNG per segment reopened, resized and
+    pasted with PIL.
+
+    Args:
+        graph_images_info (dict): "<segment>_all_axes_graph.png" -> (x, y) position of the top left corner in pixels.
+        lines_info (dict): Lines from the body to the graphs, as for add_lines_with_arrow_and_circle.
+        body_image_path (str): Image of the body, pasted at body_position with the size body_size.
+        bg_size (tuple): Size of the composite in pixels.
+        graph_size (tuple): Size of the area of each segment in pixels, tick labels included.
+    """
+
+    colors = ["red", "green", "blue"]
+    # Les graphiques etaient enregistres a 300 dpi en 333 x 200 puis agrandis a 366 x 220, soit 3.3 fois leur taille
+    # en points une fois affiches a 100 dpi
+    text_scale = 300 / 100 * 366 / 333
+
+    def __init__(
+        self,
+        graph_images_info,
+        lines_info=lines_info,
+        body_image_path="/home/lim/Documents/StageMathieu/DataTrampo/DALL_E_Body.png",
+        bg_size=(1920, 1082),
+        body_size=(383, 669),
+        body_position=(761, 228),
+        graph_size=(366, 220),
+        dpi=100,
+        line_width=2,
+        arrow_size=15,
+        circle_radius=5,
+    ):
+        self.bg_size = bg_size
+        self.dpi = dpi
+        self.fig = Figure(figsize=(bg_size[0] / dpi, bg_size[1] / dpi), dpi=dpi, facecolor="white")
+
+        try:
+            body_image = Image.open(body_image_path).resize(body_size, Image.Resampling.LANCZOS)
+            self.fig.figimage(
+                np.asarray(body_image), xo=body_position[0], yo=bg_size[1] - body_position[1] - body_size[1],
+                origin="upper", zorder=0,
+            )
+        except FileNotFoundError:
+            print("Body image file not found. Please upload the file and try again.")
+
+        # Marges dans la zone de chaque graphique pour les graduations et le label de l'axe x
+        margin_left, margin_bottom, margin_right, margin_top = 40, 40, 6, 6
+        self.axes = {}
+        self.lines = {}
+        self.areas = {}
+        for filename, (x, y) in graph_images_info.items():
+            member = filename.replace("_all_axes_graph.png", "")
+            ax = self.fig.add_axes([
+                (x + margin_left) / bg_size[0],
+                1 - (y + graph_size[1] - margin_bottom) / bg_size[1],
+                (graph_size[0] - margin_left - margin_right) / bg_size[0],
+                (graph_size[1] - margin_bottom - margin_top) / bg_size[1],
+            ])
+            ax.set_xlabel("Time (%)", fontsize=4 * self.text_scale)
+            ax.tick_params(axis="both", labelsize=3 * self.text_scale, width=0.3 * self.text_scale, length=1.5 * self.text_scale)
+            for spine in ax.spines.values():
+                spine.set_linewidth(0.3 * self.text_scale)
+            self.lines[member] = [
+                ax.plot([], [], label=["X", "Y", "Z"][axis], color=color, linewidth=0.3 * self.text_scale)[0]
+                for axis, color in enumerate(self.colors)
+            ]
+            self.areas[member] = [
+                ax.add_patch(Polygon(np.zeros((1, 2)), closed=True, alpha=0.4, facecolor=color, edgecolor="none"))
+                for color in self.colors
+            ]
+            self.axes[member] = ax
+
+        legend = self.fig.legend(
+            handles=next(iter(self.lines.values())),
+            loc="upper left",
+            bbox_to_anchor=(1723 / bg_size[0], 1),
+            prop={"size": 20, "weight": "bold"},
+        )
+        for line in legend.get_lines():
+            line.set_linewidth(4)
+
+        self._add_lines(lines_info, line_width, arrow_size, circle_radius)
+
+    def _to_figure(self, point):
+        return point[0] / self.bg_size[0], 1 - point[1] / self.bg_size[1]
+
+    def _add_lines(self, lines_info, line_width, arrow_size, circle_radius):
+        # Meme geometrie que add_lines_with_arrow_and_circle, en pixels convertis en coordonnees de la figure
+        for start, end in lines_info.values():
+            angle = math.atan2(end[1] - start[1], end[0] - start[0])
+            arrow_left = (
+                end[0] - arrow_size * math.cos(angle - math.pi / 6),
+                end[1] - arrow_size * math.sin(angle - math.pi / 6),
+            )
+            arrow_right = (
+                end[0] - arrow_size * math.cos(angle + math.pi / 6),
+                end[1] - arrow_size * math.sin(angle + math.pi / 6),
+            )
+            (start_x, start_y), (end_x, end_y) = self._to_figure(start), self._to_figure(end)
+            self.fig.add_artist(
+                Line2D(
+                    [start_x, end_x], [start_y, end_y], transform=self.fig.transFigure, color="black",
+                    linewidth=line_width * 72 / self.dpi, marker="o", markevery=[0],
+                    markersize=2 * circle_radius * 72 / self.dpi,
+                )
+            )
+            self.fig.add_artist(
+                Polygon(
+                    [self._to_figure(end), self._to_figure(arrow_left), self._to_figure(arrow_right)],
+                    closed=True, transform=self.fig.transFigure, color="black",
+                )
+            )
+
+    def update(self, mean_std):
+        """
+        Replace the data of the graphs, the segments without data are hidden.
+
+        Args:
+            mean_std (dict): Segment -> {axis index: (mean, std)} of shape (n_frames,).
+        """
+        for member, ax in self.axes.items():
+            member_data = mean_std.get(member, {})
+            ax.set_visible(len(member_data) > 0)
+            for axis, (line, area) in enumerate(zip(self.lines[member], self.areas[member])):
+                if axis not in member_data:
+                    line.set_visible(False)
+                    area.set_visible(False)
+                    continue
+                mean_data, std_dev_data = member_data[axis]
+                frames = np.arange(len(mean_data))
+                line.set_data(frames, mean_data)
+                area.set_xy(
+                    np.column_stack([
+                        np.concatenate([frames, frames[::-1]]),
+                        np.concatenate([mean_data - std_dev_data, (mean_data + std_dev_data)[::-1]]),
+                    ])
+                )
+                line.set_visible(True)
+                area.set_visible(True)
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+
+    def save(self, save_path):
+        self.fig.savefig(save_path, dpi=self.dpi)
+        return save_path
+
+
 def add_lines_with_arrow_and_circle(
     image_path, lines_info, line_width=2, arrow_size=15, circle_radius=5, scale_factor=4
 ):
@@ -0,0 +1,87 @@
+import math
+import numpy as np
+import pandas as pd
+
+
+# Fractions de la vrille totale dont on cherche le premier instant, ex: T10 et T75
+TWIST_FRACTIONS = (0.1, 0.75)
+TWIST_EVENT_COLUMNS = ["acrobatics", "participant", "trial", "expertise", "laterality", "fraction", "time"]
+
+
+def twist_crossings(twist, n_half_twist, laterality, fractions=TWIST_FRACTIONS, subsample=False):
+    """
+    First instant at which each trial reaches each fraction of its twist, for all the trials and fractions at once.
+
+    A fraction f is reached at the first time point where the twist has moved strictly more than
+    f * n_half_twist * pi from its initial value, towards negative values for a right-handed ("D") gymnast and
+    towards positive values otherwise.
+
+    Args:
+        twist (np.ndarray): Pelvis twist of shape (n_trials, n_points), e.g. the Pelvis_Z rotation of the trials.
+        n_half_twist (float): Number of half twists of the acrobatics (half_twists_per_movement).
+        laterality (str or array): "D" or "G", for all the trials or one per trial.
+        fractions (tuple): Fractions of the twist to detect.
+        subsample (bool): If True, the instant is linearly interpolated between the two time points around the
+            crossing instead of the first time point after it.
+
+    Returns:
+        np.ndarray: Instants (in time points) of shape (n_fractions, n_trials), NaN where the fraction is never
+            reached.
+    """
+    twist = np.atleast_2d(np.asarray(twist, dtype=float))
+    direction = np.where(np.char.startswith(np.asarray(laterality, dtype=str), "D"), -1.0, 1.0)
+    progress = direction.reshape(-1, 1) * (twist - twist[:, :1])
+    targets = np.asarray(fractions, dtype=float) * n_half_twist * math.pi
+
+    crossed = progress[np.newaxis] > targets[:, np.newaxis, np.newaxis]
+    is_reached = crossed.any(axis=2)
+    first_index = np.argmax(crossed, axis=2)
+    crossings = first_index.astype(float)
+
+    if subsample:
+        previous_index = np.maximum(first_index - 1, 0)
+        trial_index = np.arange(twist.shape[0])
+        previous_progress = progress[trial_index, previous_index]
+        next_progress = progress[trial_index, first_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = (targets[:, np.newaxis] - previous_progress) / (next_progress - previous_progress)
+        crossings = np.where(first_index > 0, previous_index + np.clip(weight, 0, 1), crossings)
+
+    crossings[~is_reached] = np.nan
+    return crossings
+
+
+def twist_event_rows(acrobatics, participant, trials, expertise, laterality, crossings, fractions=TWIST_FRACTIONS):
+    """
+    Rows of the twist event table (TWIST_EVENT_COLUMNS) of the trials of one participant, one row per trial and
+    fraction. time is NaN when the fraction is never reached.
+    """
+    rows = []
+    for fraction, fraction_crossings in zip(fractions, crossings):
+        for trial, time in zip(trials, fraction_crossings):
+            rows.append([acrobatics, participant, trial, expertise, laterality, fraction, time])
+    return rows
+
+
+def save_twist_events(file_path, rows):
+    pd.DataFrame(rows, columns=TWIST_EVENT_COLUMNS).to_csv(file_path, index=False)
+
+
+def load_twist_events(file_path):
+    return pd.read_csv(
+        file_path, dtype={"acrobatics": str, "participant": str, "trial": str, "expertise": str, "laterality": str}
+    )
+
+
+def select_twist_events(events, fraction, acrobatics=None, participant=None, reached_only=True):
+    """
+    Events of one fraction, optionally of one acrobatics and / or one participant, without the never reached ones.
+    """
+    mask = np.isclose(events["fraction"], fraction)
+    if acrobatics is not None:
+        mask &= events["acrobatics"] == acrobatics
+    if participant is not None:
+        mask &= events["participant"] == participant
+    if reached_only:
+        mask &= events["time"].notna()
+    return events[mask]
@@ -0,0 +1,251 @@
+import os
+import time
+import pickle
+import hashlib
+import argparse
+import traceback
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib import cm
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from .Function_cache import hash_inputs
+
+
+# kind : nom du rendu dans FIGURE_RENDERERS, data : dict de tableaux numpy, layout : dict de parametres de mise en page
+PlotSpec = namedtuple("PlotSpec", ["kind", "output_path", "data", "layout"])
+
+
+def _subplot_positions(n_columns, columns_to_exclude):
+    # Position de chaque colonne gardee dans la grille, les colonnes exclues ne laissent pas de trou
+    return {
+        i: i + 1 - sum(j < i for j in columns_to_exclude) for i in range(n_columns) if i not in columns_to_exclude
+    }
+
+
+def render_all_trials_grid(data, layout):
+    """
+    All the trials of a subject, one subplot per joint center axis.
+    data: trials (n_trials, n_frames, n_columns). layout: column_names, columns_to_exclude, trial_labels.
+    """
+    trials = data["trials"]
+    fig = Figure(figsize=(30, 30))
+    colors = cm.Blues(np.linspace(0.5, 1, trials.shape[0]))
+    for i, position in _subplot_positions(trials.shape[2], layout["columns_to_exclude"]).items():
+        ax = fig.add_subplot(6, 6, position)
+        for idx, trial in enumerate(trials[:, :, i]):
+            ax.plot(trial, label=f"subject1 Trial {layout['trial_labels'][idx]}", alpha=0.7, linewidth=1, color=colors[idx])
+        ax.set_title(f"{layout['column_names'][i]}")
+        ax.set_ylabel("Rotation (rad)" if i in (0, 1, 2) else "Position")
+        if i == 0:
+            legend_subject1 = Line2D([], [], color="blue", markersize=15, label="subject1")
+            ax.legend(handles=[legend_subject1], loc="upper right")
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.95, hspace=0.5, wspace=0.5)
+    return fig
+
+
+def render_sd_grid(data, layout):
+    """
+    SD between the trials of each joint center axis.
+    data: std (n_kept_columns, n_frames). layout: column_names, columns_to_exclude.
+    """
+    fig = Figure(figsize=(30, 24))
+    positions = _subplot_positions(len(layout["column_names"]), layout["columns_to_exclude"])
+    for std, (i, position) in zip(data["std"], positions.items()):
+        ax = fig.add_subplot(6, 6, position)
+        col_name = layout["column_names"][i]
+        ax.plot(std, label=f"subject1 - {col_name}", alpha=0.7, linewidth=1, color="blue")
+        ax.set_title(f"SD - {col_name}")
+        ax.set_ylabel("SD")
+        if i == 0:
+            ax.legend(loc="upper right")
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.95, hspace=0.5, wspace=0.5)
+    return fig
+
+
+def render_members_grid(data, layout):
+    """
+    Summed SD of the 3 axes of each member.
+    data: sd (n_members, n_frames). layout: members.
+    """
+    fig = Figure(figsize=(14, 16))
+    axs = fig.subplots(5, 2)
+    for i, member in enumerate(layout["members"]):
+        ax = axs[i // 2, i % 2]
+        ax.plot(data["sd"][i], color="blue")
+        ax.set_title(f"{member}")
+        ax.set_ylabel("SD")
+    fig.tight_layout()
+    return fig
+
+
+FIGURE_RENDERERS = {
+    "all_trials_grid": render_all_trials_grid,
+    "sd_grid": render_sd_grid,
+    "members_grid": render_members_grid,
+}
+
+
+def spec_digest(spec):
+    """
+    Digest of the kind, data and layout of a spec: the figure is rendered again only if it changes.
+    """
+    data_digests = [
+        (name, np.asarray(array).shape, hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest())
+        for name, array in sorted(spec.data.items())
+    ]
+    return hash_inputs(values=[spec.kind, data_digests, sorted(spec.layout.items())])
+
+
+def _digest_path(output_path):
+    return f"{output_path}.sha256"
+
+
+def is_up_to_date(spec, digest=None):
+    digest = digest or spec_digest(spec)
+    try:
+        with open(_digest_path(spec.output_path)) as file:
+            return os.path.exists(spec.output_path) and file.read() == digest
+    except FileNotFoundError:
+        return False
+
+
+def render_spec(spec, digest=None):
+    """
+    Render a spec with its renderer, save it at 200 dpi and store its digest next to the image.
+    Returns the traceback if the rendering failed, None otherwise.
+    """
+    try:
+        fig = FIGURE_RENDERERS[spec.kind](spec.data, spec.layout)
+        os.makedirs(os.path.dirname(spec.output_path) or ".", exist_ok=True)
+        fig.savefig(spec.output_path, dpi=spec.layout.get("dpi", 200))
+        with open(_digest_path(spec.output_path), "w") as file:
+            file.write(digest or spec_digest(spec))
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+class FigureQueue:
+    """
+    Queue of figures rendered off the analysis path.
+
+    mode "now" renders the specs over a pool of processes (headless, figures are drawn with the Agg canvas of
+    matplotlib.figure.Figure) while the analysis continues, "deferred" stores them in pending_path to be rendered
+    later with render_pending, "off" drops them. In every mode a spec whose data and layout did not change since the
+    last render of its image is skipped.
+    """
+
+    def __init__(self, mode="now", n_workers=None, pending_path=None):
+        if mode not in ("now", "deferred", "off"):
+            raise ValueError(f"mode {mode} is not implemented yet, please try now, deferred or off")
+        if mode == "deferred" and pending_path is None:
+            raise ValueError("A pending_path is needed to defer the rendering")
+        self.mode = mode
+        self.n_workers = n_workers
+        self.pending_path = pending_path
+        self.pending = []
+        self.futures = []
+        self.n_skipped = 0
+        self.failed = []
+        self.executor = None
+
+    def submit(self, spec):
+        if self.mode == "off":
+            return
+        digest = spec_digest(spec)
+        if is_up_to_date(spec, digest):
+            self.n_skipped += 1
+            return
+        if self.mode == "deferred":
+            self.pending.append(spec)
+            return
+        if self.executor is None:
+            if "fork" in multiprocessing.get_all_start_methods():
+                mp_context = multiprocessing.get_context("fork")
+            else:
+                mp_context = None
+            self.executor = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=mp_context)
+        self.futures.append((spec, self.executor.submit(render_spec, spec, digest)))
+
+    def close(self):
+        """
+        Wait for the figures being rendered (or write the pending specs) and print a summary.
+        """
+        start = time.perf_counter()
+        n_rendered = 0
+        for spec, future in self.futures:
+            error = future.result()
+            if error is None:
+                n_rendered += 1
+            else:
+                self.failed.append(spec)
+                print(f"Error for {spec.output_path}:\n{error}")
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+        if self.mode == "deferred":
+            write_pending(self.pending_path, self.pending)
+            print(f"{len(self.pending)} figures to render with render_pending, {self.n_skipped} up to date")
+        elif self.mode == "now":
+            print(
+                f"{n_rendered}/{len(self.futures)} figures rendered ({self.n_skipped} up to date), "
+                f"{time.perf_counter() - start:.1f} s waited"
+            )
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
+def write_pending(pending_path, specs):
+    # Les figures deja en attente d'une execution precedente sont gardees, la derniere version d'une image gagne
+    pending = {spec.output_path: spec for spec in read_pending(pending_path)}
+    pending.update({spec.output_path: spec for spec in specs})
+    with open(pending_path, "wb") as file:
+        pickle.dump(list(pending.values()), file)
+
+
+def read_pending(pending_path):
+    try:
+        with open(pending_path, "rb") as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return []
+
+
+def render_pending(pending_path, n_workers=None):
+    """
+    Render the figures deferred in pending_path. The file is removed once every figure is rendered, the figures
+    which failed are kept in it to be retried by the next call.
+    """
+    with FigureQueue("now", n_workers) as queue:
+        for spec in read_pending(pending_path):
+            queue.submit(spec)
+    os.remove(pending_path)
+    if queue.failed:
+        write_pending(pending_path, queue.failed)
+        print(f"{len(queue.failed)} figures failed, they are kept in {pending_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the figures deferred by an analysis")
+    parser.add_argument("pending_path", help="File of the pending figures")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of rendering processes")
+    args = parser.parse_args()
+    if os.path.exists(args.pending_path):
+        render_pending(args.pending_path, args.jobs)
+    else:
+        print("No figure to render")
+
+
+if __name__ == "__main__":
+    main()
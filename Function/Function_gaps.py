@@ -0,0 +1,129 @@
+import os
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import ezc3d
+
+
+GAP_COLUMNS = ["marker", "start", "length"]
+
+
+def nan_runs(is_missing):
+    """
+    Run-length encoding of the missing frames of all the markers at once.
+
+    Args:
+        is_missing (np.ndarray): Boolean array of shape (n_markers, n_frames), True where the marker is missing.
+
+    Returns:
+        tuple: Marker index, first frame and length of each run of missing frames, sorted by marker then frame.
+    """
+    is_missing = np.asarray(is_missing, dtype=bool)
+    padded = np.zeros((is_missing.shape[0], is_missing.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = is_missing
+    edges = np.diff(padded, axis=1)
+    # Les debuts (+1) et fins (-1) de trous sont dans le meme ordre marqueur par marqueur
+    marker_index, start = np.nonzero(edges == 1)
+    _, stop = np.nonzero(edges == -1)
+    return marker_index, start, stop - start
+
+
+def c3d_gaps(file_path, interval):
+    """
+    Gaps of every labelled marker (label not starting with "*") of a c3d file inside an interval. A frame is missing
+    if any of the x, y, z coordinates of the marker is NaN.
+
+    Args:
+        file_path (str): Path to the .c3d file.
+        interval (tuple): First and last frame (excluded) of the acrobatics.
+
+    Returns:
+        pd.DataFrame: One row per gap with the marker name, its first frame in the c3d and its length in frames.
+    """
+    c = ezc3d.c3d(file_path)
+    point_labels = c["parameters"]["POINT"]["LABELS"]["value"]
+    useful_indices = [index for index, label in enumerate(point_labels) if not label.startswith("*")]
+    start_frame, stop_frame = int(interval[0]), int(interval[1])
+    point_data = c["data"]["points"][:3, useful_indices, start_frame:stop_frame]
+
+    marker_index, start, length = nan_runs(np.isnan(point_data).any(axis=0))
+    return pd.DataFrame(
+        {
+            "marker": np.array([point_labels[index] for index in useful_indices], dtype=object)[marker_index],
+            "start": start + start_frame,
+            "length": length,
+        },
+        columns=GAP_COLUMNS,
+    )
+
+
+def gaps_file_path(file_path, output_dir):
+    return os.path.join(output_dir, f"{os.path.splitext(os.path.basename(file_path))[0]}_gaps.csv")
+
+
+def _scan_trial(file_path, interval, output_dir):
+    start = time.perf_counter()
+    try:
+        gaps = c3d_gaps(file_path, interval)
+        os.makedirs(output_dir, exist_ok=True)
+        gaps.to_csv(gaps_file_path(file_path, output_dir), index=False)
+        summary = {
+            "n_gaps": len(gaps),
+            "n_markers_with_gaps": gaps["marker"].nunique(),
+            "longest_gap": int(gaps["length"].max()) if len(gaps) else 0,
+            "missing_frames": int(gaps["length"].sum()),
+            "error": None,
+        }
+    except Exception:
+        summary = {
+            "n_gaps": np.nan,
+            "n_markers_with_gaps": np.nan,
+            "longest_gap": np.nan,
+            "missing_frames": np.nan,
+            "error": traceback.format_exc(),
+        }
+    summary["duration"] = time.perf_counter() - start
+    return summary
+
+
+def scan_gaps(trials, n_workers=None):
+    """
+    Scan the gaps of many trials over a process pool and write one table of gaps (marker, start, length) per trial
+    in its output directory (<trial>_gaps.csv).
+
+    Args:
+        trials (list): (c3d file, interval, output directory) of each trial.
+        n_workers (int): Number of processes, os.cpu_count() if None.
+
+    Returns:
+        pd.DataFrame: One row per trial, in the order of trials, with its number of gaps, of markers with gaps, the
+            longest gap and the total missing frames (NaN with the traceback in error if the trial failed).
+    """
+    n_workers = min(n_workers or os.cpu_count(), len(trials)) or 1
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+
+    start = time.perf_counter()
+    summaries = [None] * len(trials)
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(_scan_trial, file_path, interval, output_dir): i_trial
+            for i_trial, (file_path, interval, output_dir) in enumerate(trials)
+        }
+        for future in as_completed(futures):
+            summaries[futures[future]] = future.result()
+
+    summary = pd.DataFrame(summaries)
+    summary.insert(0, "file_path", [file_path for file_path, _, _ in trials])
+    summary.insert(1, "interval", [tuple(interval) for _, interval, _ in trials])
+
+    failed = summary[summary["error"].notna()]
+    for _, row in failed.iterrows():
+        print(f"Error for {row['file_path']}:\n{row['error']}")
+    print(f"{len(summary) - len(failed)}/{len(summary)} trials scanned in {time.perf_counter() - start:.1f} s")
+    return summary
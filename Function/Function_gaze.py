@@ -0,0 +1,174 @@
+import numpy as np
+from collections import namedtuple
+from .Function_cache import hash_inputs
+from .Function_resample import resample
+
+
+FOOT = 0.3048
+GROUND_TOLERANCE = 1e-6
+
+# Region du gymnase : bornes (min, max) en x, y, z (None = non bornee) et / ou valeurs de wall_index
+GazeRegion = namedtuple("GazeRegion", ["name", "bounds", "wall_values"], defaults=[(None, None, None), None])
+
+# Toile du trampoline (14 ft x 7 ft au sol) et sol du gymnase, comme dans les scripts de figures
+DEFAULT_GAZE_REGIONS = (
+    GazeRegion(
+        "trampoline_bed",
+        bounds=((-7 * FOOT, 7 * FOOT), (-3.5 * FOOT, 3.5 * FOOT), (-GROUND_TOLERANCE, GROUND_TOLERANCE)),
+    ),
+    GazeRegion("gymnasium_floor", bounds=(None, None, (None, GROUND_TOLERANCE))),
+)
+
+
+def wall_regions(wall_values):
+    """
+    One region wall_<value> for each value of wall_index, e.g. wall_regions(range(6)).
+    """
+    return tuple(GazeRegion(f"wall_{value}", wall_values=(value,)) for value in wall_values)
+
+
+def classify_gaze(gaze_position, regions=DEFAULT_GAZE_REGIONS, wall_index=None):
+    """
+    Label all the gaze samples at once against every region.
+
+    Args:
+        gaze_position (np.ndarray): Projected gaze positions, shape (n_samples, 3). Samples of several trials can be
+            concatenated.
+        regions (tuple): GazeRegion to test. A sample is in a region if it is inside all its bounds (inclusive) and,
+            if the region has wall_values, if its wall_index is one of them.
+        wall_index (np.ndarray): Wall index of each sample, needed only by the regions with wall_values.
+
+    Returns:
+        dict: Region name -> boolean mask of shape (n_samples,), True where the gaze is in the region.
+    """
+    gaze_position = np.asarray(gaze_position, dtype=float).reshape(-1, 3)
+    masks = {}
+    for region in regions:
+        mask = np.ones(gaze_position.shape[0], dtype=bool)
+        for axis, axis_bounds in enumerate(region.bounds):
+            if axis_bounds is None:
+                continue
+            lower, upper = axis_bounds
+            if lower is not None:
+                mask &= gaze_position[:, axis] >= lower
+            if upper is not None:
+                mask &= gaze_position[:, axis] <= upper
+        if region.wall_values is not None:
+            if wall_index is None:
+                raise ValueError(f"wall_index is needed to classify the gaze in {region.name}")
+            mask &= np.isin(np.ravel(wall_index), region.wall_values)
+        masks[region.name] = mask
+    return masks
+
+
+def flatten_trials(data_all_subject_acrobatics):
+    """
+    Trials of a nested array loaded from the .mat of Xsens_analysis.py (data[0][idx_mvt][0][idx_subject][0][idx_trial]).
+
+    Returns:
+        tuple: List of the (idx_mvt, idx_subject, idx_trial) of each trial and list of their arrays.
+    """
+    keys = []
+    trials = []
+    for idx_mvt, data_mvt in enumerate(data_all_subject_acrobatics[0]):
+        for idx_subject, data_subject in enumerate(data_mvt[0]):
+            for idx_trial, data_trial in enumerate(data_subject[0]):
+                keys.append((idx_mvt, idx_subject, idx_trial))
+                trials.append(data_trial)
+    return keys, trials
+
+
+class GazeRegionMasks:
+    """
+    Gaze region masks of all the trials of a cohort, computed in one pass over the concatenated samples, with for each
+    trial and region the time-normalised occupancy (resampled mask, between 0 and 1) and the proportion of samples in
+    the region.
+    """
+
+    def __init__(self, keys, offsets, masks, occupancy, proportion):
+        self.keys = [tuple(int(i) for i in key) for key in keys]
+        self.trial_index = {key: i_trial for i_trial, key in enumerate(self.keys)}
+        self.offsets = np.asarray(offsets)
+        self.masks = masks
+        self.occupancy = occupancy
+        self.proportion = proportion
+
+    @classmethod
+    def from_trials(cls, keys, gaze_trials, wall_index_trials=None, regions=DEFAULT_GAZE_REGIONS, num_points=100):
+        gaze_trials = [np.asarray(gaze, dtype=float).reshape(-1, 3) for gaze in gaze_trials]
+        offsets = np.concatenate(([0], np.cumsum([gaze.shape[0] for gaze in gaze_trials])))
+        wall_index = None
+        if wall_index_trials is not None:
+            wall_index = np.concatenate([np.ravel(wall) for wall in wall_index_trials])
+        masks = classify_gaze(np.concatenate(gaze_trials, axis=0), regions, wall_index)
+
+        # Un essai sans echantillon de regard a une occupation et une proportion NaN, comme avec safe_interpolate
+        n_samples = np.diff(offsets)
+        non_empty = n_samples > 0
+        occupancy = {}
+        proportion = {}
+        for name, mask in masks.items():
+            trial_masks = np.split(mask.astype(float), offsets[1:-1])
+            occupancy[name] = np.full((len(gaze_trials), num_points), np.nan)
+            for i_trial in np.flatnonzero(non_empty):
+                occupancy[name][i_trial] = resample(trial_masks[i_trial], num_points)
+            proportion[name] = np.full(len(gaze_trials), np.nan)
+            if non_empty.any():
+                # Les essais vides sont retires des offsets : reduceat n'accepte pas de segment vide
+                proportion[name][non_empty] = np.add.reduceat(mask, offsets[:-1][non_empty]) / n_samples[non_empty]
+        return cls(keys, offsets, masks, occupancy, proportion)
+
+    def mask(self, name, key):
+        i_trial = self.trial_index[key]
+        return self.masks[name][self.offsets[i_trial]: self.offsets[i_trial + 1]]
+
+    def to_arrays(self):
+        arrays = {"keys": np.array(self.keys, dtype=int).reshape(-1, 3), "offsets": self.offsets}
+        for name in self.masks:
+            arrays[f"mask_{name}"] = self.masks[name]
+            arrays[f"occupancy_{name}"] = self.occupancy[name]
+            arrays[f"proportion_{name}"] = self.proportion[name]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        names = [array_name[len("mask_"):] for array_name in arrays if array_name.startswith("mask_")]
+        return cls(
+            arrays["keys"],
+            arrays["offsets"],
+            {name: arrays[f"mask_{name}"] for name in names},
+            {name: arrays[f"occupancy_{name}"] for name in names},
+            {name: arrays[f"proportion_{name}"] for name in names},
+        )
+
+
+def load_gaze_region_masks(file_path, data_loaded, regions=DEFAULT_GAZE_REGIONS, num_points=100, cache=None):
+    """
+    Gaze region masks of all the trials of the .mat file written by Xsens_analysis.py. With an ArrayCache, they are
+    computed once and read again as long as the .mat file, the regions and num_points do not change.
+
+    Args:
+        file_path (str): Path of the .mat file (sd_pelvis_and_gaze_orientation.mat).
+        data_loaded (dict): Content of the .mat file.
+        regions (tuple): GazeRegion to classify.
+        num_points (int): Number of points of the time-normalised occupancy.
+        cache (ArrayCache): Cache of the masks.
+
+    Returns:
+        GazeRegionMasks: Masks indexed by (idx_mvt, idx_subject, idx_trial).
+    """
+    key = hash_inputs(file_paths=[file_path], values=["gaze_regions", tuple(regions), int(num_points)])
+    if cache is not None:
+        arrays = cache.get(key)
+        if arrays is not None:
+            return GazeRegionMasks.from_arrays(arrays)
+
+    keys, gaze_trials = flatten_trials(data_loaded["gaze_position_temporal_evolution_projected_all_subject_acrobatics"])
+    wall_index_trials = None
+    if any(region.wall_values is not None for region in regions):
+        _, wall_index_trials = flatten_trials(data_loaded["wall_index_all_subjects_acrobatics"])
+    gaze_region_masks = GazeRegionMasks.from_trials(keys, gaze_trials, wall_index_trials, regions, num_points)
+
+    if cache is not None:
+        cache.put(key, **gaze_region_masks.to_arrays())
+    return gaze_region_masks
@@ -0,0 +1,297 @@
+import numpy as np
+from .Function_rotation import (
+    relative_rotation,
+    rotation_matrix_to_euler,
+    euler_to_rotation_matrix,
+    quaternion_to_rotation_matrix,
+    rotation_matrix_z,
+)
+
+
+def segment_euler_sequences(nb_segments, select_dof=False):
+    """
+    Euler sequence of each segment of parent_list_marker: the shoulders (3, 6) are in zyx, the knees and elbows
+    (10, 13) have only their flexion x, all the other segments are in xyz. With select_dof every segment is in xyz.
+    """
+    euler_sequences = {}
+    for i_segment in range(nb_segments):
+        if select_dof is True:
+            euler_sequences[i_segment] = "xyz"
+        elif i_segment in (3, 6):
+            euler_sequences[i_segment] = "zyx"
+        elif i_segment in (10, 13):
+            euler_sequences[i_segment] = "x"
+        else:
+            euler_sequences[i_segment] = "xyz"
+    return euler_sequences
+
+
+def check_rotation_matrices(matrices, matrix_name="Matrix", rtol=1e-05, atol=1e-08):
+    """
+    Check in a single pass that stacked matrices (..., 3, 3) are rotation matrices (R.T @ R = I and det(R) = 1).
+    A summary is printed if some of them are not.
+
+    Returns:
+        np.ndarray: Boolean array of shape (...) , True where the matrix is a rotation matrix.
+    """
+    matrices = np.asarray(matrices)
+    identity = np.eye(3)
+    is_orthogonal = np.all(
+        np.isclose(np.swapaxes(matrices, -1, -2) @ matrices, identity, rtol=rtol, atol=atol), axis=(-2, -1)
+    )
+    is_determinant_one = np.isclose(np.linalg.det(matrices), 1, rtol=rtol, atol=atol)
+    is_valid = is_orthogonal & is_determinant_one
+
+    n_invalid = np.count_nonzero(~is_valid)
+    if n_invalid:
+        first_invalid = tuple(int(i) for i in np.argwhere(~is_valid)[0])
+        print(
+            f"Erreur : {n_invalid}/{is_valid.size} {matrix_name} ne sont pas orthogonales ou leur déterminant "
+            f"n'est pas 1 (premiere : {first_invalid})."
+        )
+    return is_valid
+
+
+def rotations_in_parent_frame(matrices, parent_list):
+    """
+    Rotation of each segment in the frame of its parent for all the frames.
+
+    Args:
+        matrices (np.ndarray): Rotation matrices of shape (nb_segments, nb_frames, 3, 3) in the global frame.
+        parent_list (dict): Segment name -> None for the root or [parent index, parent name], e.g. parent_list_marker.
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (nb_segments, nb_frames, 3, 3), the root stays in the global frame.
+    """
+    matrices = np.asarray(matrices)
+    parent_indices = [
+        parent_info[0] if parent_info is not None else i_segment
+        for i_segment, parent_info in enumerate(parent_list.values())
+    ]
+    rotations = relative_rotation(matrices[parent_indices], matrices)
+    for i_segment, parent_info in enumerate(parent_list.values()):
+        if parent_info is None:
+            rotations[i_segment] = matrices[i_segment]
+    return rotations
+
+
+def joint_angles_from_rotations(movement_matrix, relax_matrix_in_parent_frame, parent_list, euler_sequences):
+    """
+    Joint angles of a trial relative to the Relax reference pose, for all the segments and frames at once.
+
+    Args:
+        movement_matrix (np.ndarray): Rotation matrices of the trial, shape (nb_segments, nb_frames, 3, 3).
+        relax_matrix_in_parent_frame (np.ndarray): Reference rotation of each segment in its parent frame,
+            shape (nb_segments, 3, 3).
+        parent_list (dict): Parent of each segment, e.g. parent_list_marker.
+        euler_sequences (dict): Euler sequence of each segment index, e.g. from segment_euler_sequences.
+
+    Returns:
+        np.ndarray: Q of shape (nb_segments * 3, nb_frames). A segment with a sequence shorter than 3 axes fills only
+            its first rows, the others stay at zero.
+    """
+    nb_mat, nb_frames = movement_matrix.shape[:2]
+    mvt_in_parent_frame = rotations_in_parent_frame(movement_matrix, parent_list)
+    rot_mat_between = relative_rotation(relax_matrix_in_parent_frame[:, np.newaxis], mvt_in_parent_frame)
+
+    Q = np.zeros((nb_mat * 3, nb_frames))
+    for sequence in set(euler_sequences.values()):
+        segments = [i_segment for i_segment in range(nb_mat) if euler_sequences[i_segment] == sequence]
+        angles = rotation_matrix_to_euler(rot_mat_between[segments], sequence)
+        for i_segment, segment_angles in zip(segments, angles):
+            Q[i_segment * 3: i_segment * 3 + len(sequence), :] = segment_angles.T
+    return Q
+
+
+class ModelKinematics:
+    """
+    Forward kinematics of the markers of a biorbd model for a whole trial at once.
+
+    The structure of the model (parent, local JCS and translation / rotation sequences of each segment, local position
+    and segment of each marker) is read once from biorbd, then model.markers is replaced by stacked 4x4 products.
+    """
+
+    def __init__(self, model):
+        self.marker_names = [model.markerNames()[i].to_string() for i in range(model.nbMarkers())]
+        segment_names = [model.segment(i).name().to_string() for i in range(model.nbSegment())]
+
+        self.segments = []
+        i_dof = 0
+        for i_segment in range(model.nbSegment()):
+            segment = model.segment(i_segment)
+            parent_name = segment.parent().to_string()
+            seq_trans = segment.seqT().to_string()
+            seq_rot = segment.seqR().to_string()
+            self.segments.append(
+                {
+                    "parent": segment_names.index(parent_name) if parent_name in segment_names else None,
+                    "local_jcs": segment.localJCS().to_array(),
+                    "seq_trans": seq_trans,
+                    "trans_dofs": list(range(i_dof, i_dof + len(seq_trans))),
+                    "seq_rot": seq_rot,
+                    "rot_dofs": list(range(i_dof + len(seq_trans), i_dof + len(seq_trans) + len(seq_rot))),
+                }
+            )
+            i_dof += len(seq_trans) + len(seq_rot)
+        self.nb_q = i_dof
+
+        # parentId est l'identifiant du corps RBDL (corps virtuels des ddl, corps fixes >= 2**31), pas l'indice du
+        # segment biorbd : le segment du marqueur est retrouve par son nom
+        self.marker_parents = np.array(
+            [segment_names.index(model.marker(i).parent().to_string()) for i in range(model.nbMarkers())], dtype=int
+        )
+        self.marker_local_positions = np.array([model.marker(i).to_array() for i in range(model.nbMarkers())])
+
+    def segments_global_rt(self, Q):
+        """
+        Global RT matrices of all the segments, shape (nb_segments, nb_frames, 4, 4), from Q of shape (nb_q, nb_frames).
+        """
+        nb_frames = Q.shape[1]
+        global_rt = np.zeros((len(self.segments), nb_frames, 4, 4))
+        for i_segment, segment in enumerate(self.segments):
+            local_rt = np.broadcast_to(np.eye(4), (nb_frames, 4, 4)).copy()
+            for axis, i_dof in zip(segment["seq_trans"], segment["trans_dofs"]):
+                local_rt[:, "xyz".index(axis), 3] = Q[i_dof]
+            if segment["seq_rot"]:
+                local_rt[:, :3, :3] = euler_to_rotation_matrix(Q[segment["rot_dofs"]].T, segment["seq_rot"])
+            local_rt = segment["local_jcs"] @ local_rt
+
+            # Les segments de biorbd sont ordonnes, le parent est toujours calcule avant l'enfant
+            if segment["parent"] is None:
+                global_rt[i_segment] = local_rt
+            else:
+                global_rt[i_segment] = global_rt[segment["parent"]] @ local_rt
+        return global_rt
+
+    def markers(self, Q):
+        """
+        Global position of all the markers, shape (3, nb_markers, nb_frames) as filled from model.markers.
+        """
+        global_rt = self.segments_global_rt(Q)[self.marker_parents]
+        markers = (
+            np.einsum("mfij,mj->mfi", global_rt[..., :3, :3], self.marker_local_positions) + global_rt[..., :3, 3]
+        )
+        return markers.transpose(2, 0, 1)
+
+
+def joint_centers_in_pelvis_frame(markers_JC, movement_matrix, Q_complet, marker_names):
+    """
+    Joint centers expressed in the pelvis frame, centred on the middle of the hips, for all the frames at once.
+    The row of JC_pelvis keeps the pelvis coordinates Q_complet[3:6] as in the original per-frame loop.
+
+    Args:
+        markers_JC (np.ndarray): Global joint centers, shape (3, nb_markers, nb_frames).
+        movement_matrix (np.ndarray): Rotation matrices of the segments, shape (nb_segments, nb_frames, 3, 3).
+        Q_complet (np.ndarray): Pelvis translation followed by the joint angles, shape (nb_q, nb_frames).
+        marker_names (list): Names of the markers in the order of markers_JC.
+
+    Returns:
+        np.ndarray: Joint centers in the pelvis frame, shape (3, nb_markers, nb_frames).
+    """
+    pelvis_index = marker_names.index("JC_pelvis")
+    hip_right_index = marker_names.index("JC_CuisseD")
+    hip_left_index = marker_names.index("JC_CuisseG")
+
+    mid_hip_pos = (markers_JC[:, hip_right_index, :] + markers_JC[:, hip_left_index, :]) / 2
+    pelvis_matrix = movement_matrix[pelvis_index]
+    Jc_in_pelvis_frame = np.einsum("fji,jmf->imf", pelvis_matrix, markers_JC - mid_hip_pos[:, np.newaxis, :])
+    Jc_in_pelvis_frame[:, pelvis_index, :] = Q_complet[3:6, :]
+    return Jc_in_pelvis_frame
+
+
+# Segments dont la longueur est calculee pour chaque frame (proximal, distal), dans l'ordre de length_segment
+XSENS_SEGMENT_LENGTHS = [
+    ("UpperArmR", "LowerArmR"),
+    ("LowerArmR", "HandR"),
+    ("UpperArmL", "LowerArmL"),
+    ("LowerArmL", "HandL"),
+    ("UpperLegR", "LowerLegR"),
+    ("LowerLegR", "FootR"),
+    ("UpperLegL", "LowerLegL"),
+    ("LowerLegL", "FootL"),
+]
+
+# Articulations dont les axes x et y sont permutes (x <- -y, y <- x) apres le passage dans le repere du pelvis
+XSENS_SWAPPED_JOINTS = [
+    "Head", "UpperArmR", "LowerArmR", "HandR", "UpperArmL", "LowerArmL", "HandL", "LowerLegR", "FootR", "LowerLegL",
+    "FootL",
+]
+
+
+def xsens_segment_rotations(Xsens_orientation_per_move, i_segment, move_orientation=None):
+    """
+    Rotation matrices of a Xsens segment for all the frames, same as calculer_rotation_et_angle frame by frame.
+
+    Args:
+        Xsens_orientation_per_move (np.ndarray): Quaternions (w, x, y, z) of the segments, shape (n_frames, 4 * n).
+        i_segment (int): Index of the segment in the quaternion columns.
+        move_orientation (int): If given, the rotation around z of the orientation of the movement is applied
+            (-pi / 2 if move_orientation == 1, -3 pi / 2 otherwise).
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (n_frames, 3, 3).
+    """
+    rotations = quaternion_to_rotation_matrix(Xsens_orientation_per_move[:, i_segment * 4: (i_segment + 1) * 4])
+    if move_orientation is None:
+        return rotations
+    z_angle = -np.pi / 2 if move_orientation == 1 else -3 * np.pi / 2
+    return rotation_matrix_z(z_angle) @ rotations
+
+
+def xsens_segment_lengths(Xsens_position, joint_names, segments=XSENS_SEGMENT_LENGTHS):
+    """
+    Length of the segments for all the frames at once.
+
+    Args:
+        Xsens_position (np.ndarray): Positions of the joints, shape (3, n_joints, n_frames).
+        joint_names (list): Names of the joints in the order of Xsens_position.
+        segments (list): (proximal, distal) joint names of each segment.
+
+    Returns:
+        np.ndarray: Lengths of shape (n_frames, n_segments).
+    """
+    proximal = [joint_names.index(proximal_name) for proximal_name, _ in segments]
+    distal = [joint_names.index(distal_name) for _, distal_name in segments]
+    return np.linalg.norm(Xsens_position[:, proximal, :] - Xsens_position[:, distal, :], axis=0).T
+
+
+def xsens_joint_centers_in_pelvis_frame(Xsens_positions, Xsens_orientation_per_move, move_orientation, joint_names):
+    """
+    Xsens joint centers in the pelvis frame, centred on the middle of the hips, for all the frames and joints at once.
+    The row of the pelvis holds the xyz Euler angles of the pelvis turned by the orientation of the movement, as in
+    the former per-frame loop of get_JC_Marker_from_Xsens.py.
+
+    Args:
+        Xsens_positions (np.ndarray): Positions of the joints, shape (3, n_joints, n_frames).
+        Xsens_orientation_per_move (np.ndarray): Quaternions of the same joints, shape (n_frames, 4 * n_joints).
+        move_orientation (int): Orientation of the movement, see xsens_segment_rotations.
+        joint_names (list): Names of the joints, with Pelvis, UpperLegR and UpperLegL.
+
+    Returns:
+        np.ndarray: Joint centers of shape (3, n_joints, n_frames).
+    """
+    pelvis_index = joint_names.index("Pelvis")
+    mid_hip_pos = (
+        Xsens_positions[:, joint_names.index("UpperLegR"), :] + Xsens_positions[:, joint_names.index("UpperLegL"), :]
+    ) / 2
+
+    rot_mov_without_zrot = xsens_segment_rotations(Xsens_orientation_per_move, pelvis_index)
+    rot_mov = xsens_segment_rotations(Xsens_orientation_per_move, pelvis_index, move_orientation)
+    check_rotation_matrices(rot_mov_without_zrot, "rot_mov_without_zrot")
+    check_rotation_matrices(rot_mov, "rot_mov")
+
+    # R.T @ (P - mid_hip) pour toutes les frames et articulations
+    Jc_in_pelvis_frame = np.einsum(
+        "fji,jmf->imf", rot_mov_without_zrot, Xsens_positions - mid_hip_pos[:, np.newaxis, :]
+    )
+    Jc_in_pelvis_frame[:, pelvis_index, :] = rotation_matrix_to_euler(rot_mov, "xyz").T
+    return Jc_in_pelvis_frame
+
+
+def swap_xy_axes(Jc_in_pelvis_frame, joint_names, swapped_joints=XSENS_SWAPPED_JOINTS):
+    """
+    x <- -y and y <- x for the joints of swapped_joints present in joint_names, as a single index permutation.
+    """
+    swapped = [i_joint for i_joint, name in enumerate(joint_names) if name in swapped_joints]
+    Jc_in_pelvis_frame[:2, swapped, :] = Jc_in_pelvis_frame[[1, 0]][:, swapped, :] * np.array([-1, 1])[:, np.newaxis, np.newaxis]
+    return Jc_in_pelvis_frame
@@ -0,0 +1,194 @@
+import os
+import sys
+import glob
+import json
+import time
+import fnmatch
+import hashlib
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# module : script lance avec python -m, inputs / outputs : motifs glob (chemins absolus, ** recursif)
+Stage = namedtuple("Stage", ["name", "module", "inputs", "outputs"])
+
+
+def _expand(patterns):
+    paths = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    paths.update(os.path.join(root, file) for file in files)
+            else:
+                paths.add(path)
+    return sorted(paths)
+
+
+def _patterns_overlap(pattern_a, pattern_b):
+    return pattern_a == pattern_b or fnmatch.fnmatch(pattern_a, pattern_b) or fnmatch.fnmatch(pattern_b, pattern_a)
+
+
+class Pipeline:
+    """
+    Incremental runner of a graph of stages (scripts) communicating through files.
+
+    A stage depends on the stages whose outputs match one of its inputs. It is run again only if the content of its
+    inputs or of its script changed since its last successful run, or if one of its outputs is missing, so a change
+    (a new participant, a fixed labelling interval) only reruns the stages downstream of the modified files. Inside a
+    stage, the trials already computed are reused through the content-hash caches of the scripts (Kalman cache, relax
+    reference, gaze masks, filtered signals). Independent stages are run in parallel.
+
+    The digests of the files are stored in the state file with their size and modification time, an unchanged file
+    is not read again.
+    """
+
+    def __init__(self, stages, state_path, package_dir, python=sys.executable):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.package_dir = package_dir
+        self.python = python
+        try:
+            with open(state_path) as file:
+                self.state = json.load(file)
+        except FileNotFoundError:
+            self.state = {"stages": {}, "files": {}}
+
+        self.dependencies = {
+            stage.name: sorted(
+                other.name
+                for other in stages
+                if other.name != stage.name
+                and any(_patterns_overlap(output, input) for output in other.outputs for input in stage.inputs)
+            )
+            for stage in stages
+        }
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visited = {}
+
+        def visit(name, path):
+            if visited.get(name) == "done":
+                return
+            if visited.get(name) == "visiting":
+                raise ValueError(f"The stages contain a cycle: {' -> '.join(path + [name])}")
+            visited[name] = "visiting"
+            for dependency in self.dependencies[name]:
+                visit(dependency, path + [name])
+            visited[name] = "done"
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _file_digest(self, path):
+        stat = os.stat(path)
+        known = self.state["files"].get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        self.state["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def module_path(self, stage):
+        return os.path.join(self.package_dir, *stage.module.split(".")) + ".py"
+
+    def input_digest(self, stage):
+        """
+        Digest of the script of the stage and of the path and content of all the files matched by its inputs.
+        """
+        digest = hashlib.sha256()
+        for path in [self.module_path(stage)] + _expand(stage.inputs):
+            digest.update(path.encode())
+            digest.update(self._file_digest(path).encode())
+        return digest.hexdigest()
+
+    def is_stale(self, stage):
+        if self.state["stages"].get(stage.name) != self.input_digest(stage):
+            return True
+        return any(len(glob.glob(output, recursive=True)) == 0 for output in stage.outputs)
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.state, file)
+        os.replace(tmp_path, self.state_path)
+
+    def _run_stage(self, stage):
+        start = time.perf_counter()
+        environment = dict(os.environ, MPLBACKEND="Agg")
+        package_name = os.path.basename(os.path.normpath(self.package_dir))
+        completed = subprocess.run(
+            [self.python, "-m", f"{package_name}.{stage.module}"],
+            cwd=os.path.dirname(os.path.normpath(self.package_dir)),
+            env=environment,
+        )
+        return completed.returncode, time.perf_counter() - start
+
+    def run(self, targets=None, force=(), n_workers=None, dry_run=False):
+        """
+        Run the stale stages needed by targets (all the stages if None) once their dependencies are done.
+
+        Args:
+            targets (list): Names of the stages to bring up to date, with their upstream stages.
+            force (tuple): Names of the stages to run even if they are up to date.
+            n_workers (int): Number of stages run at the same time, os.cpu_count() if None.
+            dry_run (bool): Only print the stages which would be run (a stage downstream of a stale stage is
+                considered stale).
+
+        Returns:
+            dict: Stage name -> "up to date", "done", "failed", "skipped" (a dependency failed) or "stale" (dry run).
+        """
+        selected = set()
+        to_visit = list(targets if targets is not None else self.stages)
+        while to_visit:
+            name = to_visit.pop()
+            if name not in selected:
+                selected.add(name)
+                to_visit += self.dependencies[name]
+
+        status = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+            while len(status) < len(selected):
+                for name in sorted(selected - set(status) - set(running)):
+                    dependencies = self.dependencies[name]
+                    if any(dependency not in status for dependency in dependencies):
+                        continue
+                    stage = self.stages[name]
+                    if any(status[dependency] in ("failed", "skipped") for dependency in dependencies):
+                        status[name] = "skipped"
+                    elif dry_run:
+                        # Les entrees d'un etage en aval ne sont pas encore recalculees
+                        upstream_stale = any(status[dependency] == "stale" for dependency in dependencies)
+                        is_stale = name in force or upstream_stale or self.is_stale(stage)
+                        status[name] = "stale" if is_stale else "up to date"
+                    elif name not in force and not self.is_stale(stage):
+                        status[name] = "up to date"
+                    else:
+                        print(f"{name} is running")
+                        running[name] = executor.submit(self._run_stage, stage)
+
+                if not running:
+                    continue
+                done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name, future in list(running.items()):
+                    if future not in done:
+                        continue
+                    del running[name]
+                    return_code, duration = future.result()
+                    if return_code == 0:
+                        # Digest des entrees apres l'execution : un etage qui reecrit ses entrees reste a jour
+                        self.state["stages"][name] = self.input_digest(self.stages[name])
+                        self.save_state()
+                        status[name] = "done"
+                    else:
+                        status[name] = "failed"
+                    print(f"{name}: {status[name]} in {duration:.1f} s")
+
+        self.save_state()
+        return status
@@ -0,0 +1,146 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from .Function_Class_Basics import calculate_rmsd
+
+
+def marker_residuals(markers, pos_recons):
+    """
+    Distance between the experimental and reconstructed position of each marker, shape (n_markers, n_frames).
+    It is NaN where the experimental marker is missing.
+    """
+    return np.linalg.norm(markers - pos_recons, axis=0)
+
+
+def _json_float(value):
+    # NaN (marqueur jamais vu) n'est pas du JSON valide, il est ecrit null
+    return None if np.isnan(value) else float(value)
+
+
+def quality_by_frame(markers, pos_recons):
+    """
+    Per-frame residuals of a Kalman reconstruction, stored with the reconstruction in the cache.
+
+    Returns:
+        dict: rmsd_by_frame (as calculate_rmsd, in meters) and n_missing_by_frame, arrays of shape (n_frames,).
+    """
+    return {
+        "rmsd_by_frame": calculate_rmsd(markers, pos_recons),
+        "n_missing_by_frame": np.count_nonzero(np.isnan(marker_residuals(markers, pos_recons)), axis=0),
+    }
+
+
+def reconstruction_quality(markers, pos_recons, marker_names, n_worst=5):
+    """
+    Summary of the residuals of a Kalman reconstruction, all in meters, as written in the quality record.
+
+    Args:
+        markers (np.ndarray): Experimental markers, shape (3, n_markers, n_frames).
+        pos_recons (np.ndarray): Reconstructed markers, same shape.
+        marker_names (list): Names of the markers of the model.
+        n_worst (int): Number of markers reported in worst_markers.
+
+    Returns:
+        dict: n_frames, mean_rmsd, max_rmsd, n_missing, worst_markers (names sorted by decreasing RMSD), rmsd_by_marker
+            and missing_by_marker (dict by marker name, RMSD None for a marker missing in all the frames).
+    """
+    residuals = marker_residuals(markers, pos_recons)
+    is_missing = np.isnan(residuals)
+    rmsd_by_frame = calculate_rmsd(markers, pos_recons)
+
+    n_present = np.count_nonzero(~is_missing, axis=1)
+    sum_squared = np.nansum(residuals**2, axis=1)
+    rmsd_by_marker = np.full(len(marker_names), np.nan)
+    rmsd_by_marker[n_present > 0] = np.sqrt(sum_squared[n_present > 0] / n_present[n_present > 0])
+
+    order = np.argsort(np.where(np.isnan(rmsd_by_marker), -np.inf, rmsd_by_marker))[::-1]
+    worst_markers = [marker_names[i] for i in order[:n_worst] if not np.isnan(rmsd_by_marker[i])]
+
+    return {
+        "n_frames": int(markers.shape[2]),
+        "mean_rmsd": _json_float(np.mean(rmsd_by_frame)),
+        "max_rmsd": _json_float(np.max(rmsd_by_frame)),
+        "n_missing": int(np.count_nonzero(is_missing)),
+        "worst_markers": worst_markers,
+        "rmsd_by_marker": {name: _json_float(value) for name, value in zip(marker_names, rmsd_by_marker)},
+        "missing_by_marker": {name: int(value) for name, value in zip(marker_names, is_missing.sum(axis=1))},
+    }
+
+
+def quality_record_path(file_path):
+    """
+    Path of the quality record of a trial, next to its c3d file (<trial>_quality.json).
+    """
+    return f"{os.path.splitext(file_path)[0]}_quality.json"
+
+
+def save_quality_record(file_path, interval, quality):
+    record = {"file_path": file_path, "interval": [int(interval[0]), int(interval[1])], **quality}
+    with open(quality_record_path(file_path), "w") as file:
+        json.dump(record, file, allow_nan=False)
+
+
+def load_quality_record(file_path, interval=None):
+    """
+    Quality record of the trial file_path, None if it was never reconstructed or, when interval is given, if the
+    record is from another interval of the same c3d.
+    """
+    try:
+        with open(quality_record_path(file_path)) as file:
+            record = json.load(file)
+    except FileNotFoundError:
+        return None
+    if interval is not None and record["interval"] != [int(interval[0]), int(interval[1])]:
+        return None
+    return record
+
+
+def quality_summary(file_paths, max_rmsd=None, intervals=None):
+    """
+    Cohort table with one row per trial from the stored quality records (trials without record are skipped).
+
+    Args:
+        file_paths (list): c3d files of the trials.
+        max_rmsd (float): If given, the column out_of_bounds flags the trials whose maximal RMSD is above it.
+        intervals (list): If given, interval of each trial, a record from another interval is skipped.
+
+    Returns:
+        pd.DataFrame: file_path, interval, n_frames, mean_rmsd, max_rmsd, n_missing, worst_markers (and out_of_bounds).
+    """
+    rows = []
+    if intervals is None:
+        intervals = [None] * len(file_paths)
+    for file_path, interval in zip(file_paths, intervals):
+        record = load_quality_record(file_path, interval)
+        if record is None:
+            continue
+        rows.append(
+            {
+                "file_path": record["file_path"],
+                "interval": tuple(record["interval"]),
+                "n_frames": record["n_frames"],
+                "mean_rmsd": record["mean_rmsd"],
+                "max_rmsd": record["max_rmsd"],
+                "n_missing": record["n_missing"],
+                "worst_markers": " ".join(record["worst_markers"]),
+            }
+        )
+    summary = pd.DataFrame(
+        rows, columns=["file_path", "interval", "n_frames", "mean_rmsd", "max_rmsd", "n_missing", "worst_markers"]
+    )
+    if max_rmsd is not None:
+        summary["out_of_bounds"] = summary["max_rmsd"] > max_rmsd
+    return summary
+
+
+def trials_out_of_bounds(file_paths, max_rmsd, intervals=None):
+    """
+    Trials to reconstruct again: those without quality record (for their interval if intervals is given) or whose
+    maximal RMSD is above max_rmsd.
+    """
+    summary = quality_summary(file_paths, max_rmsd, intervals)
+    recorded = set(summary["file_path"])
+    return [file_path for file_path in file_paths if file_path not in recorded] + summary[
+        summary["out_of_bounds"]
+    ]["file_path"].tolist()
@@ -0,0 +1,116 @@
+import os
+import time
+import traceback
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import biorbd
+
+
+ReconstructionJob = namedtuple("ReconstructionJob", ["file_path", "interval", "model_path"])
+ReconstructionResult = namedtuple("ReconstructionResult", ["job", "output", "duration", "error"])
+
+
+def _run_jobs_with_model(model_path, jobs, task, task_kwargs):
+    """
+    Worker: load the biorbd model once and run the task on every job sharing this model.
+    An exception in one job is stored in its result and does not stop the other jobs.
+    """
+    model = biorbd.Model(model_path)
+    results = []
+    for job in jobs:
+        start = time.perf_counter()
+        try:
+            output = task(job.file_path, job.interval, model, **task_kwargs)
+            error = None
+        except Exception:
+            output = None
+            error = traceback.format_exc()
+        results.append(ReconstructionResult(job, output, time.perf_counter() - start, error))
+    return results
+
+
+def _iter_job_groups(jobs, task, n_workers, task_kwargs):
+    # Un groupe par modele, rendu des que son worker a fini : (indices des essais dans jobs, resultats)
+    job_indices_by_model = {}
+    for i_job, job in enumerate(jobs):
+        job_indices_by_model.setdefault(job.model_path, []).append(i_job)
+
+    n_workers = min(n_workers or os.cpu_count(), len(job_indices_by_model)) or 1
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(
+                _run_jobs_with_model, model_path, [jobs[i_job] for i_job in job_indices], task, task_kwargs
+            ): job_indices
+            for model_path, job_indices in job_indices_by_model.items()
+        }
+        for future in as_completed(futures):
+            job_indices = futures[future]
+            try:
+                group_results = future.result()
+            except Exception:
+                # Le worker lui-meme a echoue (ex: modele introuvable), tous ses essais sont en erreur
+                error = traceback.format_exc()
+                group_results = [ReconstructionResult(jobs[i_job], None, 0.0, error) for i_job in job_indices]
+            # La reference du futur est liberee pour que les sorties du groupe ne restent pas en memoire
+            del futures[future]
+            yield job_indices, group_results
+
+
+def iter_reconstruction_jobs(jobs, task, n_workers=None, **task_kwargs):
+    """
+    Run the reconstruction of many trials over a process pool as run_reconstruction_jobs, but yield the results of
+    each model (one participant) as soon as its worker finished. The outputs can then be written and released before
+    the rest of the cohort is reconstructed.
+
+    Yields:
+        list: ReconstructionResult of the jobs sharing a model path, in the order of jobs.
+    """
+    for _, group_results in _iter_job_groups(jobs, task, n_workers, task_kwargs):
+        yield group_results
+
+
+def run_reconstruction_jobs(jobs, task, n_workers=None, **task_kwargs):
+    """
+    Run the reconstruction of many trials over a process pool.
+
+    The jobs are grouped by model path so that each worker loads the biorbd.Model of a participant once and reuses
+    it for all the trials of this participant.
+
+    Args:
+        jobs (list): ReconstructionJob (c3d file, interval, model path) to run.
+        task (callable): Function called as task(file_path, interval, model, **task_kwargs), e.g. get_all_matrice.
+            It must be defined at module level to be sent to the workers.
+        n_workers (int): Number of processes, os.cpu_count() if None.
+
+    Returns:
+        list: ReconstructionResult (job, output, duration in s, error traceback or None) in the order of the jobs.
+    """
+    start = time.perf_counter()
+    results = [None] * len(jobs)
+    for job_indices, group_results in _iter_job_groups(jobs, task, n_workers, task_kwargs):
+        for i_job, result in zip(job_indices, group_results):
+            results[i_job] = result
+
+    print_reconstruction_summary(results, time.perf_counter() - start)
+    return results
+
+
+def print_reconstruction_summary(results, total_duration=None):
+    failed = [result for result in results if result.error is not None]
+    for result in results:
+        file_name = os.path.basename(result.job.file_path)
+        status = "FAILED" if result.error is not None else "ok"
+        print(f"{file_name} {result.job.interval}: {status} in {result.duration:.1f} s")
+    for result in failed:
+        print(f"Error for {result.job.file_path}:\n{result.error}")
+
+    summary = f"{len(results) - len(failed)}/{len(results)} trials reconstructed"
+    if total_duration is not None:
+        summary += f" in {total_duration:.1f} s"
+    print(summary)
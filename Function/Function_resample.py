@@ -0,0 +1,66 @@
+import numpy as np
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def resample_weights(n_frames, num_points):
+    """
+    Indices of the two surrounding frames and weight of the second one for each of the num_points resampled points,
+    same positions as np.interp(np.linspace(0, 1, num_points), np.linspace(0, 1, n_frames), x).
+    The weights only depend on the lengths, they are shared by every channel and trial of this length.
+    """
+    if n_frames == 1:
+        zeros = np.zeros(num_points, dtype=int)
+        return zeros, zeros, np.zeros(num_points)
+    position = np.linspace(0, 1, num_points) * (n_frames - 1)
+    index_before = np.clip(np.floor(position).astype(int), 0, n_frames - 2)
+    weight_after = position - index_before
+    return index_before, index_before + 1, weight_after
+
+
+def _resample_finite(x, num_points):
+    # Interpolation d'un canal sur ses seules valeurs finies, les NaN ne sont pas propages
+    finite_mask = np.isfinite(x)
+    if not finite_mask.any():
+        return np.full(num_points, np.nan)
+    return np.interp(np.linspace(0, 1, num_points), np.linspace(0, 1, len(x))[finite_mask], x[finite_mask])
+
+
+def resample(data, num_points=100, axis=None, nan_policy="propagate", round_values=False):
+    """
+    Time-normalise data to num_points with a linear interpolation of all the channels (and trials) at once.
+
+    Args:
+        data (np.ndarray): Array of shape (frames,), (frames, channels) or (trials, frames, channels).
+        num_points (int): Number of points after resampling.
+        axis (int): Axis of the frames. By default 0 for a 1D or 2D array and 1 for a 3D array.
+        nan_policy (str): "propagate" interpolates the NaN as any value, "omit" interpolates each channel containing
+            NaN only on its finite values (all NaN if there are none), as safe_interpolate.
+        round_values (bool): Round the resampled values to the nearest integer, as safe_interpolate. The result is
+            an integer array when it contains no NaN.
+
+    Returns:
+        np.ndarray: Array with the frames axis of length num_points.
+    """
+    data = np.asarray(data, dtype=float)
+    if axis is None:
+        axis = 0 if data.ndim <= 2 else 1
+    if nan_policy not in ("propagate", "omit"):
+        raise ValueError(f"nan_policy {nan_policy} is not implemented yet, please try propagate or omit")
+
+    frames_last = np.moveaxis(data, axis, -1)
+    index_before, index_after, weight_after = resample_weights(frames_last.shape[-1], num_points)
+    resampled = frames_last[..., index_before] * (1 - weight_after) + frames_last[..., index_after] * weight_after
+
+    if nan_policy == "omit":
+        # Seuls les canaux contenant des NaN sont interpoles un par un
+        channels_with_nan = ~np.isfinite(frames_last).all(axis=-1)
+        for channel in np.argwhere(channels_with_nan):
+            resampled[tuple(channel)] = _resample_finite(frames_last[tuple(channel)], num_points)
+
+    resampled = np.moveaxis(resampled, -1, axis)
+    if round_values:
+        resampled = np.round(resampled)
+        if np.isfinite(resampled).all():
+            resampled = resampled.astype(int)
+    return resampled
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def quaternion_to_rotation_matrix(quaternions):
+    """
+    Convert an array of quaternions (w, x, y, z) into rotation matrices, same convention as biorbd.Quaternion.toMatrix.
+
+    Args:
+        quaternions (np.ndarray): Array of shape (..., 4). The quaternions are normalised before conversion.
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (..., 3, 3).
+    """
+    quaternions = np.asarray(quaternions, dtype=float)
+    quat_normalized = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(quat_normalized, -1, 0)
+
+    rotation_matrices = np.empty(quaternions.shape[:-1] + (3, 3))
+    rotation_matrices[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    rotation_matrices[..., 0, 1] = 2 * (x * y - z * w)
+    rotation_matrices[..., 0, 2] = 2 * (x * z + y * w)
+    rotation_matrices[..., 1, 0] = 2 * (x * y + z * w)
+    rotation_matrices[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    rotation_matrices[..., 1, 2] = 2 * (y * z - x * w)
+    rotation_matrices[..., 2, 0] = 2 * (x * z - y * w)
+    rotation_matrices[..., 2, 1] = 2 * (y * z + x * w)
+    rotation_matrices[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return rotation_matrices
+
+
+def rotation_matrix_z(angle):
+    """
+    Rotation matrix around z, same as biorbd.Rotation.fromEulerAngles(np.array([angle]), "z").to_array()
+    """
+    cos_angle = np.cos(angle)
+    sin_angle = np.sin(angle)
+    return np.array(
+        [
+            [cos_angle, -sin_angle, 0.0],
+            [sin_angle, cos_angle, 0.0],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+
+
+def relative_rotation(parent_matrices, child_matrices):
+    """
+    Rotation of the child expressed in the parent frame (R_parent.T @ R_child) for stacked matrices (..., 3, 3).
+    The transpose replaces np.linalg.inv as the matrices are orthogonal.
+    """
+    return np.swapaxes(parent_matrices, -1, -2) @ child_matrices
+
+
+def rotation_matrix_to_euler(rotation_matrices, sequence):
+    """
+    Extract the Euler angles of stacked rotation matrices, same formulas as biorbd.Rotation.toEulerAngles.
+
+    Args:
+        rotation_matrices (np.ndarray): Array of shape (..., 3, 3).
+        sequence (str): Euler sequence, one of "xyz", "zyx" or "x".
+
+    Returns:
+        np.ndarray: Euler angles of shape (..., len(sequence)).
+    """
+    r = np.asarray(rotation_matrices)
+    if sequence == "xyz":
+        angles = (
+            np.arctan2(-r[..., 1, 2], r[..., 2, 2]),
+            np.arcsin(np.clip(r[..., 0, 2], -1, 1)),
+            np.arctan2(-r[..., 0, 1], r[..., 0, 0]),
+        )
+    elif sequence == "zyx":
+        angles = (
+            np.arctan2(r[..., 1, 0], r[..., 0, 0]),
+            np.arcsin(np.clip(-r[..., 2, 0], -1, 1)),
+            np.arctan2(r[..., 2, 1], r[..., 2, 2]),
+        )
+    elif sequence == "x":
+        # Comme biorbd (asin de r(2,1)) : une flexion au-dela de pi/2 est repliee sur [-pi/2, pi/2]
+        angles = (np.arcsin(np.clip(r[..., 2, 1], -1, 1)),)
+    else:
+        raise NotImplementedError(f"The Euler sequence {sequence} is not implemented yet, please try xyz, zyx or x")
+    return np.stack(angles, axis=-1)
+
+
+def euler_to_rotation_matrix(angles, sequence):
+    """
+    Rotation matrices from Euler angles, same convention as biorbd.Rotation.fromEulerAngles (R = R_a0 @ R_a1 @ ...).
+
+    Args:
+        angles (np.ndarray): Array of shape (..., len(sequence)).
+        sequence (str): Euler sequence made of "x", "y" and "z", e.g. "xyz".
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (..., 3, 3).
+    """
+    angles = np.asarray(angles, dtype=float)
+    rotation_matrices = np.broadcast_to(np.eye(3), angles.shape[:-1] + (3, 3)).copy()
+    for i_axis, axis in enumerate(sequence):
+        if axis not in "xyz":
+            raise NotImplementedError(f"The rotation axis {axis} is not implemented yet, please try x, y or z")
+        cos_angle = np.cos(angles[..., i_axis])
+        sin_angle = np.sin(angles[..., i_axis])
+        i, j = [k for k in range(3) if k != "xyz".index(axis)]
+        axis_rotation = np.broadcast_to(np.eye(3), angles.shape[:-1] + (3, 3)).copy()
+        axis_rotation[..., i, i] = cos_angle
+        axis_rotation[..., j, j] = cos_angle
+        # Le signe du sinus suit la regle de la main droite (x: y->z, y: z->x, z: x->y)
+        sign = -1 if axis == "y" else 1
+        axis_rotation[..., i, j] = -sign * sin_angle
+        axis_rotation[..., j, i] = sign * sin_angle
+        rotation_matrices = rotation_matrices @ axis_rotation
+    return rotation_matrices
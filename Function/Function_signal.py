@@ -0,0 +1,94 @@
+import hashlib
+import numpy as np
+from collections import namedtuple
+from scipy.signal import savgol_filter, butter, filtfilt
+from .Function_cache import hash_inputs
+
+
+# method : "savgol" ou "butterworth" (passe-bas sans dephasage)
+# derivative : "filter" (derivee du polynome de Savitzky-Golay), "gradient" (differences centrees) ou
+# "difference" (np.diff avec une premiere valeur a 0, comme les scripts de vitesse)
+FilterSpec = namedtuple(
+    "FilterSpec",
+    ["method", "window_length", "polyorder", "cutoff", "order", "derivative"],
+    defaults=["savgol", 11, 2, None, 4, "filter"],
+)
+
+
+def _filter(data, spec, axis, sampling_rate):
+    if spec.method == "savgol":
+        return savgol_filter(data, window_length=spec.window_length, polyorder=spec.polyorder, axis=axis)
+    if spec.method == "butterworth":
+        if spec.cutoff is None or sampling_rate is None:
+            raise ValueError("A Butterworth filter needs a cutoff frequency and a sampling rate")
+        b, a = butter(spec.order, spec.cutoff / (sampling_rate / 2), btype="low")
+        return filtfilt(b, a, data, axis=axis)
+    raise NotImplementedError(f"The filter {spec.method} is not implemented yet, please try savgol or butterworth")
+
+
+def _derivative(data, filtered, spec, order, axis):
+    # Derivee par rapport a l'index des frames, divisee ensuite par dt ** order
+    if spec.derivative == "filter":
+        if spec.method != "savgol":
+            raise ValueError("Only the Savitzky-Golay filter gives its own derivatives, use gradient or difference")
+        return savgol_filter(data, window_length=spec.window_length, polyorder=spec.polyorder, deriv=order, axis=axis)
+    derivative = filtered
+    for _ in range(order):
+        if spec.derivative == "gradient":
+            derivative = np.gradient(derivative, axis=axis)
+        elif spec.derivative == "difference":
+            derivative = np.diff(derivative, axis=axis, prepend=np.take(derivative, [0], axis=axis))
+        else:
+            raise NotImplementedError(
+                f"The derivative {spec.derivative} is not implemented yet, please try filter, gradient or difference"
+            )
+    return derivative
+
+
+def filter_and_derive(data, spec=FilterSpec(), dt=1.0, axis=1, derivatives=(0, 1), sampling_rate=None, cache=None):
+    """
+    Filter all the channels of a cohort array along the time axis and compute their derivatives in one call.
+
+    Args:
+        data (np.ndarray): Array of shape (n_trials, n_frames, n_channels) or any shape with the frames on axis.
+        spec (FilterSpec): Filter and derivative method.
+        dt (float or np.ndarray): Time between two frames. An array broadcastable to data gives one dt per trial,
+            e.g. durations[:, np.newaxis, np.newaxis] / (n_frames - 1) for time-normalised trials.
+        axis (int): Axis of the frames.
+        derivatives (tuple): Orders to return, 0 for the filtered signal, 1 for the velocity, 2 for the acceleration.
+        sampling_rate (float): Sampling rate in Hz, only used by the Butterworth filter.
+        cache (ArrayCache): If given, the results are stored by content of data, spec, dt and axis.
+
+    Returns:
+        dict: Order -> array of the same shape as data.
+    """
+    data = np.asarray(data, dtype=float)
+    dt = np.asarray(dt, dtype=float)
+    if cache is not None:
+        key = hash_inputs(
+            values=[
+                "filter_and_derive",
+                hashlib.sha256(np.ascontiguousarray(data).tobytes()).hexdigest(),
+                data.shape,
+                tuple(spec),
+                dt.tolist(),
+                axis,
+                tuple(derivatives),
+                sampling_rate,
+            ]
+        )
+        arrays = cache.get(key)
+        if arrays is not None:
+            return {order: arrays[f"order_{order}"] for order in derivatives}
+
+    filtered = _filter(data, spec, axis, sampling_rate)
+    results = {}
+    for order in derivatives:
+        if order == 0:
+            results[order] = filtered
+        else:
+            results[order] = _derivative(data, filtered, spec, order, axis) / dt**order
+
+    if cache is not None:
+        cache.put(key, **{f"order_{order}": result for order, result in results.items()})
+    return results
@@ -7,6 +7,7 @@ from scipy.stats import norm
 import scipy.stats as stats
 import scikit_posthocs as sp
 import numpy as np
+from .Function_resample import resample
 
 
 def prepare_data(data):
@@ -132,23 +133,8 @@ def perform_kruskal_and_dunn(data, dependent_var, group_var):
 
 
 def safe_interpolate(x, num_points):
-    # Create an array to store interpolated values, initialized with NaN
-    interpolated_values = np.full(num_points, np.nan)
-
-    # Check if all elements are finite, ignore NaNs for interpolation
-    finite_mask = np.isfinite(x)
-    if finite_mask.any():  # Ensure there's at least one finite value to interpolate
-        # Interpolate only finite values
-        valid_x = x[finite_mask]
-        valid_indices = np.linspace(0, 1, len(x))[finite_mask]
-
-        # Perform interpolation over the range with finite values
-        interpolated_valid_values = np.interp(np.linspace(0, 1, num_points), valid_indices, valid_x)
-
-        # Round interpolated values to the nearest integer
-        rounded_values = np.round(interpolated_valid_values).astype(int)
-
-        # Place rounded interpolated values back in the full array
-        interpolated_values = rounded_values
-
-    return interpolated_values
\ No newline at end of file
+    """
+    Resample x to num_points using only its finite values and round the result to the nearest integer.
+    x can be a single channel or an array of shape (frames, channels), all the channels are resampled at once.
+    """
+    return resample(x, num_points, nan_policy="omit", round_values=True)
\ No newline at end of file
@@ -0,0 +1,192 @@
+import os
+import time
+import traceback
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+
+
+# positions : (3, n_joints, n_frames), output_path : .mp4 (video) ou .png (planche), title : texte de la figure
+StickFigureJob = namedtuple("StickFigureJob", ["positions", "output_path", "title"])
+StickFigureResult = namedtuple("StickFigureResult", ["job", "duration", "error"])
+
+
+def _normalise_joint_name(name):
+    name = str(name).strip()
+    if name.upper().startswith("JC_"):
+        name = name[3:]
+    return name.lower()
+
+
+def stick_segments(joint_names, parent_list):
+    """
+    Segments of the stick figure as pairs of rows of joint_names.
+
+    The parent of an entry of parent_list is its index in the order of the keys (e.g. parent_list_marker or
+    parent_list_xsens). When the parent is not in joint_names, the segment goes to the nearest ancestor which is. The
+    names are compared without the "JC_" prefix and the case.
+
+    Returns:
+        np.ndarray: (n_segments, 2) index of the child and of the parent joint in joint_names.
+    """
+    keys = list(parent_list.keys())
+    rows = {_normalise_joint_name(name): i_row for i_row, name in enumerate(joint_names)}
+    segments = []
+    for name, parent in parent_list.items():
+        if _normalise_joint_name(name) not in rows:
+            continue
+        while parent is not None and _normalise_joint_name(keys[parent[0]]) not in rows:
+            parent = parent_list[keys[parent[0]]]
+        if parent is not None:
+            segments.append((rows[_normalise_joint_name(name)], rows[_normalise_joint_name(keys[parent[0]])]))
+    return np.array(segments, dtype=int).reshape(-1, 2)
+
+
+def pelvis_frame_positions(Jc_in_pelvis_frame, JC_order, pelvis_name="Pelvis"):
+    """
+    Joint centers to draw from Jc_in_pelvis_frame: its pelvis row holds the orientation of the pelvis, the pelvis is
+    drawn at the origin of the frame (middle of the hips).
+    """
+    positions = np.array(Jc_in_pelvis_frame, dtype=float)
+    names = [_normalise_joint_name(name) for name in JC_order]
+    if _normalise_joint_name(pelvis_name) in names:
+        positions[:, names.index(_normalise_joint_name(pelvis_name)), :] = 0
+    return positions
+
+
+def project(positions, elev=15, azim=-60):
+    """
+    Orthographic projection of all the frames at once on the screen plane of a 3D view (same angles as mplot3d).
+
+    Args:
+        positions (np.ndarray): (3, n_joints, n_frames).
+
+    Returns:
+        np.ndarray: (2, n_joints, n_frames) horizontal and vertical screen coordinates.
+    """
+    elev, azim = np.deg2rad(elev), np.deg2rad(azim)
+    screen_x = np.array([-np.sin(azim), np.cos(azim), 0])
+    screen_y = np.array([-np.sin(elev) * np.cos(azim), -np.sin(elev) * np.sin(azim), np.cos(elev)])
+    return np.einsum("sa,ajf->sjf", np.stack([screen_x, screen_y]), positions)
+
+
+class StickFigureAxes:
+    """
+    Stick figure drawn in a 2D axes from projected positions. The segment and joint artists are created once and
+    only their data change from a frame to the next.
+    """
+
+    def __init__(self, ax, projected, segments, title=None):
+        self.projected = projected
+        self.segments = segments
+        self.lines = LineCollection(np.zeros((len(segments), 2, 2)), colors="black", linewidths=2)
+        ax.add_collection(self.lines)
+        (self.joints,) = ax.plot([], [], "o", color="tab:red", markersize=4)
+        # Memes limites pour toutes les frames de l'essai
+        center = (np.nanmax(projected, axis=(1, 2)) + np.nanmin(projected, axis=(1, 2))) / 2
+        half_range = np.nanmax(np.nanmax(projected, axis=(1, 2)) - np.nanmin(projected, axis=(1, 2))) / 2 * 1.1
+        ax.set_xlim(center[0] - half_range, center[0] + half_range)
+        ax.set_ylim(center[1] - half_range, center[1] + half_range)
+        ax.set_aspect("equal")
+        ax.axis("off")
+        if title is not None:
+            ax.set_title(title, fontsize=8)
+        self.frame_text = ax.text(0.02, 0.02, "", transform=ax.transAxes, fontsize=6)
+
+    def update(self, frame):
+        points = self.projected[:, :, frame]
+        self.lines.set_segments(points[:, self.segments].transpose(1, 2, 0))
+        self.joints.set_data(points[0], points[1])
+        self.frame_text.set_text(f"frame {frame}")
+
+
+def render_stick_figure_video(positions, segments, output_path, title=None, fps=50, size=(480, 480), elev=15, azim=-60):
+    """
+    Write the stick figure of a trial as a video, one frame of the video per frame of the trial.
+    """
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+    dpi = 100
+    fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    stick_figure = StickFigureAxes(fig.add_axes([0, 0, 1, 0.92]), project(positions, elev, azim), segments)
+    if title is not None:
+        fig.suptitle(title, fontsize=8)
+    writer = FFMPEG_VideoWriter(output_path, size, fps, codec="libx264")
+    try:
+        for frame in range(positions.shape[2]):
+            stick_figure.update(frame)
+            canvas.draw()
+            writer.write_frame(np.asarray(canvas.buffer_rgba())[:, :, :3])
+    finally:
+        writer.close()
+
+
+def render_contact_sheet(positions, segments, output_path, title=None, n_snapshots=12, n_columns=6, elev=15, azim=-60):
+    """
+    Save n_snapshots frames of a trial, evenly spaced from takeoff to landing, side by side in one image.
+    """
+    projected = project(positions, elev, azim)
+    frames = np.linspace(0, positions.shape[2] - 1, n_snapshots).round().astype(int)
+    n_rows = int(np.ceil(n_snapshots / n_columns))
+    fig = Figure(figsize=(2 * n_columns, 2 * n_rows + 0.4))
+    for i_snapshot, frame in enumerate(frames):
+        ax = fig.add_subplot(n_rows, n_columns, i_snapshot + 1)
+        StickFigureAxes(ax, projected, segments).update(frame)
+    if title is not None:
+        fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=100)
+
+
+def _render_job(job, segments, render_kwargs):
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(job.output_path) or ".", exist_ok=True)
+        if job.output_path.endswith(".mp4"):
+            render_stick_figure_video(job.positions, segments, job.output_path, job.title, **render_kwargs)
+        else:
+            render_contact_sheet(job.positions, segments, job.output_path, job.title, **render_kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return StickFigureResult(job, time.perf_counter() - start, error)
+
+
+def render_stick_figures(jobs, segments, n_workers=None, **render_kwargs):
+    """
+    Render the stick figures of many trials over a process pool, as videos (.mp4 output) or contact sheets (.png).
+    An error in one trial is stored in its result and does not stop the other trials.
+
+    Args:
+        jobs (list): StickFigureJob (positions (3, n_joints, n_frames), output path, title).
+        segments (np.ndarray): Pairs of joints given by stick_segments.
+        n_workers (int): Number of processes, os.cpu_count() if None.
+        render_kwargs: Passed to render_stick_figure_video or render_contact_sheet (e.g. elev, azim).
+
+    Returns:
+        list: StickFigureResult (job, duration in s, error traceback or None) in the order of the jobs.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+
+    start = time.perf_counter()
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(_render_job, job, segments, render_kwargs): i_job for i_job, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print(f"Error for {result.job.output_path}:\n{result.error}")
+    print(f"{len(results) - len(failed)}/{len(results)} stick figures rendered in {time.perf_counter() - start:.1f} s")
+    return results
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+# Tableaux de longueur variable concatenes sur leur premier axe, une colonne start/stop par tableau dans l'index
+RAGGED_ARRAYS = ["wall_index", "gaze_position_temporal_evolution_projected"]
+
+# Fichier de store_dir contenant le nom du dossier de la version courante
+CURRENT_VERSION_FILE = "CURRENT"
+STORE_FILES = ["index.csv", "meta.json", "Jc_in_pelvis_frame.npy", "length_segment.npy"] + [
+    f"{name}.npy" for name in RAGGED_ARRAYS
+]
+
+
+def current_version_dir(store_dir):
+    """
+    Directory holding the files of the current version of a store (store_dir itself for a store written before the
+    versions).
+    """
+    try:
+        with open(os.path.join(store_dir, CURRENT_VERSION_FILE)) as file:
+            return os.path.join(store_dir, file.read().strip())
+    except FileNotFoundError:
+        return store_dir
+
+
+def write_trial_store(store_dir, trials):
+    """
+    Write all the trials of a cohort in a single columnar store (memory-mappable .npy files, an index.csv and a
+    meta.json) instead of one .mat file per trial.
+
+    Args:
+        store_dir (str): Directory of the store. Each call writes a new version directory in it and then switches
+            the CURRENT pointer file with a single os.replace.
+        trials (list): One dict per trial with the keys participant, acrobatics, trial, Jc_in_pelvis_frame
+            (3, n_joint_centers, n_frames) and JC_order, and optionally laterality, subject_expertise,
+            length_segment and the RAGGED_ARRAYS.
+    """
+    if len(trials) == 0:
+        raise ValueError("No trial to write in the store")
+
+    JC_order = [str(jc).strip() for jc in trials[0]["JC_order"]]
+    index_rows = []
+    jc_frames = []
+    ragged = {name: [] for name in RAGGED_ARRAYS}
+    ragged_length = {name: 0 for name in RAGGED_ARRAYS}
+    length_segment = []
+    start = 0
+    for trial in trials:
+        if [str(jc).strip() for jc in trial["JC_order"]] != JC_order:
+            raise ValueError(f"The JC_order of {trial['trial']} is different from the rest of the store")
+
+        n_frames = trial["Jc_in_pelvis_frame"].shape[2]
+        # Stockage frame par frame pour qu'un essai soit une tranche contigue du fichier
+        jc_frames.append(np.ascontiguousarray(trial["Jc_in_pelvis_frame"].transpose(2, 0, 1)))
+        row = {
+            "participant": trial["participant"],
+            "acrobatics": trial["acrobatics"],
+            "trial": trial["trial"],
+            "start": start,
+            "stop": start + n_frames,
+            "laterality": str(trial.get("laterality", "")),
+            "subject_expertise": str(trial.get("subject_expertise", "")),
+        }
+        start += n_frames
+
+        for name in RAGGED_ARRAYS:
+            array = np.asarray(trial[name]) if name in trial else np.zeros((0,))
+            array = array.reshape((1,)) if array.ndim == 0 else array
+            ragged[name].append(array)
+            row[f"{name}_start"] = ragged_length[name]
+            ragged_length[name] += array.shape[0]
+            row[f"{name}_stop"] = ragged_length[name]
+
+        length_segment.append(np.ravel(trial.get("length_segment", np.full(8, np.nan))))
+        index_rows.append(row)
+
+    os.makedirs(store_dir, exist_ok=True)
+    previous_dir = current_version_dir(store_dir)
+    version_dir = tempfile.mkdtemp(prefix=f"version_{time.strftime('%Y%m%d_%H%M%S')}_", dir=store_dir)
+    version = os.path.basename(version_dir)
+    np.save(os.path.join(version_dir, "Jc_in_pelvis_frame.npy"), np.concatenate(jc_frames, axis=0))
+    np.save(os.path.join(version_dir, "length_segment.npy"), np.array(length_segment))
+    for name in RAGGED_ARRAYS:
+        non_empty = [array for array in ragged[name] if array.shape[0] > 0]
+        np.save(os.path.join(version_dir, f"{name}.npy"), np.concatenate(non_empty, axis=0) if non_empty else np.zeros((0,)))
+    pd.DataFrame(index_rows).to_csv(os.path.join(version_dir, "index.csv"), index=False)
+    with open(os.path.join(version_dir, "meta.json"), "w") as file:
+        json.dump({"JC_order": JC_order, "n_frames": start}, file)
+
+    # Le pointeur est remplace en une seule operation : un lecteur ouvre soit l'ancienne version, soit la nouvelle
+    tmp_pointer = os.path.join(store_dir, f"{CURRENT_VERSION_FILE}.tmp")
+    with open(tmp_pointer, "w") as file:
+        file.write(version)
+    os.replace(tmp_pointer, os.path.join(store_dir, CURRENT_VERSION_FILE))
+
+    # La version precedente est gardee pour un lecteur qui vient de lire l'ancien pointeur, les plus anciennes sont
+    # supprimees, de meme que les fichiers d'un store ecrit avant les versions
+    kept = {version, os.path.basename(previous_dir)}
+    for entry in os.listdir(store_dir):
+        if entry.startswith("version_") and entry not in kept:
+            shutil.rmtree(os.path.join(store_dir, entry), ignore_errors=True)
+    if previous_dir == store_dir:
+        for file_name in STORE_FILES:
+            if os.path.exists(os.path.join(store_dir, file_name)):
+                os.remove(os.path.join(store_dir, file_name))
+
+
+class TrialStore:
+    """
+    Reader of a store written by write_trial_store. The arrays of the whole cohort are opened once as memory maps,
+    a trial is a slice of them. The reader keeps the version which was current when it was opened.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.version_dir = current_version_dir(store_dir)
+        self.index = pd.read_csv(
+            os.path.join(self.version_dir, "index.csv"),
+            dtype={"participant": str, "acrobatics": str, "trial": str, "laterality": str, "subject_expertise": str},
+            keep_default_na=False,
+        )
+        with open(os.path.join(self.version_dir, "meta.json")) as file:
+            self.meta = json.load(file)
+        self.JC_order = self.meta["JC_order"]
+        self.Jc_in_pelvis_frame = np.load(os.path.join(self.version_dir, "Jc_in_pelvis_frame.npy"), mmap_mode="r")
+        self.length_segment = np.load(os.path.join(self.version_dir, "length_segment.npy"), mmap_mode="r")
+        self.ragged = {
+            name: np.load(os.path.join(self.version_dir, f"{name}.npy"), mmap_mode="r") for name in RAGGED_ARRAYS
+        }
+
+    def __len__(self):
+        return len(self.index)
+
+    def participants(self):
+        return self.index["participant"].unique().tolist()
+
+    def trials(self, participant=None, acrobatics=None):
+        """
+        Index (row number of index.csv) of the trials of a participant and / or an acrobatics, in the order they
+        were written. They are passed to load or to load_and_interpolate_for_point(..., store=store).
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if participant is not None:
+            mask &= (self.index["participant"] == participant).to_numpy()
+        if acrobatics is not None:
+            mask &= (self.index["acrobatics"] == acrobatics).to_numpy()
+        return np.flatnonzero(mask).tolist()
+
+    def has_trials(self, participant=None, acrobatics=None):
+        return len(self.trials(participant, acrobatics)) > 0
+
+    def load(self, i_trial):
+        """
+        Data of one trial with the same keys and shapes as scipy.io.loadmat of the former per-trial .mat file.
+        """
+        row = self.index.iloc[i_trial]
+        data = {
+            "Jc_in_pelvis_frame": np.asarray(self.Jc_in_pelvis_frame[row["start"]: row["stop"]]).transpose(1, 2, 0),
+            "JC_order": np.array(self.JC_order),
+            "laterality": np.array([row["laterality"]]),
+            "subject_expertise": np.array([row["subject_expertise"]]),
+            "length_segment": np.atleast_2d(np.asarray(self.length_segment[i_trial])),
+        }
+        for name in RAGGED_ARRAYS:
+            data[name] = np.atleast_2d(np.asarray(self.ragged[name][row[f"{name}_start"]: row[f"{name}_stop"]]))
+        return data
@@ -0,0 +1,108 @@
+import time
+import numpy as np
+from matplotlib import cm
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+
+class ChunkBlender:
+    """
+    Running sum and sum of squares of a chunk of frames over the clips added one after the other.
+
+    The frames are uint8, so the sums stay exact in float32 up to 255 ** 2 * 258 clips and the memory does not depend
+    on the number of clips.
+    """
+
+    def __init__(self, n_frames, frame_shape):
+        self.sum = np.zeros((n_frames,) + tuple(frame_shape), dtype=np.float32)
+        self.sum_squares = np.zeros_like(self.sum)
+        self.n_clips = 0
+
+    def add(self, frames):
+        frames = frames.astype(np.float32)
+        self.sum += frames
+        self.sum_squares += frames**2
+        self.n_clips += 1
+
+    def mean(self):
+        return np.clip(np.rint(self.sum / self.n_clips), 0, 255).astype(np.uint8)
+
+    def std(self):
+        mean = self.sum / self.n_clips
+        return np.sqrt(np.maximum(self.sum_squares / self.n_clips - mean**2, 0))
+
+
+# Table de couleurs de la carte de variabilite, indexee par la valeur 0-255 de l'ecart-type
+STD_COLORMAP = (cm.inferno(np.arange(256))[:, :3] * 255).astype(np.uint8)
+
+
+def std_map(std, std_gain=4.0):
+    """
+    Colored map of the per-pixel std of the clips, averaged over the color channels and multiplied by std_gain.
+    """
+    level = np.clip(np.rint(np.mean(std, axis=-1) * std_gain), 0, 255).astype(np.uint8)
+    return STD_COLORMAP[level]
+
+
+def superimpose_videos(video_files, outputs, chunk_size=8, codec="libx264", std_gain=4.0):
+    """
+    Superimpose clips of the same size by streaming them: chunk_size frames of every clip are decoded at the same
+    times, blended, encoded and dropped, so the memory is bounded by one chunk whatever the number and length of the
+    clips. The clips shorter than the longest one keep their last frame, as with set_duration in moviepy.
+
+    Args:
+        video_files (list): Paths of the clips.
+        outputs (dict): "mean" (pixel mean of the clips) and/or "std" (colored map of the pixel std of the clips)
+            -> output path. All the outputs are written in the same decoding pass.
+        chunk_size (int): Number of frames blended at once.
+        codec (str): Codec of the outputs.
+        std_gain (float): Scale of the std map, a std of 255 / std_gain is drawn with the last color.
+
+    Returns:
+        int: Number of frames written.
+    """
+    for mode in outputs:
+        if mode not in ("mean", "std"):
+            raise NotImplementedError(f"The mode {mode} is not implemented yet, please try mean or std")
+
+    readers = [FFMPEG_VideoReader(video_file) for video_file in video_files]
+    writers = {}
+    try:
+        size = readers[0].size
+        for video_file, reader in zip(video_files, readers):
+            if reader.size != size:
+                raise ValueError(f"The clip {video_file} is {reader.size} while the first clip is {size}")
+        fps = max(reader.fps for reader in readers)
+        duration = max(reader.duration for reader in readers)
+        # Instant de la derniere image de chaque clip, les clips plus courts restent sur cette image
+        last_times = [(reader.nframes - 1) / reader.fps for reader in readers]
+        times = np.arange(0, duration, 1 / fps)
+
+        writers = {mode: FFMPEG_VideoWriter(output_path, size, fps, codec=codec) for mode, output_path in outputs.items()}
+        frame_shape = (size[1], size[0], 3)
+        chunk = np.empty((chunk_size,) + frame_shape, dtype=np.uint8)
+        start = time.perf_counter()
+        for first_frame in range(0, len(times), chunk_size):
+            chunk_times = times[first_frame:first_frame + chunk_size]
+            blender = ChunkBlender(len(chunk_times), frame_shape)
+            for reader, last_time in zip(readers, last_times):
+                for i_frame, t in enumerate(chunk_times):
+                    chunk[i_frame] = reader.get_frame(min(t, last_time))[:, :, :3]
+                blender.add(chunk[:len(chunk_times)])
+
+            if "mean" in writers:
+                for frame in blender.mean():
+                    writers["mean"].write_frame(frame)
+            if "std" in writers:
+                for frame in std_map(blender.std(), std_gain):
+                    writers["std"].write_frame(frame)
+
+        print(
+            f"{len(times)} frames of {len(readers)} clips superimposed in {time.perf_counter() - start:.1f} s"
+        )
+    finally:
+        for writer in writers.values():
+            writer.close()
+        for reader in readers:
+            reader.close()
+    return len(times)
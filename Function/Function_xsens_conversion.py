@@ -0,0 +1,205 @@
+import os
+import time
+import pickle
+import tempfile
+import traceback
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .Function_kinematics import xsens_segment_lengths, xsens_joint_centers_in_pelvis_frame, swap_xy_axes
+
+
+XSENS_JC_NAMES = [
+    "Pelvis", "L5", "L3", "T12", "T8", "Neck", "Head", "ShoulderR", "UpperArmR", "LowerArmR", "HandR", "ShoulderL",
+    "UpperArmL", "LowerArmL", "HandL", "UpperLegR", "LowerLegR", "FootR", "ToesR", "UpperLegL", "LowerLegL", "FootL",
+    "ToesL",
+]
+
+XsensConversionJob = namedtuple("XsensConversionJob", ["pkl_path", "participant", "acrobatics"])
+# status : "converted", "skipped" (sortie plus recente que le .pkl) ou "failed"
+XsensConversionResult = namedtuple(
+    "XsensConversionResult", ["job", "output_path", "status", "duration", "n_bytes", "error"]
+)
+
+
+def convert_xsens_trial(eye_tracking_metrics, shoulder_include=False):
+    """
+    Joint centers in the pelvis frame and mean segment lengths of one Xsens trial.
+
+    Args:
+        eye_tracking_metrics (dict): Content of an eyetracking_metrics .pkl file.
+        shoulder_include (bool): Keep the UpperArm joints.
+
+    Returns:
+        dict: Jc_in_pelvis_frame (3, n_joints, n_frames), JC_order, length_segment, laterality, subject_expertise,
+            wall_index and gaze_position_temporal_evolution_projected, as stored in the trial store.
+    """
+    Xsens_orientation_per_move = eye_tracking_metrics["Xsens_orientation_per_move"]
+    Xsens_position_rotated_per_move = eye_tracking_metrics["Xsens_position_rotated_per_move"]
+    n_frames = Xsens_position_rotated_per_move.shape[0]
+    Xsens_position = Xsens_position_rotated_per_move.reshape(n_frames, 23, 3).transpose(2, 1, 0)
+
+    if shoulder_include:
+        elements_to_remove = ["L5", "L3", "T12", "T8", "Neck", "ShoulderR", "ShoulderL", "ToesR", "ToesL"]
+    else:
+        elements_to_remove = ["L5", "L3", "T12", "T8", "Neck", "ShoulderR", "UpperArmR",
+                              "ShoulderL", "UpperArmL", "ToesR", "ToesL"]
+    indices_a_conserver = [i for i, name in enumerate(XSENS_JC_NAMES) if name not in elements_to_remove]
+    JC_order = [XSENS_JC_NAMES[i] for i in indices_a_conserver]
+    quaternion_columns = (4 * np.array(indices_a_conserver)[:, np.newaxis] + np.arange(4)).ravel()
+
+    length_segment = xsens_segment_lengths(Xsens_position, XSENS_JC_NAMES)
+    Jc_in_pelvis_frame = xsens_joint_centers_in_pelvis_frame(
+        Xsens_position[:, indices_a_conserver, :],
+        Xsens_orientation_per_move[:, quaternion_columns],
+        eye_tracking_metrics["move_orientation"],
+        JC_order,
+    )
+    Jc_in_pelvis_frame[:, 0:3, :] = np.unwrap(Jc_in_pelvis_frame[:, 0:3, :], axis=2)
+    Jc_in_pelvis_frame = swap_xy_axes(Jc_in_pelvis_frame, JC_order)
+
+    mean_length_segment = np.mean(length_segment, axis=0)
+    # Add proximal length member to distal length member to get full length for each member
+    indices_impairs = np.arange(1, len(mean_length_segment), 2)
+    mean_length_segment[indices_impairs] += mean_length_segment[indices_impairs - 1]
+
+    return {
+        "Jc_in_pelvis_frame": Jc_in_pelvis_frame,
+        "JC_order": JC_order,
+        "laterality": eye_tracking_metrics["laterality"],
+        "subject_expertise": eye_tracking_metrics["subject_expertise"],
+        "length_segment": mean_length_segment,
+        "wall_index": eye_tracking_metrics["wall_index"],
+        "gaze_position_temporal_evolution_projected": eye_tracking_metrics["gaze_position_temporal_evolution_projected"],
+    }
+
+
+def converted_path(output_dir, job):
+    trial_name = os.path.splitext(os.path.basename(job.pkl_path))[0]
+    return os.path.join(output_dir, job.participant, job.acrobatics, f"{trial_name}.pkl")
+
+
+def is_converted(pkl_path, output_path):
+    try:
+        return os.path.getmtime(output_path) > os.path.getmtime(pkl_path)
+    except FileNotFoundError:
+        return False
+
+
+def _convert_job(job, output_dir, force, shoulder_include):
+    start = time.perf_counter()
+    output_path = converted_path(output_dir, job)
+    n_bytes = os.path.getsize(job.pkl_path) if os.path.exists(job.pkl_path) else 0
+    if not force and is_converted(job.pkl_path, output_path):
+        return XsensConversionResult(job, output_path, "skipped", time.perf_counter() - start, n_bytes, None)
+    try:
+        with open(job.pkl_path, "rb") as file:
+            trial = convert_xsens_trial(pickle.load(file), shoulder_include)
+        trial.update(
+            participant=job.participant,
+            acrobatics=job.acrobatics,
+            trial=os.path.splitext(os.path.basename(job.pkl_path))[0],
+        )
+        # Ecriture dans un fichier temporaire puis renommage : une conversion interrompue ne laisse pas de sortie
+        # incomplete et l'essai est refait a la reprise
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump(trial, file)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        status, error = "converted", None
+    except Exception:
+        status, error = "failed", traceback.format_exc()
+    return XsensConversionResult(job, output_path, status, time.perf_counter() - start, n_bytes, error)
+
+
+def convert_xsens_files(jobs, output_dir, n_workers=None, force=False, shoulder_include=False):
+    """
+    Convert eyetracking_metrics .pkl files to joint centers over a process pool, one output .pkl per trial in
+    output_dir/<participant>/<acrobatics>/.
+
+    A trial whose output is more recent than its .pkl is skipped, so an interrupted run resumes where it stopped. An
+    error in one trial is stored in its result and does not stop the other trials.
+
+    Args:
+        jobs (list): XsensConversionJob (.pkl path, participant, acrobatics).
+        output_dir (str): Directory of the converted trials.
+        n_workers (int): Number of processes, os.cpu_count() if None.
+        force (bool): Convert all the trials even if they are up to date.
+        shoulder_include (bool): Keep the UpperArm joints.
+
+    Returns:
+        list: XsensConversionResult (job, output path, status, duration in s, size of the .pkl, error traceback or
+            None) in the order of the jobs.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+
+    start = time.perf_counter()
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(_convert_job, job, output_dir, force, shoulder_include): i_job
+            for i_job, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            print(f"{os.path.basename(result.job.pkl_path)}: {result.status} in {result.duration:.1f} s")
+
+    print_conversion_summary(results, time.perf_counter() - start)
+    return results
+
+
+def print_conversion_summary(results, total_duration):
+    converted = [result for result in results if result.status == "converted"]
+    failed = [result for result in results if result.status == "failed"]
+    for result in failed:
+        print(f"Error for {result.job.pkl_path}:\n{result.error}")
+
+    n_bytes = sum(result.n_bytes for result in converted)
+    print(
+        f"{len(converted)} converted, {len(results) - len(converted) - len(failed)} up to date, {len(failed)} failed "
+        f"in {total_duration:.1f} s"
+    )
+    if converted and total_duration > 0:
+        print(f"{len(converted) / total_duration:.1f} files/s, {n_bytes / 1024**2 / total_duration:.1f} MB/s")
+
+
+def load_converted_trials(results):
+    """
+    Trials converted or up to date, in the order of the results, to be written with write_trial_store.
+    """
+    trials = []
+    for result in results:
+        if result.status == "failed":
+            continue
+        with open(result.output_path, "rb") as file:
+            trials.append(pickle.load(file))
+    return trials
+
+
+def catalog_rows(results, trials):
+    """
+    Rows of TrialCatalog.update_trials_from_rows for the trials given by load_converted_trials(results), so that the
+    catalog is filled from the converted outputs without reading the eyetracking_metrics .pkl files again.
+    """
+    loaded_results = [result for result in results if result.status != "failed"]
+    return [
+        {
+            "path": result.job.pkl_path,
+            "participant": result.job.participant,
+            "acrobatics": result.job.acrobatics,
+            "expertise": trial["subject_expertise"],
+            "laterality": trial["laterality"],
+            "n_frames": trial["Jc_in_pelvis_frame"].shape[2],
+        }
+        for result, trial in zip(loaded_results, trials)
+    ]
@@ -1,16 +1,18 @@
 import scipy
-import os
 import pickle
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.signal import savgol_filter
-import glob
 from TrampolineAcrobaticVariability.Function.Function_Class_Basics import (
     load_and_interpolate_for_point,
     find_index
 )
-import biorbd
+from TrampolineAcrobaticVariability.Function.Function_trial_store import TrialStore
+from TrampolineAcrobaticVariability.Function.Function_catalog import TrialCatalog
+from TrampolineAcrobaticVariability.Function.Function_events import load_twist_events, select_twist_events
+from TrampolineAcrobaticVariability.Function.Function_angular_velocity import euler_rates_to_omega
+from TrampolineAcrobaticVariability.Function.Function_signal import FilterSpec, filter_and_derive
+from TrampolineAcrobaticVariability.Function.Function_cache import ArrayCache
 
 
 def normalize_angles(angles):
@@ -22,24 +24,17 @@ def normalize_angles(angles):
             normalized_angles[i] -= 1 * np.pi
     return normalized_angles
 
-def compute_omega(x, y, z, vx, vy, vz):
-
-    euler_angles = np.array([x, y, z])
-    euler_dot = np.array([vx, vy, vz])
-
-    quaternion = biorbd.Quaternion()
-    omega = quaternion.eulerDotToOmega(euler_dot, euler_angles, seq="xyz")
-    omega_values = omega.to_array()
-    omega_norm = np.linalg.norm(omega_values)
-
-    return omega_norm
-
 nombre_lignes_minimum = 10
 n_points = 100
 next_index = 0
 time_values = np.linspace(0, n_points-1, num=n_points)
 
 home_path = "/home/lim/Documents/StageMathieu/DataTrampo/Xsens_pkl/"
+trial_store = TrialStore("/home/lim/Documents/StageMathieu/DataTrampo/Xsens_trial_store/")
+catalog = TrialCatalog("/home/lim/Documents/StageMathieu/DataTrampo/trial_catalog.sqlite")
+# Savitzky-Golay (11, 2) puis vitesse par differences finies, premiere valeur a 0
+pelvis_filter = FilterSpec("savgol", window_length=11, polyorder=2, derivative="difference")
+signal_cache = ArrayCache("/home/lim/Documents/StageMathieu/DataTrampo/Signal_cache/")
 movement_to_analyse = [
     '4-',
     '4-o',
@@ -82,9 +77,10 @@ subject_names = [
     'AlAd'
 ]
 
-path75 = "/home/lim/Documents/StageMathieu/Tab_result3/"
+# Instants T10 / T75 de tous les essais ecrits par Xsens_analysis.py
+twist_events = load_twist_events("/home/lim/Documents/StageMathieu/Tab_result3/twist_events.csv")
 
-liste_name = [name for name in os.listdir(home_path) if os.path.isdir(os.path.join(home_path, name))]
+liste_name = catalog.participants()
 
 list_name_for_movement = []
 all_mean_velocities = []
@@ -93,16 +89,10 @@ pelvis_omega = {mvt: {name_subject: None for name_subject in subject_names}
                        for idx_mvt, mvt in enumerate(movement_to_analyse)}
 for id_mvt, mvt_name in enumerate(movement_to_analyse):
 
-    if mvt_name not in non_twising_names:
-        pattern_file = f"*_{mvt_name}_*_75.csv"
-        file75 = glob.glob(os.path.join(path75, pattern_file))
-        timestamp75 = pd.read_csv(file75[0])
-
 
     temp_liste_name = []
     for name in liste_name:
-        home_path_subject = f"{home_path}{name}/Pos_JC/{mvt_name}"
-        if not os.path.exists(home_path_subject):
+        if not trial_store.has_trials(participant=name, acrobatics=mvt_name):
             print(f"Subject {name} didn't realize {mvt_name}")
         else:
             temp_liste_name.append(name)
@@ -116,23 +106,17 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
     plt.figure(figsize=(10, 6))
     for id_name, name in enumerate(temp_liste_name):
         print(f"{name} {mvt_name} is running")
-        home_path_subject = f"{home_path}{name}/Pos_JC/{mvt_name}"
-
-        fichiers_mat_subject = []
-        for root, dirs, files in os.walk(home_path_subject):
-            for file in files:
-                if file.endswith(".mat"):
-                    full_path = os.path.join(root, file)
-                    fichiers_mat_subject.append(full_path)
+        fichiers_mat_subject = trial_store.trials(participant=name, acrobatics=mvt_name)
 
         data_subject = []
         subject_info_dict = {}
         gaze_position_temporal_evolution_projected_subject = []
-        velocity_by_subject = []
+        pelvis_subject = []
+        duration_subject = []
         omega_by_subject = []
 
         if mvt_name not in non_twising_names:
-            T75_by_name = timestamp75[name].dropna().mean().round()
+            T75_by_name = select_twist_events(twist_events, 0.75, mvt_name, name)["time"].mean().round()
 
         for file in fichiers_mat_subject:
             (data,
@@ -141,7 +125,7 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
              length_segment,
              wall_index,
              gaze_position_temporal_evolution_projected,
-             total_duration) = load_and_interpolate_for_point(file, include_expertise_laterality_length=True)
+             total_duration) = load_and_interpolate_for_point(file, include_expertise_laterality_length=True, store=trial_store)
 
             pelvis_data = data[['Pelvis_X', 'Pelvis_Y', 'Pelvis_Z']]
 
@@ -151,50 +135,30 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
             if pelvis_data["Pelvis_Z"].iloc[1] < 0:
                 pelvis_data["Pelvis_Z"] += np.pi
 
-            pelvis_data_filtered = {'Pelvis_X': None,
-                                    'Pelvis_Y': None,
-                                    'Pelvis_Z': None,
-                                    }
-            pelvis_data_filtered['Pelvis_X'] = savgol_filter(pelvis_data['Pelvis_X'], window_length=11,
-                                                            polyorder=2)
-            pelvis_data_filtered['Pelvis_Y'] = savgol_filter(pelvis_data['Pelvis_Y'], window_length=11,
-                                                            polyorder=2)
-            pelvis_data_filtered['Pelvis_Z'] = savgol_filter(pelvis_data['Pelvis_Z'], window_length=11,
-                                                            polyorder=2)
-
-            time = np.arange(100)
-
-            num_points = 100
-            dt = total_duration / (num_points - 1)
-
-            dPelvis_X = np.diff(pelvis_data_filtered['Pelvis_X']) / dt
-            dPelvis_Y = np.diff(pelvis_data_filtered['Pelvis_Y']) / dt
-            dPelvis_Z = np.diff(pelvis_data_filtered['Pelvis_Z']) / dt
-
-            dPelvis_X = np.insert(dPelvis_X, 0, 0)
-            dPelvis_Y = np.insert(dPelvis_Y, 0, 0)
-            dPelvis_Z = np.insert(dPelvis_Z, 0, 0)
-
-            omega = np.zeros((100, ))
-            for i in range(100):
-                omega[i] = compute_omega(pelvis_data_filtered['Pelvis_X'][i],
-                                         pelvis_data_filtered['Pelvis_Y'][i],
-                                         pelvis_data_filtered['Pelvis_Z'][i],
-                                         dPelvis_X[i],
-                                         dPelvis_Y[i],
-                                         dPelvis_Z[i])
-
-            if mvt_name not in non_twising_names:
-                omega_T75 = compute_omega(pelvis_data_filtered['Pelvis_X'][int(T75_by_name)],
-                                         pelvis_data_filtered['Pelvis_Y'][int(T75_by_name)],
-                                         pelvis_data_filtered['Pelvis_Z'][int(T75_by_name)],
-                                         dPelvis_X[int(T75_by_name)],
-                                         dPelvis_Y[int(T75_by_name)],
-                                         dPelvis_Z[int(T75_by_name)])
-                omega_by_subject.append(omega_T75)
-
-            velocities = np.column_stack((dPelvis_X, dPelvis_Y, np.sqrt(dPelvis_Z**2), omega))
-            velocity_by_subject.append(velocities)
+            pelvis_subject.append(pelvis_data.to_numpy())
+            duration_subject.append(total_duration)
+
+        time = np.arange(100)
+
+        num_points = 100
+        dt = np.ravel(duration_subject) / (num_points - 1)
+
+        # Filtre et vitesse des 3 rotations du pelvis de tous les essais du sujet en un appel
+        pelvis_signals = filter_and_derive(
+            np.array(pelvis_subject), pelvis_filter, dt[:, np.newaxis, np.newaxis], cache=signal_cache
+        )
+        pelvis_data_filtered = pelvis_signals[0]
+        dPelvis = pelvis_signals[1]
+
+        # Norme de la vitesse angulaire (sequence xyz) de tous les essais et instants en une fois
+        omega = np.linalg.norm(euler_rates_to_omega(pelvis_data_filtered, dPelvis, "xyz"), axis=-1)
+
+        if mvt_name not in non_twising_names:
+            omega_by_subject = omega[:, int(T75_by_name)]
+
+        velocity_by_subject = np.concatenate(
+            (dPelvis[:, :, :2], np.abs(dPelvis[:, :, 2:]), omega[:, :, np.newaxis]), axis=2
+        )
 
         subject_velocities = np.mean(np.array(velocity_by_subject), axis=0)
         subject_omega_T75 = np.mean(np.array(omega_by_subject), axis=0)
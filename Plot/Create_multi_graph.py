@@ -25,7 +25,7 @@ file_intervals = [
 ]
 
 # Load and interpolate all try
-my_data_instances = [load_and_interpolate(file, interval) for file, interval in file_intervals]
+my_data_instances = OrderMatData.stack([load_and_interpolate(file, interval) for file, interval in file_intervals])
 
 # List of members
 members = [
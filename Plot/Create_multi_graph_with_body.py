@@ -87,7 +87,7 @@ mean_folder_path = os.path.join(folder_path, "MeanSD/")
 if not os.path.exists(mean_folder_path):
     os.makedirs(mean_folder_path)
 
-my_data_instances = [load_and_interpolate(file, interval) for file, interval in file_intervals]
+my_data_instances = OrderMatData.stack([load_and_interpolate(file, interval) for file, interval in file_intervals])
 
 # List of members
 members = [
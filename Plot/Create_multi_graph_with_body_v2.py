@@ -12,8 +12,7 @@ from TrampolineAcrobaticVariability.Function.Function_Class_Basics import (
     calculate_mean_std
 )
 from TrampolineAcrobaticVariability.Function.Function_draw import (
-    create_composite_image,
-    add_lines_with_arrow_and_circle,
+    BodyCompositeFigure,
     graph_images_infov2,
     lines_info,
     sequence_to_indices,
@@ -31,6 +30,9 @@ interval_name_tab['Essai'] = interval_name_tab['Essai'] + '.c3d'
 # Obtenir la liste des participants
 participant_names = interval_name_tab['Participant'].unique()
 
+# Figure composite creee une seule fois, seules les donnees des courbes changent d'une acrobatie a l'autre
+composite_figure = BodyCompositeFigure(graph_images_infov2, lines_info)
+
 for participant in participant_names:
     # Chemin du dossier contenant les fichiers .mat
     file_path_participant = home_path + f"{participant}/"
@@ -132,7 +134,7 @@ for participant in participant_names:
         if not os.path.exists(mean_folder_path):
             os.makedirs(mean_folder_path)
 
-        my_data_instances = [load_and_interpolate(file, interval) for file, interval in file_intervals]
+        my_data_instances = OrderMatData.stack([load_and_interpolate(file, interval) for file, interval in file_intervals])
 
         ####### ONE COMPONENT BY GRAPH #######
 
@@ -169,93 +171,21 @@ for participant in participant_names:
 
         ####### ALL COMPONENT BY GRAPH  #######
 
-        # Define the colors for the axis X, Y, et Z
-        colors = ["red", "green", "blue"]
-        dpi = 300  # High resolution
-        desired_width_px = 333  # Desired width in pixels
-        desired_height_px = 200  # Desired height in pixels
-        fig_width = desired_width_px / dpi  # Width in inches
-        fig_height = desired_height_px / dpi  # Height in inches
-        legend_created = False  # Verify that the legend wasn't created
-
+        # Moyenne et ecart-type de chaque axe des segments, traces directement dans la figure composite
+        mean_std_members = {}
         for index, member_raw in enumerate(Euler_Sequence[:, 0]):
             member = " ".join(member_raw.strip().split())
             axes_seq = Euler_Sequence[index][1]
             indices_single = sequence_to_indices(axes_seq)
-            fig, ax = plt.subplots(figsize=(fig_width, fig_height), dpi=dpi)
+            mean_std_members[member] = {}
             for axis in indices_single:
                 try:
-                    # Calculate mean and std for all member and axis
-                    mean_data, std_dev_data = calculate_mean_std(my_data_instances, member, axis)
-
-                    # Get matching color for current axis
-                    color = colors[axis]
-
-                    # Trace the graph of the mean with std area for all axis
-                    plt.plot(mean_data, label=f'{["X", "Y", "Z"][axis]}', color=color, linewidth=0.3)
-                    plt.fill_between(
-                        range(len(mean_data)),
-                        mean_data - std_dev_data,
-                        mean_data + std_dev_data,
-                        alpha=0.4,
-                        color=color,
-                        edgecolor="none",
-                    )
-
+                    mean_std_members[member][axis] = calculate_mean_std(my_data_instances, member, axis)
                 except KeyError:
                     # Handle the case where a combination member axis doesn't exist
                     print(f"The member {member} with axis {['X', 'Y', 'Z'][axis]} doesn't exist.")
 
-            # Configure the graph
-            plt.xlabel("Time (%)", fontsize=4)
-            # plt.ylabel('Value', fontsize=4)
-            plt.tick_params(axis="both", labelsize=3, width=0.3, length=1.5)
-
-            # Make the axis line thinner
-            for spine in plt.gca().spines.values():
-                spine.set_linewidth(0.3)
-
-            # plt.legend()
-            # plt.tick_params(axis='x', labelsize=3)  # Change 'labelsize'
-
-            # Register the graph
-            file_name = f"{member}_all_axes_graph.png"
-            file_path = os.path.join(mean_folder_path, file_name)
-            plt.savefig(file_path, format="png", bbox_inches="tight")
-            # Create and register legend for only one member (Tete)
-            if member == "Head" and not legend_created:
-                # Get the handles and the labels for the legend
-                handles, labels = ax.get_legend_handles_labels()
-
-                # Create a new figure for the legend with the desired size
-                fig_leg = plt.figure(figsize=(2, 2), dpi=100)  # Dimensions en pouces, dpi pour la résolution
-                ax_leg = fig_leg.add_subplot(111)
-
-                # Add a legend to the new figure with a bigger font size and bold
-                legend = ax_leg.legend(
-                    handles, labels, loc="center", prop={"size": 20, "weight": "bold"}
-                )  # Adjust size of font
-
-                # Increase the width of color line in the legend
-                legend.get_lines()[0].set_linewidth(4)  # For "X"
-                legend.get_lines()[1].set_linewidth(4)  # For "Y"
-                legend.get_lines()[2].set_linewidth(4)  # For "Z"
-
-                ax_leg.axis("off")
-
-                # Register the picture of the legend with the desired size
-                leg_file_name = "legend.png"
-                leg_file_path = os.path.join(mean_folder_path, leg_file_name)
-                fig_leg.savefig(leg_file_path, format="png", bbox_inches="tight", pad_inches=0)  # Delete pad
-                plt.close(fig_leg)
-
-                legend_created = True
-
-            plt.close("all")
-
         final_path = folder_path_participant + "Graph_with_body.png"
 
-        # Call the function to create the composite image
-        composite_image_path = create_composite_image(graph_images_infov2, mean_folder_path, save_path=final_path)
-        # Call the function
-        output_image_path = add_lines_with_arrow_and_circle(composite_image_path, lines_info)
+        composite_figure.update(mean_std_members)
+        composite_figure.save(final_path)
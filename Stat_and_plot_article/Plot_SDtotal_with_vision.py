@@ -3,7 +3,8 @@ import pandas as pd
 import scipy.io
 import matplotlib.pyplot as plt
 import numpy as np
-from TrampolineAcrobaticVariability.Function.Function_stat import safe_interpolate
+from TrampolineAcrobaticVariability.Function.Function_gaze import load_gaze_region_masks
+from TrampolineAcrobaticVariability.Function.Function_cache import ArrayCache
 
 file_path = "/home/lim/Documents/StageMathieu/Tab_result3/sd_pelvis_and_gaze_orientation.mat"
 data_loaded = scipy.io.loadmat(file_path)
@@ -16,8 +17,6 @@ liste_name = data_loaded["liste_name"]
 gaze_position_temporal_evolution_projected_all_subject_acrobatics = data_loaded["gaze_position_temporal_evolution_projected_all_subject_acrobatics"]
 list_name_for_movement = data_loaded["list_name_for_movement"]
 
-X, Y = np.meshgrid([-7 * 0.3048, 7 * 0.3048], [-3.5 * 0.3048, 3.5 * 0.3048])
-
 name_to_color = {
     'GuSe': '#1f77b4',
     'JaSh': '#ff7f0e',
@@ -96,6 +95,10 @@ full_name_acrobatics = {
 }
 
 num_points = 100
+# Regard sur la toile et sur le sol de tous les essais, calcule une fois puis relu tant que le .mat ne change pas
+gaze_region_masks = load_gaze_region_masks(
+    file_path, data_loaded, num_points=num_points, cache=ArrayCache("/home/lim/Documents/StageMathieu/Tab_result3/Gaze_cache/")
+)
 
 time_spent_looking = {
     "gymnasium_floor": {mvt: {name_subject: [] for name_subject in list_name_for_movement[0][idx_mvt]}
@@ -137,34 +140,11 @@ for idx_mvt, mvt in enumerate(movement_to_analyse):
         trial_count = 0
         for idx_trials in range(
                 len(gaze_position_temporal_evolution_projected_all_subject_acrobatics[0][idx_mvt][0][idx_subject][0])):
-            gaze_position = \
-                gaze_position_temporal_evolution_projected_all_subject_acrobatics[0][idx_mvt][0][idx_subject][0][idx_trials]
-
-            data_ground = np.zeros(len(gaze_position), dtype=int)
-            tolerance = 1e-6
-
-            for idx_ligne, ligne in enumerate(gaze_position):
-                if abs((ligne[2]) <= tolerance):  # Ground
-                    data_ground[idx_ligne] = 0
-                else:
-                    data_ground[idx_ligne] = 1
-            data_ground_pd = None
-            data_ground_pd = pd.DataFrame(data_ground[:])
-
-            data_mat = np.zeros(len(gaze_position), dtype=int)
-
-            for idx_ligne, ligne in enumerate(gaze_position):
-                if (X[0][0] <= ligne[0] <= X[0][1] and Y[:, 1][0] <= ligne[1] <= Y[:, 1][1] and abs(ligne[2]) <= tolerance):  # Trampo
-                    data_mat[idx_ligne] = 0
-                else:
-                    data_mat[idx_ligne] = 1
-            data_mat_pd = None
-            data_mat_pd = pd.DataFrame(data_mat[:])
-
-            pd.set_option('display.max_rows', None)
+            i_trial = gaze_region_masks.trial_index[(idx_mvt, idx_subject, idx_trials)]
 
-            data_norm_ground = data_ground_pd.apply(lambda x: safe_interpolate(x, num_points))
-            data_norm_mat = data_mat_pd.apply(lambda x: safe_interpolate(x, num_points))
+            # 0 quand le regard est sur le sol (ou la toile), 1 ailleurs, normalise sur num_points
+            data_norm_ground = pd.DataFrame(np.round(1 - gaze_region_masks.occupancy["gymnasium_floor"][i_trial]))
+            data_norm_mat = pd.DataFrame(np.round(1 - gaze_region_masks.occupancy["trampoline_bed"][i_trial]))
 
             y_line_position = up_line
             y_values_ground = np.full(len(data_norm_ground[0]), np.nan)
@@ -186,8 +166,8 @@ for idx_mvt, mvt in enumerate(movement_to_analyse):
             up_line += 0.04
             trial_count += 0.08
 
-            gym_data = np.where(data_ground == 0)[0].shape[0] / np.shape(data_ground)[0]
-            bed_data = np.where(data_mat == 0)[0].shape[0] / np.shape(data_mat)[0]
+            gym_data = gaze_region_masks.proportion["gymnasium_floor"][i_trial]
+            bed_data = gaze_region_masks.proportion["trampoline_bed"][i_trial]
             
             time_spent_looking["gymnasium_floor"][mvt][name_subject].append(gym_data)
             time_spent_looking_gymnasium_array += [gym_data]
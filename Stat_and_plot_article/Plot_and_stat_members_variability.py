@@ -2,8 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.stats import levene, shapiro
 import numpy as np
-import os
-from TrampolineAcrobaticVariability.Function.Function_Class_Basics import extract_identifier
+from TrampolineAcrobaticVariability.Function.Function_catalog import TrialCatalog
 from TrampolineAcrobaticVariability.Function.Function_stat import (perform_anova_and_tukey,
                                                                    perform_kruskal_and_dunn,
                                                                    prepare_data)
@@ -54,18 +53,13 @@ name_to_color = {
 index = ['takeoff_75', '75_landing', 'takeoff_landing']
 body_parts = ['upper_body', 'lower_body']
 
-position_files = []
 significant_value_upper_body = pd.DataFrame(columns=order, index=index)
 significant_value_lower_body = pd.DataFrame(columns=order, index=index)
 
-for root, dirs, files in os.walk(home_path):
-    for file in files:
-        if 'position' in file:
-            full_path = os.path.join(root, file)
-            position_files.append(full_path)
-
-order_index = {key: index for index, key in enumerate(order)}
-position_files = sorted(position_files, key=lambda x: order_index.get(extract_identifier(x), float('inf')))
+# Les fichiers de resultats sont retrouves dans le catalogue, dans l'ordre des acrobaties
+catalog = TrialCatalog("/home/lim/Documents/StageMathieu/DataTrampo/trial_catalog.sqlite")
+catalog.update_result_files(home_path)
+position_files = catalog.result_files("position", order)
 
 for file in position_files:
     data = pd.read_csv(file)
@@ -1,8 +1,8 @@
-import pandas as pd
 import scipy.io
 import matplotlib.pyplot as plt
 import numpy as np
-from TrampolineAcrobaticVariability.Function.Function_stat import safe_interpolate
+from TrampolineAcrobaticVariability.Function.Function_gaze import load_gaze_region_masks
+from TrampolineAcrobaticVariability.Function.Function_cache import ArrayCache
 from matplotlib.lines import Line2D
 members = ["ElbowR", "HandR", "ElbowL", "HandL", "KneeR", "FootR", "KneeL", "FootL"]
 
@@ -31,9 +31,11 @@ movement_to_analyse = data_loaded["movement_to_analyse"]
 gaze_position_temporal_evolution_projected_all_subject_acrobatics = data_loaded["gaze_position_temporal_evolution_projected_all_subject_acrobatics"]
 
 movement_to_analyse = np.char.strip(movement_to_analyse)
-X, Y = np.meshgrid([-7 * 0.3048, 7 * 0.3048], [-3.5 * 0.3048, 3.5 * 0.3048])
-tolerance = 1e-6
 num_points = 100
+# Regard sur la toile et sur le sol de tous les essais, calcule une fois puis relu tant que le .mat ne change pas
+gaze_region_masks = load_gaze_region_masks(
+    file_path, data_loaded, num_points=num_points, cache=ArrayCache("/home/lim/Documents/StageMathieu/Tab_result3/Gaze_cache/")
+)
 time = np.arange(100)
 
 liste_name = data_loaded["liste_name"]
@@ -59,30 +61,11 @@ for idx_mvt, mvt in enumerate(movement_to_analyse):
 
         for idx_trials in range(
                 len(gaze_position_temporal_evolution_projected_all_subject_acrobatics[0][idx_mvt][0][idx_subject][0])):
-            gaze_position = \
-                gaze_position_temporal_evolution_projected_all_subject_acrobatics[0][idx_mvt][0][idx_subject][0][idx_trials]
-
-            data_mat = np.zeros(len(gaze_position), dtype=int)
-            data_ground = np.zeros(len(gaze_position), dtype=int)
-
-            for idx_ligne, ligne in enumerate(gaze_position):
-                if (X[0][0] <= ligne[0] <= X[0][1] and Y[:, 1][0] <= ligne[1] <= Y[:, 1][1] and abs(
-                        ligne[2]) <= tolerance):
-                    data_mat[idx_ligne] = 0
-                else:
-                    data_mat[idx_ligne] = 1
-
-            for idx_ligne, ligne in enumerate(gaze_position):
-                if abs((ligne[2]) <= tolerance):  # Ground
-                    data_ground[idx_ligne] = 0
-                else:
-                    data_ground[idx_ligne] = 1
-
-            data_mat = pd.DataFrame(data_mat)
-            data_ground = pd.DataFrame(data_ground)
-
-            data_norm_mat = data_mat.apply(lambda x: safe_interpolate(x, num_points)).to_numpy().flatten()
-            data_norm_ground = data_ground.apply(lambda x: safe_interpolate(x, num_points)).to_numpy().flatten()
+            i_trial = gaze_region_masks.trial_index[(idx_mvt, idx_subject, idx_trials)]
+
+            # 0 quand le regard est sur la toile (ou le sol), 1 ailleurs, normalise sur num_points
+            data_norm_mat = np.round(1 - gaze_region_masks.occupancy["trampoline_bed"][i_trial]).astype(int)
+            data_norm_ground = np.round(1 - gaze_region_masks.occupancy["gymnasium_floor"][i_trial]).astype(int)
 
             trials_gaze_mat.append(data_norm_mat)
             trials_gaze_ground.append(data_norm_ground)
@@ -3,45 +3,28 @@ import matplotlib.pyplot as plt
 from scipy.stats import levene, mannwhitneyu, shapiro
 import matplotlib.patches as mpatches
 import numpy as np
-
-## Not operational, need to assign expertise to each individual
-
-data_41 = pd.read_csv('/home/lim/Documents/StageMathieu/Tab_result3/results_41_times_75.csv')
-data_41o = pd.read_csv('/home/lim/Documents/StageMathieu/Tab_result3/results_41o_times_75.csv')
-data_42 = pd.read_csv('/home/lim/Documents/StageMathieu/Tab_result3/results_42_times_75.csv')
-data_43 = pd.read_csv('/home/lim/Documents/StageMathieu/Tab_result3/results_43_times_75.csv')
+from TrampolineAcrobaticVariability.Function.Function_events import load_twist_events, select_twist_events
 
 levels = ['41', '41o', '42', '43']
 
-expertise_labels_41 = data_41.iloc[0]
-expertise_labels_41o = data_41o.iloc[0]
-expertise_labels_42 = data_42.iloc[0]
-expertise_labels_43 = data_43.iloc[0]
-
-data_41 = data_41.iloc[1:]
-data_41o = data_41o.iloc[1:]
-data_42 = data_42.iloc[1:]
-data_43 = data_43.iloc[1:]
-
-data_41 = data_41.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_41['Expertise'] = data_41['Participant'].map(expertise_labels_41)
+# Instants T10 / T75 de tous les essais avec l'expertise de chaque participant, ecrits par Xsens_analysis.py
+twist_events = load_twist_events('/home/lim/Documents/StageMathieu/Tab_result3/twist_events.csv')
 
-data_41o = data_41o.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_41o['Expertise'] = data_41o['Participant'].map(expertise_labels_41o)
 
-data_42 = data_42.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_42['Expertise'] = data_42['Participant'].map(expertise_labels_42)
+def combined_twist_data(fraction):
+    events = select_twist_events(twist_events, fraction)
+    events = events[events["acrobatics"].isin(levels)]
+    return pd.DataFrame(
+        {
+            "Participant": events["participant"],
+            "Score": events["time"],
+            "Expertise": events["expertise"],
+            "Difficulty": events["acrobatics"],
+        }
+    ).reset_index(drop=True)
 
-data_43 = data_43.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_43['Expertise'] = data_43['Participant'].map(expertise_labels_43)
 
-data_41['Difficulty'] = '41'
-data_41o['Difficulty'] = '41o'
-data_42['Difficulty'] = '42'
-data_43['Difficulty'] = '43'
-
-combined_data = pd.concat([data_41, data_41o, data_42, data_43], ignore_index=True)
-combined_data['Score'] = pd.to_numeric(combined_data['Score'], errors='coerce')
+combined_data = combined_twist_data(0.75)
 
 elite_data = combined_data[combined_data['Expertise'] == 'Elite']
 subelite_data = combined_data[combined_data['Expertise'] == 'SubElite']
@@ -153,41 +136,7 @@ ax.set_xlabel('Difficulty Level')
 ax.set_ylabel('Time %')
 
 
-data_41 = pd.read_csv('/Tab_result3/results_41_times_10.csv')
-data_41o = pd.read_csv('/Tab_result3/results_41o_times_10.csv')
-data_42 = pd.read_csv('/Tab_result3/results_42_times_10.csv')
-data_43 = pd.read_csv('/Tab_result3/results_43_times_10.csv')
-
-expertise_labels_41 = data_41.iloc[0]
-expertise_labels_41o = data_41o.iloc[0]
-expertise_labels_42 = data_42.iloc[0]
-expertise_labels_43 = data_43.iloc[0]
-
-data_41 = data_41.iloc[1:]
-data_41o = data_41o.iloc[1:]
-data_42 = data_42.iloc[1:]
-data_43 = data_43.iloc[1:]
-
-data_41 = data_41.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_41['Expertise'] = data_41['Participant'].map(expertise_labels_41)
-
-data_41o = data_41o.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_41o['Expertise'] = data_41o['Participant'].map(expertise_labels_41o)
-
-data_42 = data_42.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_42['Expertise'] = data_42['Participant'].map(expertise_labels_42)
-
-data_43 = data_43.melt(var_name='Participant', value_name='Score', ignore_index=False)
-data_43['Expertise'] = data_43['Participant'].map(expertise_labels_43)
-
-data_41['Difficulty'] = '41'
-data_41o['Difficulty'] = '41o'
-data_42['Difficulty'] = '42'
-data_43['Difficulty'] = '43'
-
-combined_data = pd.concat([data_41, data_41o, data_42, data_43], ignore_index=True)
-combined_data['Score'] = pd.to_numeric(combined_data['Score'], errors='coerce')
-
+combined_data = combined_twist_data(0.1)
 
 elite_data = combined_data[combined_data['Expertise'] == 'Elite']
 subelite_data = combined_data[combined_data['Expertise'] == 'SubElite']
@@ -1,28 +1,36 @@
 import scipy
-import os
+import argparse
+import multiprocessing
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from scipy.stats import ttest_ind, shapiro, levene
 from scipy.integrate import simpson
 # import spm1d
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
 from statsmodels.stats.anova import AnovaRM
-import math
-import mplcursors
-import matplotlib.lines as mlines
 from TrampolineAcrobaticVariability.Function.Function_Class_Basics import (
     load_and_interpolate_for_point,
     find_index
 )
+from TrampolineAcrobaticVariability.Function.Function_trial_store import TrialStore
+from TrampolineAcrobaticVariability.Function.Function_catalog import TrialCatalog
+from TrampolineAcrobaticVariability.Function.Function_events import (
+    TWIST_FRACTIONS,
+    twist_crossings,
+    twist_event_rows,
+    save_twist_events,
+)
+from TrampolineAcrobaticVariability.Function.Function_figures import PlotSpec, FigureQueue
 
 nombre_lignes_minimum = 10
 n_points = 100
-next_index = 0
 time_values = np.linspace(0, n_points-1, num=n_points)
 
 home_path = "/home/lim/Documents/StageMathieu/DataTrampo/Xsens_pkl/"
+results_path = "/home/lim/Documents/StageMathieu/Tab_result3/"
+trial_store = TrialStore("/home/lim/Documents/StageMathieu/DataTrampo/Xsens_trial_store/")
 mean_length_member = np.loadtxt('/home/lim/Documents/StageMathieu/mean_total_length.csv', delimiter=',', skiprows=1)
 movement_to_analyse = ['41', '42', '43', '41o', '4-', '4-o', '8--o', '8-1<', '8-1o', '8-3<', '811<', '822', '831<']
 
@@ -47,33 +55,35 @@ half_twists_per_movement = {
 members = ["Pelvis", "Tete", "AvBrasD", "MainD", "AvBrasG", "MainG", "JambeD", "PiedD", "JambeG", "PiedG"]
 columns_names_anova_rotation = ['ID', 'Expertise', 'Timing', 'Std']
 columns_names_anova_position = ['ID', 'Expertise', 'Timing'] + members[2:]
-liste_name = [name for name in os.listdir(home_path) if os.path.isdir(os.path.join(home_path, name))]
 
-columns_names_area = ['ID', 'Expertise'] + movement_to_analyse
-area_df = pd.DataFrame(columns=columns_names_area, index=liste_name)
+name_to_exclude = ["UpperLegR_X", "UpperLegR_Y", "UpperLegR_Z",
+                   "UpperLegL_X", "UpperLegL_Y", "UpperLegL_Z",
+                   "UpperArmR_X", "UpperArmR_Y", "UpperArmR_Z",
+                   "UpperArmL_X", "UpperArmL_Y", "UpperArmL_Z"]
 
-mean_SD_pelvis_all_subjects_acrobatics = []
-wall_index_all_subjects_acrobatics = []
-members_data_all_subjects_acrobatics = []
-gaze_position_temporal_evolution_projected_all_subject_acrobatics = []
-list_name_for_movement = []
 
-for id_mvt, mvt_name in enumerate(movement_to_analyse):
+def analyse_movement(mvt_name, liste_name):
+    """
+    Analysis of all the subjects of one acrobatics. The result only depends on mvt_name and liste_name, so the
+    acrobatics can be analysed in parallel and merged in the order of movement_to_analyse.
 
+    Returns:
+        dict: Tables (rotation, position, times to T75 / T10), twist events, SD curves, gaze data, area under the SD
+            curve of the pelvis of each subject and the specs of the diagnostic figures.
+    """
     temp_liste_name = []
     for name in liste_name:
-        home_path_subject = f"{home_path}{name}/Pos_JC/{mvt_name}"
-        if not os.path.exists(home_path_subject):
+        if not trial_store.has_trials(participant=name, acrobatics=mvt_name):
             print(f"Subject {name} didn't realize {mvt_name}")
         else:
             temp_liste_name.append(name)
 
-    list_name_for_movement.append(temp_liste_name)
-
     anova_rot_df = pd.DataFrame(columns=columns_names_anova_rotation)
     anova_pos_df = pd.DataFrame(columns=columns_names_anova_position)
     anova_time_to75_df = pd.DataFrame(index=range(nombre_lignes_minimum), columns=temp_liste_name)
     anova_time_to10_df = pd.DataFrame(index=range(nombre_lignes_minimum), columns=temp_liste_name)
+    # Les lignes des tables ANOVA sont numerotees dans chaque acrobatie, l'index n'est pas ecrit dans les .csv
+    next_index = 0
 
     n_half_twist = half_twists_per_movement[mvt_name]
 
@@ -81,21 +91,18 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
     members_data_all_subjects = []
     wall_index_all_subject = []
     gaze_position_temporal_evolution_projected_all_subject = []
+    twist_events = []
+    area_by_subject = {}
+    plot_specs = []
 
     for id_name, name in enumerate(temp_liste_name):
         print(f"{name} {mvt_name} is running")
         home_path_subject = f"{home_path}{name}/Pos_JC/{mvt_name}"
 
-        fichiers_mat_subject = []
-        for root, dirs, files in os.walk(home_path_subject):
-            for file in files:
-                if file.endswith(".mat"):
-                    full_path = os.path.join(root, file)
-                    fichiers_mat_subject.append(full_path)
+        fichiers_mat_subject = trial_store.trials(participant=name, acrobatics=mvt_name)
 
         data_subject = []
         length_subject = []
-        subject_info_dict = {}
         wall_index_subject = []
         gaze_position_temporal_evolution_projected_subject = []
 
@@ -106,7 +113,7 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
              length_segment,
              wall_index,
              gaze_position_temporal_evolution_projected,
-             duration) = load_and_interpolate_for_point(file, include_expertise_laterality_length=True)
+             duration) = load_and_interpolate_for_point(file, include_expertise_laterality_length=True, store=trial_store)
             data_subject.append(data)
             length_subject.append(length_segment)
             wall_index_subject.append(wall_index)
@@ -115,149 +122,63 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
         joint_center_name_all_axes = data_subject[0].columns
         n_columns_all_axes = len(joint_center_name_all_axes)
 
-        name_to_exclude = ["UpperLegR_X", "UpperLegR_Y", "UpperLegR_Z",
-                              "UpperLegL_X", "UpperLegL_Y", "UpperLegL_Z",
-                              "UpperArmR_X", "UpperArmR_Y", "UpperArmR_Z",
-                              "UpperArmL_X", "UpperArmL_Y", "UpperArmL_Z"]
-
         columns_to_exclude = []
         for column_name in name_to_exclude:
             column_index = find_index(column_name, joint_center_name_all_axes.tolist())
             if column_index is not None:
                 columns_to_exclude.append(column_index)
 
+        all_data_subject = np.array([trial.to_numpy() for trial in data_subject])
 
         ################ Plot all try ################
-        plt.figure(figsize=(30, 30))
-
-        colors_subject1 = plt.cm.Blues(np.linspace(0.5, 1, len(data_subject)))
-
-        for i in range(n_columns_all_axes):
-            if i in columns_to_exclude:
-                continue
-            ax = plt.subplot(6, 6, i + 1 - sum(j < i for j in columns_to_exclude))
-            jc_name = joint_center_name_all_axes[i]
-
-            # Plot subject data
-            lines = []
-            for idx, trial_data in enumerate(data_subject):
-                trial_name = fichiers_mat_subject[idx]
-                trial = trial_data.iloc[:, i]
-                line, = ax.plot(trial, label=f"subject1 Trial {trial_name}", alpha=0.7, linewidth=1,
-                                color=colors_subject1[idx])
-                lines.append(line)
-
-            plt.title(f"{jc_name}")
-            if i in (0, 1, 2):
-                plt.ylabel("Rotation (rad)")
-            else:
-                plt.ylabel("Position")
-
-            if i == 0:
-                legend_subject1 = mlines.Line2D([], [], color='blue', markersize=15, label='subject1')
-                plt.legend(handles=[legend_subject1], loc='upper right')
-
-            mplcursors.cursor(lines, hover=True).connect("add", lambda sel: sel.annotation.set_text(
-                f"File: {sel.artist.get_label()}"))
-
-        plt.tight_layout()
-        plt.subplots_adjust(top=0.95, hspace=0.5, wspace=0.5)
-        plt.savefig(f"{home_path_subject}/all_data.png", dpi= 200)
-        # plt.show()
-        plt.close()
-
-
-        ################ Plot SD all axes ################
-
-        std_subject1_all_data = []
-        plt.figure(figsize=(30, 24))
-        for i in range(n_columns_all_axes):
-            if i in columns_to_exclude:
-                continue
-
-            plt.subplot(6, 6, i + 1 - sum(j < i for j in columns_to_exclude))
-            col_name = joint_center_name_all_axes[i]
-
-            data_subject1_col = [trial.iloc[:, i].values for trial in data_subject]
-            std_subject1 = np.std(data_subject1_col, axis=0)
-            std_subject1_all_data.append(std_subject1)
-
-            plt.plot(std_subject1, label=f"subject1 - {col_name}", alpha=0.7, linewidth=1, color="blue")
-
-            plt.title(f"SD - {col_name}")
-            plt.ylabel("SD")
-            if i == 0:
-                plt.legend(loc='upper right')
-        plt.tight_layout()
-        plt.subplots_adjust(top=0.95, hspace=0.5, wspace=0.5)
-        plt.savefig(f"{home_path_subject}/all_axes_sd.png", dpi= 200)
-        plt.close()
-
-
-        std_subject1_all_data = np.stack(std_subject1_all_data)
+        plot_specs.append(
+            PlotSpec(
+                "all_trials_grid",
+                f"{home_path_subject}/all_data.png",
+                {"trials": all_data_subject},
+                {
+                    "column_names": joint_center_name_all_axes.tolist(),
+                    "columns_to_exclude": columns_to_exclude,
+                    "trial_labels": list(fichiers_mat_subject),
+                },
+            )
+        )
+
+        ################ SD all axes ################
+        kept_columns = [i for i in range(n_columns_all_axes) if i not in columns_to_exclude]
+        std_subject1_all_data = np.std(all_data_subject[:, :, kept_columns], axis=0).T
+
+        plot_specs.append(
+            PlotSpec(
+                "sd_grid",
+                f"{home_path_subject}/all_axes_sd.png",
+                {"std": std_subject1_all_data},
+                {"column_names": joint_center_name_all_axes.tolist(), "columns_to_exclude": columns_to_exclude},
+            )
+        )
 
         ################ Mean STD for the 3 axes ################
-
         result_subject = np.zeros((len(members), n_points))
-
-        fig, axs = plt.subplots(5, 2, figsize=(14, 16))
-
         for i in range(len(members)):
             start_index = i * 3
             end_index = start_index + 3
             result_subject[i] = np.sum(std_subject1_all_data[start_index:end_index], axis=0)  # sum or mean
 
-            row = i // 2
-            col = i % 2
-            axs[row, col].plot(result_subject[i], color="blue")
-            axs[row, col].set_title(f'{members[i]}')
-            axs[row, col].set_ylabel('SD')
-            if i == 0:
-                plt.legend(loc='upper right')
-        plt.tight_layout()
-        plt.savefig(f"{home_path_subject}/mean_axes_sd.png", dpi= 200)
-        # plt.show()
-        plt.close()
+        plot_specs.append(
+            PlotSpec("members_grid", f"{home_path_subject}/mean_axes_sd.png", {"sd": result_subject}, {"members": members})
+        )
 
         ################ Get 75% of twist ################
         if n_half_twist != 0:
 
-            all_data_subject = []
-            for i in range(len(data_subject)):
-                all_data_subject.append(data_subject[i])
-            all_data_subject = np.array(all_data_subject)
-
-            timestramp_treshold_subject_75 = []
-            for trials in range(all_data_subject.shape[0]):
-                initial_rot = all_data_subject[trials, 0, 2]
-                for timestamp in range(n_points):
-                    if laterality[0] == "D":
-                        threshold = initial_rot - n_half_twist * 0.75 * math.pi
-                        if threshold > all_data_subject[trials, timestamp, 2]:
-                            timestramp_treshold_subject_75.append(timestamp)
-                            break
-                    else:
-                        threshold = initial_rot + n_half_twist * 0.75 * math.pi
-                        if threshold < all_data_subject[trials, timestamp, 2]:
-                            timestramp_treshold_subject_75.append(timestamp)
-                            break
-
-            ##
-            timestramp_treshold_subject_10 = []
-            for trials in range(all_data_subject.shape[0]):
-                initial_rot = all_data_subject[trials, 0, 2]
-                for timestamp in range(n_points):
-                    if laterality[0] == "D":
-                        threshold = initial_rot - n_half_twist * 0.1 * math.pi
-                        if threshold > all_data_subject[trials, timestamp, 2]:
-                            timestramp_treshold_subject_10.append(timestamp)
-                            break
-                    else:
-                        threshold = initial_rot + n_half_twist * 0.1 * math.pi
-                        if threshold < all_data_subject[trials, timestamp, 2]:
-                            timestramp_treshold_subject_10.append(timestamp)
-                            break
-            ##
+            # Premier instant a 10% et 75% de la vrille pour tous les essais a la fois
+            crossings = twist_crossings(all_data_subject[:, :, 2], n_half_twist, laterality[0], TWIST_FRACTIONS)
+            trial_names = [trial_store.index.loc[file, "trial"] for file in fichiers_mat_subject]
+            twist_events += twist_event_rows(
+                mvt_name, name, trial_names, str(subject_expertise[0]), str(laterality[0]), crossings, TWIST_FRACTIONS
+            )
+            timestramp_treshold_subject_10 = [int(time) for time in crossings[0] if not np.isnan(time)]
+            timestramp_treshold_subject_75 = [int(time) for time in crossings[1] if not np.isnan(time)]
 
             length_segment_mean = np.mean(length_subject, axis=0)
 
@@ -334,37 +255,106 @@ for id_mvt, mvt_name in enumerate(movement_to_analyse):
 
         area_under_curve = simpson(result_subject[0], x=time_values)
         print("Area under curves with simpson method :", area_under_curve)
-
-        area_df.at[name, 'ID'] = name
-        area_df.at[name, 'Expertise'] = str(subject_expertise[0])
-        area_df.at[name, mvt_name] = area_under_curve
-
-    mean_SD_pelvis_all_subjects_acrobatics.append(mean_SD_pelvis_all_subjects)
-    wall_index_all_subjects_acrobatics.append(wall_index_all_subject)
-    members_data_all_subjects_acrobatics.append(members_data_all_subjects)
-    gaze_position_temporal_evolution_projected_all_subject_acrobatics.append(gaze_position_temporal_evolution_projected_all_subject)
-
-
-    if n_half_twist != 0:
-
-        print(anova_rot_df)
-        anova_rot_df.to_csv(f'/home/lim/Documents/StageMathieu/Tab_result3/results_{mvt_name}_rotation.csv', index=False)
-        anova_pos_df.to_csv(f'/home/lim/Documents/StageMathieu/Tab_result3/results_{mvt_name}_position.csv', index=False)
-        anova_time_to75_df.to_csv(f'/home/lim/Documents/StageMathieu/Tab_result3/results_{mvt_name}_times_75.csv', index=False)
-        anova_time_to10_df.to_csv(f'/home/lim/Documents/StageMathieu/Tab_result3/results_{mvt_name}_times_10.csv', index=False)
-
-mat_data = {
-                "mean_SD_pelvis_all_subjects_acrobatics": mean_SD_pelvis_all_subjects_acrobatics,
-                "members_data_all_subjects_acrobatics": members_data_all_subjects_acrobatics,
-                "movement_to_analyse": movement_to_analyse,
-                "wall_index_all_subjects_acrobatics": wall_index_all_subjects_acrobatics,
-                "gaze_position_temporal_evolution_projected_all_subject_acrobatics": gaze_position_temporal_evolution_projected_all_subject_acrobatics,
-                "liste_name": liste_name,
-                "list_name_for_movement": list_name_for_movement,
+        area_by_subject[name] = (str(subject_expertise[0]), area_under_curve)
+
+    return {
+        "list_name_for_movement": temp_liste_name,
+        "anova_rot_df": anova_rot_df,
+        "anova_pos_df": anova_pos_df,
+        "anova_time_to75_df": anova_time_to75_df,
+        "anova_time_to10_df": anova_time_to10_df,
+        "twist_events": twist_events,
+        "mean_SD_pelvis_all_subjects": mean_SD_pelvis_all_subjects,
+        "members_data_all_subjects": members_data_all_subjects,
+        "wall_index_all_subject": wall_index_all_subject,
+        "gaze_position_temporal_evolution_projected_all_subject": gaze_position_temporal_evolution_projected_all_subject,
+        "area_by_subject": area_by_subject,
+        "plot_specs": plot_specs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variability analysis of the Xsens trials of each acrobatics")
+    parser.add_argument(
+        "--figures", choices=["now", "deferred", "off"], default="now",
+        help="Render the diagnostic figures during the analysis, store them for Function_figures or skip them",
+    )
+    parser.add_argument("--jobs", type=int, default=None, help="Number of acrobatics analysed at the same time")
+    args = parser.parse_args()
+
+    catalog = TrialCatalog("/home/lim/Documents/StageMathieu/DataTrampo/trial_catalog.sqlite")
+    liste_name = catalog.participants()
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+
+    # Chaque acrobatie est analysee dans un processus, les figures sont rendues a cote au fur et a mesure
+    results = {}
+    with FigureQueue(args.figures, pending_path=f"{results_path}pending_figures.pkl") as figure_queue:
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=mp_context) as executor:
+            futures = {
+                executor.submit(analyse_movement, mvt_name, liste_name): mvt_name for mvt_name in movement_to_analyse
             }
-
-print(area_df)
-area_df.to_csv(f'/home/lim/Documents/StageMathieu/Tab_result3/results_area_under_curve2.csv', index=False)
-
-scipy.io.savemat("/home/lim/Documents/StageMathieu/Tab_result3/sd_pelvis_and_gaze_orientation.mat", mat_data)
-
+            for future in as_completed(futures):
+                mvt_name = futures[future]
+                results[mvt_name] = future.result()
+                for spec in results[mvt_name]["plot_specs"]:
+                    figure_queue.submit(spec)
+
+    # Fusion dans l'ordre de movement_to_analyse, independante de l'ordre de fin des processus
+    columns_names_area = ['ID', 'Expertise'] + movement_to_analyse
+    area_df = pd.DataFrame(columns=columns_names_area, index=liste_name)
+
+    mean_SD_pelvis_all_subjects_acrobatics = []
+    wall_index_all_subjects_acrobatics = []
+    members_data_all_subjects_acrobatics = []
+    gaze_position_temporal_evolution_projected_all_subject_acrobatics = []
+    list_name_for_movement = []
+    twist_events = []
+
+    for mvt_name in movement_to_analyse:
+        result = results[mvt_name]
+        list_name_for_movement.append(result["list_name_for_movement"])
+        mean_SD_pelvis_all_subjects_acrobatics.append(result["mean_SD_pelvis_all_subjects"])
+        wall_index_all_subjects_acrobatics.append(result["wall_index_all_subject"])
+        members_data_all_subjects_acrobatics.append(result["members_data_all_subjects"])
+        gaze_position_temporal_evolution_projected_all_subject_acrobatics.append(
+            result["gaze_position_temporal_evolution_projected_all_subject"]
+        )
+        twist_events += result["twist_events"]
+
+        for name, (expertise, area_under_curve) in result["area_by_subject"].items():
+            area_df.at[name, 'ID'] = name
+            area_df.at[name, 'Expertise'] = expertise
+            area_df.at[name, mvt_name] = area_under_curve
+
+        if half_twists_per_movement[mvt_name] != 0:
+            print(result["anova_rot_df"])
+            result["anova_rot_df"].to_csv(f'{results_path}results_{mvt_name}_rotation.csv', index=False)
+            result["anova_pos_df"].to_csv(f'{results_path}results_{mvt_name}_position.csv', index=False)
+            result["anova_time_to75_df"].to_csv(f'{results_path}results_{mvt_name}_times_75.csv', index=False)
+            result["anova_time_to10_df"].to_csv(f'{results_path}results_{mvt_name}_times_10.csv', index=False)
+
+    mat_data = {
+                    "mean_SD_pelvis_all_subjects_acrobatics": mean_SD_pelvis_all_subjects_acrobatics,
+                    "members_data_all_subjects_acrobatics": members_data_all_subjects_acrobatics,
+                    "movement_to_analyse": movement_to_analyse,
+                    "wall_index_all_subjects_acrobatics": wall_index_all_subjects_acrobatics,
+                    "gaze_position_temporal_evolution_projected_all_subject_acrobatics": gaze_position_temporal_evolution_projected_all_subject_acrobatics,
+                    "liste_name": liste_name,
+                    "list_name_for_movement": list_name_for_movement,
+                }
+
+    # Table unique des instants T10 / T75 de tous les essais, lue par Get_velocity_at_T75.py et Time_to_T75_analysis
+    save_twist_events(f'{results_path}twist_events.csv', twist_events)
+
+    print(area_df)
+    area_df.to_csv(f'{results_path}results_area_under_curve2.csv', index=False)
+
+    scipy.io.savemat(f"{results_path}sd_pelvis_and_gaze_orientation.mat", mat_data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+The goal of this program is to find the gaps of the markers of all the labelled trials before the Kalman reconstruction.
+"""
+
+import pandas as pd
+from TrampolineAcrobaticVariability.Function.Function_gaps import scan_gaps
+
+repertory_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
+csv_path = f"{repertory_path}Labelling_trampo.csv"
+interval_name_tab = pd.read_csv(csv_path, sep=';', usecols=['Participant', 'Analyse', 'Essai', 'Debut', 'Fin', 'Durée'])
+interval_name_tab = interval_name_tab[interval_name_tab["Analyse"] == 'O']
+
+trials = []
+for index, row in interval_name_tab.iterrows():
+    name = row['Participant']
+    file_path_complet = f"{repertory_path}{name}/Tests/{row['Essai']}.c3d"
+    trials.append((file_path_complet, (row['Debut'], row['Fin']), f"{repertory_path}{name}/Gaps/"))
+
+##
+if __name__ == "__main__":
+    # Un tableau de trous (marker, start, length) par essai dans <participant>/Gaps/, puis un resume de la cohorte
+    summary = scan_gaps(trials)
+    summary.to_csv(f"{repertory_path}gaps_summary.csv", index=False)
+
+    with_gaps = summary[summary["n_gaps"] > 0].sort_values("missing_frames", ascending=False)
+    for _, row in with_gaps.iterrows():
+        print(
+            f"{row['file_path']} {row['interval']}: {row['n_gaps']:.0f} trous sur {row['n_markers_with_gaps']:.0f} "
+            f"marqueurs, le plus long de {row['longest_gap']:.0f} frames"
+        )
@@ -1,19 +1,18 @@
 import pickle
 import matplotlib.pyplot as plt
-import biorbd
 import numpy as np
 import bioviz
 import os
 import scipy
-from scipy.spatial.transform import Rotation as R
-from scipy.signal import savgol_filter
 from mpl_toolkits.mplot3d import Axes3D
 from matplotlib.animation import FuncAnimation
-from TrampolineAcrobaticVariability.Function.Function_build_model import (
-    convert_marker_to_local_frame,
-    calculer_rotation_et_angle,
+from TrampolineAcrobaticVariability.Function.Function_kinematics import (
+    xsens_joint_centers_in_pelvis_frame,
+    xsens_segment_rotations,
 )
 from TrampolineAcrobaticVariability.Function.Function_Class_Basics import find_index
+from TrampolineAcrobaticVariability.Function.Function_angular_velocity import angular_velocity_from_rotations
+from TrampolineAcrobaticVariability.Function.Function_signal import FilterSpec, filter_and_derive
 
 parent_list_xsens_JC = [
     "Pelvis",  # 0
@@ -92,72 +91,18 @@ Xsens_orientation_per_move_complet = Xsens_orientation_per_move[:, mask_colonnes
 nb_mat = Xsens_orientation_per_move_complet.shape[1]//4
 Q = np.zeros((nb_mat * 3, n_frames))
 
-n_markers = len(parent_list_xsens_JC_complet)
-
-Jc_in_pelvis_frame = np.ndarray((3, n_markers, n_frames))
-
-rot_head_complet = []
-
-for i in range(n_frames):
-    mid_hip_pos = (Xsens_positions_complet[:, find_index("UpperLegR", parent_list_xsens_JC_complet), i] +
-                   Xsens_positions_complet[:, find_index("UpperLegL", parent_list_xsens_JC_complet), i]) / 2
-
-    rot_mov_without_zrot = calculer_rotation_et_angle(find_index("Pelvis", parent_list_xsens_JC_complet),
-                                         Xsens_orientation_per_move_complet[i, :])
-    rot_mov = calculer_rotation_et_angle(find_index("Pelvis", parent_list_xsens_JC_complet),
-                                         Xsens_orientation_per_move_complet[i, :], move_orientation)
-
-    rot_head = calculer_rotation_et_angle(find_index("Head", parent_list_xsens_JC_complet),
-                                         Xsens_orientation_per_move_complet[i, :], move_orientation)
-    rot_head_complet.append(rot_head)
-
-    for idx, jcname in enumerate(parent_list_xsens_JC_complet):
-
-        if idx == find_index("Pelvis", parent_list_xsens_JC_complet):
-            Rotation_pelvis = biorbd.Rotation(
-                rot_mov[0, 0],
-                rot_mov[0, 1],
-                rot_mov[0, 2],
-                rot_mov[1, 0],
-                rot_mov[1, 1],
-                rot_mov[1, 2],
-                rot_mov[2, 0],
-                rot_mov[2, 1],
-                rot_mov[2, 2],
-            )
-            Jc_in_pelvis_frame[:, idx, i] = biorbd.Rotation.toEulerAngles(
-                Rotation_pelvis, "xyz").to_array()
-            # Jc_in_pelvis_frame[:, idx, i] = mid_hip_pos
-
-        else:
-            P2_prime = convert_marker_to_local_frame(mid_hip_pos, rot_mov_without_zrot, Xsens_positions_complet[:, idx, i])
-            Jc_in_pelvis_frame[:, idx, i] = P2_prime
+Jc_in_pelvis_frame = xsens_joint_centers_in_pelvis_frame(
+    Xsens_positions_complet, Xsens_orientation_per_move_complet, move_orientation, parent_list_xsens_JC_complet
+)
+rot_head_complet = xsens_segment_rotations(
+    Xsens_orientation_per_move_complet, find_index("Head", parent_list_xsens_JC_complet), move_orientation
+)
 
 Jc_in_pelvis_frame = np.unwrap(Jc_in_pelvis_frame)
 
 ##
 
 
-def rotation_matrix_to_axis_angle(rotation_matrix):
-    r = R.from_matrix(rotation_matrix)
-    return r.as_rotvec()
-
-
-def calculate_angular_velocity(rotation_matrices, delta_t):
-    angular_velocities = []
-    num_frames = len(rotation_matrices)
-
-    for i in range(1, num_frames):
-        delta_rotation_matrix = np.dot(rotation_matrices[i], np.linalg.inv(rotation_matrices[i - 1]))
-
-        delta_rotvec = rotation_matrix_to_axis_angle(delta_rotation_matrix)
-
-        angular_velocity = delta_rotvec / delta_t
-        angular_velocities.append(angular_velocity)
-
-    return np.array(angular_velocities)
-
-
 def radians_to_degrees(angular_velocities):
     return angular_velocities * (180 / np.pi)
 
@@ -167,9 +112,11 @@ def calculate_total_angular_speed(angular_velocities):
 
 
 delta_t = 1/60
-angular_velocities = calculate_angular_velocity(rot_head_complet, delta_t)
+angular_velocities = angular_velocity_from_rotations(rot_head_complet, delta_t)
 angular_velocities_degrees = radians_to_degrees(angular_velocities)
-angular_velocities_filtered = savgol_filter(angular_velocities_degrees, window_length=11, polyorder=2, axis=0)
+angular_velocities_filtered = filter_and_derive(
+    angular_velocities_degrees, FilterSpec("savgol", window_length=11, polyorder=2), axis=0, derivatives=(0,)
+)[0]
 total_angular_speed = calculate_total_angular_speed(angular_velocities_filtered)# Tracer les vitesses angulaires
 time_steps = np.arange(1, len(rot_head_complet)) * delta_t
 
@@ -1,24 +1,38 @@
 import biorbd
 import numpy as np
 import os
+import time
 import bioviz
 import pandas as pd
 import scipy
 import matplotlib.pyplot as plt
 from TrampolineAcrobaticVariability.Function.Function_build_model import (
     get_all_matrice,
-    average_rotation_matrix,
-    calculer_rotation_relative,
-    convert_marker_to_local_frame,
+    load_relax_reference,
 )
-from TrampolineAcrobaticVariability.Function.Function_Class_Basics import (
-    parent_list_marker,
-    check_matrix_orthogonality,
-    find_index
+from TrampolineAcrobaticVariability.Function.Function_Class_Basics import parent_list_marker
+from TrampolineAcrobaticVariability.Function.Function_kinematics import (
+    segment_euler_sequences,
+    check_rotation_matrices,
+    joint_angles_from_rotations,
+    ModelKinematics,
+    joint_centers_in_pelvis_frame,
 )
+from TrampolineAcrobaticVariability.Function.Function_reconstruction import (
+    ReconstructionJob,
+    run_reconstruction_jobs,
+    iter_reconstruction_jobs,
+    print_reconstruction_summary,
+)
+from TrampolineAcrobaticVariability.Function.Function_cache import ArrayCache
+from TrampolineAcrobaticVariability.Function.Function_quality import quality_summary
 
 home_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
 is_y_up = False
+# Les reconstructions de Kalman deja calculees sont relues depuis ce dossier
+kalman_cache = ArrayCache(f"{home_path}Kalman_cache/")
+# RMSD maximale (m) entre marqueurs experimentaux et reconstruits au dela de laquelle un essai est a reprendre
+max_rmsd = 0.03
 
 csv_path = f"{home_path}Labelling_trampo.csv"
 interval_name_tab = pd.read_csv(csv_path, sep=';', usecols=['Participant', 'Analyse', 'Essai', 'Debut', 'Fin', 'Durée'])
@@ -29,30 +43,35 @@ interval_name_tab.loc[:, 'Essai'] = interval_name_tab['Essai'] + '.c3d'
 # Obtenir la liste des participants
 participant_names = interval_name_tab['Participant'].unique()
 
+# Liste des reconstructions (Relax et essais) pour chaque participant
+jobs = []
+relax_jobs = {}
+trial_jobs = {}
 for name in participant_names:
     essai_by_name = interval_name_tab[interval_name_tab["Participant"] == name].copy()
     essai_by_name.loc[:, 'Interval'] = essai_by_name.apply(lambda row: (row['Debut'], row['Fin']), axis=1)
-    folder_path = f"{home_path}{name}/Q/"
-    model_path = f"{home_path}{name}/{name}.s2mMod"
-    model = biorbd.Model(model_path)
+    model_kalman_path = f"{home_path}{name}/{name}.s2mMod"
 
     file_path_c3d = f"{home_path}{name}/Tests/"
-    file_intervals = []
+    file_path_relax = f"{home_path}{name}/Score/"
+
+    relax_jobs[name] = ReconstructionJob(file_path_relax + "Relax.c3d", (0, 50), model_kalman_path)
 
+    trial_jobs[name] = []
     for index, row in essai_by_name.iterrows():
         c3d_file = row['Essai']
         interval = row['Interval']
         file_path_complet = f"{file_path_c3d}{c3d_file}"
-        file_intervals.append((file_path_complet, interval))
-
-#
-    model_path = f"{home_path}{name}/New{name}Model.s2mMod"
-    model_kalman = f"{home_path}{name}/{name}.s2mMod"
+        trial_jobs[name].append(ReconstructionJob(file_path_complet, interval, model_kalman_path))
+    jobs += trial_jobs[name]
 
-    model_kalman = biorbd.Model(model_kalman)
 
-    file_path_c3d = f"{home_path}{name}/Tests/"
-    file_path_relax = f"{home_path}{name}/Score/"
+def write_participant_outputs(name, relax_result, trial_results):
+    """
+    Joint angles and joint centers in the pelvis frame of the reconstructed trials of a participant, written in
+    <participant>/Pos_JC/<acrobatie>/<essai>.mat.
+    """
+    model_path = f"{home_path}{name}/New{name}Model.s2mMod"
 
     folder_path = f"{home_path}{name}/Pos_JC/"
 
@@ -61,83 +80,36 @@ for name in participant_names:
 
     select_dof = "FullDof" in model_path
 
-    relax_intervals = [(file_path_relax + "Relax.c3d", (0, 50))]
-
-    file_path_relax, interval_relax = relax_intervals[0]
-    rot_mat_relax, relax_articular_joint_center, pos_relax = get_all_matrice(file_path_relax, interval_relax, model_kalman, is_y_up)
-
-    for file_path, interval in file_intervals:
-        movement_matrix, articular_joint_center, pos_mov = get_all_matrice(file_path, interval, model_kalman, is_y_up)
+    if relax_result.error is not None:
+        print(f"Relax reconstruction failed for {name}, participant skipped")
+        return
+    relax_reference = relax_result.output
+    relax_matrix = relax_reference["relax_matrix"]
+    relax_matrix_in_parent_frame = relax_reference["matrix_in_parent_frame"]
+
+    # Structure du modele et indices des marqueurs resolus une seule fois par participant
+    model_kinematics = ModelKinematics(biorbd.Model(model_path))
+    desired_order = model_kinematics.marker_names
+
+    for result in trial_results:
+        if result.error is not None:
+            continue
+        file_path = result.job.file_path
+        movement_matrix, articular_joint_center, pos_mov = result.output
         pelv_trans_list = articular_joint_center[0]
 
         file_name, _ = os.path.splitext(os.path.basename(file_path))
 
-        nb_frames = movement_matrix.shape[1]
         nb_mat = movement_matrix.shape[0]
-        Q = np.zeros((nb_mat * 3, nb_frames))
-
-        # Calcul de la matrice de rotation moyenne pour chaque articulation
-        relax_matrix = np.zeros((nb_mat, 3, 3))
-        for i in range(nb_mat):
-            matrices = rot_mat_relax[i]
-            relax_matrix[i] = average_rotation_matrix(matrices)
-
-        for i_frame in range(nb_frames):
-            RotMat_between_total = []
-            euler_sequences = {}
-            for i_segment in range(nb_mat):
-                RotMat = relax_matrix[i_segment, :, :]
-                RotMat_current = movement_matrix[i_segment, i_frame, :, :]
-                check_matrix_orthogonality(RotMat, i_segment, "RotMat")
-                check_matrix_orthogonality(RotMat_current, i_segment, "RotMat_current")
-
-                index_to_key = {i: key for i, key in enumerate(parent_list_marker.keys())}
-                key_for_given_index = index_to_key[i_segment]
-                info_for_given_index = parent_list_marker[key_for_given_index]
-
-                if info_for_given_index is not None:
-                    parent_index, parent_name = info_for_given_index
-
-                RotMat_between_relax = calculer_rotation_relative(relax_matrix[parent_index], relax_matrix[i_segment]) \
-                    if info_for_given_index is not None else relax_matrix[i_segment]
-                RotMat_between_mvt = calculer_rotation_relative(movement_matrix[parent_index][i_frame], movement_matrix[i_segment][i_frame]) \
-                    if info_for_given_index is not None else movement_matrix[i_segment][i_frame]
-
-                RotMat_between = np.linalg.inv(RotMat_between_relax) @ RotMat_between_mvt
-                RotMat_between = biorbd.Rotation(
-                    RotMat_between[0, 0],
-                    RotMat_between[0, 1],
-                    RotMat_between[0, 2],
-                    RotMat_between[1, 0],
-                    RotMat_between[1, 1],
-                    RotMat_between[1, 2],
-                    RotMat_between[2, 0],
-                    RotMat_between[2, 1],
-                    RotMat_between[2, 2],
-                )
-                RotMat_between_total.append(RotMat_between)
-
-                if select_dof is True:
-                    euler_sequence = "xyz"
-                    euler_sequences[i_segment] = euler_sequence
-                    Q[i_segment * 3: (i_segment + 1) * 3, i_frame] = biorbd.Rotation.toEulerAngles(
-                            RotMat_between, euler_sequence).to_array()
-                else:
-                    if i_segment in (3, 6):
-                        euler_sequence = "zyx"
-                    elif i_segment in (10, 13):
-                        euler_sequence = "x"
-                    else:
-                        euler_sequence = "xyz"
-
-                    euler_sequences[i_segment] = euler_sequence
-
-                    if euler_sequence == "x":  # Special handling for single axis
-                        Q[i_segment * 3: (i_segment + 1) * 3 - 2, i_frame] = biorbd.Rotation.toEulerAngles(
-                            RotMat_between, euler_sequence).to_array()
-                    else:  # General case for three axes
-                        Q[i_segment * 3: (i_segment + 1) * 3, i_frame] = biorbd.Rotation.toEulerAngles(
-                            RotMat_between, euler_sequence).to_array()
+
+        check_rotation_matrices(relax_matrix, "RotMat")
+        check_rotation_matrices(movement_matrix, "RotMat_current")
+
+        # Rotations de tous les segments et de toutes les frames par rapport au parent puis a la pose Relax
+        euler_sequences = segment_euler_sequences(nb_mat, select_dof)
+        Q = joint_angles_from_rotations(
+            movement_matrix, relax_matrix_in_parent_frame, parent_list_marker, euler_sequences
+        )
 
         Q_corrected = np.unwrap(Q, axis=1)
 
@@ -157,8 +129,6 @@ for name in participant_names:
             if add_pi:
                 Q_corrected[i] = Q_corrected[i] + 2 * np.pi
 
-        Q_degrees = np.degrees(Q_corrected)
-
         # Ajout pelvis trans
         Q_complet = np.concatenate((pelv_trans_list.T, Q_corrected), axis=0)
         euler_sequences_complet = {key+1: value for key, value in euler_sequences.items()}
@@ -188,29 +158,9 @@ for name in participant_names:
         # plt.tight_layout()
         # plt.show()
 
-        model = biorbd.Model(model_path)
-
-        desired_order = [model.markerNames()[i].to_string() for i in range(model.nbMarkers())]
-        n_markers = len(desired_order)
-        markers_JC = np.ndarray((3, n_markers, nb_frames))
-
-        for i in range(nb_frames):
-            newQ = biorbd.GeneralizedCoordinates(Q_ready_to_use[:, i])
-            markers_reconstructed = model.markers(newQ)
-            for m, marker_recons in enumerate(markers_reconstructed):
-                markers_JC[:, m, i] = marker_recons.to_array()
-
-        Jc_in_pelvis_frame = np.ndarray((3, n_markers, nb_frames))
-
-        for i in range(nb_frames):
-            mid_hip_pos = (markers_JC[:, find_index("JC_CuisseD", desired_order), i] + markers_JC[:, find_index("JC_CuisseG", desired_order), i]) / 2
-            for idx, jcname in enumerate(desired_order):
-                if idx == find_index("JC_pelvis", desired_order):
-                    # Jc_in_pelvis_frame[:, idx, i] = mid_hip_pos
-                    Jc_in_pelvis_frame[:, idx, i] = Q_complet[3:6, i]
-                else:
-                    P2_prime = convert_marker_to_local_frame(mid_hip_pos, movement_matrix[find_index("JC_pelvis", desired_order), i, :, :], markers_JC[:, idx, i])
-                    Jc_in_pelvis_frame[:, idx, i] = P2_prime
+        # Cinematique directe de tous les marqueurs et de toutes les frames en un seul appel
+        markers_JC = model_kinematics.markers(Q_ready_to_use)
+        Jc_in_pelvis_frame = joint_centers_in_pelvis_frame(markers_JC, movement_matrix, Q_complet, desired_order)
 
         colors = ['r', 'g', 'b']
         n_rows = int(np.ceil(Jc_in_pelvis_frame.shape[1] / 4))
@@ -228,21 +178,7 @@ for name in participant_names:
         plt.tight_layout()
         plt.show()
 
-        from matplotlib.animation import FuncAnimation
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
-        sc = ax.scatter([], [], [])
-        def init():
-            sc._offsets3d = ([], [], [])
-            return sc,
-        def update(frame):
-            x = Jc_in_pelvis_frame[0, :, frame]
-            y = Jc_in_pelvis_frame[1, :, frame]
-            z = Jc_in_pelvis_frame[2, :, frame]
-            sc._offsets3d = (x, y, z)
-            return sc,
-        # ani = FuncAnimation(fig, update, frames=nb_frames, init_func=init, blit=False)
-        # plt.show()
+        # Animation des centres articulaires : render_stick_figures.py --source vicon (hors ligne, tous les essais)
 
         # Création d'un dictionnaire pour le stockage
         mat_data = {
@@ -266,4 +202,34 @@ for name in participant_names:
         # b = bioviz.Viz(loaded_model=model)
         # b.load_movement(Q_ready_to_use)
         # b.load_experimental_markers(markers_JC[:, :, :])
-        # b.exec()
\ No newline at end of file
+        # b.exec()
+
+
+def main():
+    # Pose de reference Relax de chaque participant, relue a cote du modele si elle est a jour
+    relax_results = run_reconstruction_jobs(
+        list(relax_jobs.values()), load_relax_reference, is_y_up=is_y_up, cache=kalman_cache
+    )
+    relax_results_by_name = {name: result for name, result in zip(relax_jobs.keys(), relax_results)}
+
+    participant_by_model = {job.model_path: name for name, job in relax_jobs.items()}
+
+    # Les reconstructions de Kalman sont reparties sur plusieurs processus, un modele charge par participant. Les
+    # essais d'un participant sont ecrits des que son worker a fini, puis leurs matrices sont liberees
+    start = time.perf_counter()
+    results = []
+    for participant_results in iter_reconstruction_jobs(jobs, get_all_matrice, is_y_up=is_y_up, cache=kalman_cache):
+        name = participant_by_model[participant_results[0].job.model_path]
+        write_participant_outputs(name, relax_results_by_name[name], participant_results)
+        results += [result._replace(output=None) for result in participant_results]
+    print_reconstruction_summary(results, time.perf_counter() - start)
+
+    # Tableau de qualite de toute la cohorte a partir des enregistrements ecrits a cote de chaque essai
+    summary = quality_summary(
+        [job.file_path for job in jobs], max_rmsd=max_rmsd, intervals=[job.interval for job in jobs]
+    )
+    summary.to_csv(f"{home_path}reconstruction_quality.csv", index=False)
+    print(f"{summary['out_of_bounds'].sum()}/{len(summary)} essais au dela de {max_rmsd} m de RMSD")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+The goal of this program is to render the stick figures of the joint centers of all the trials, as videos or contact
+sheets, to check the cohort visually without opening the trials one by one.
+"""
+
+import os
+import glob
+import argparse
+import scipy.io
+from TrampolineAcrobaticVariability.Function.Function_Class_Basics import parent_list_marker, parent_list_xsens
+from TrampolineAcrobaticVariability.Function.Function_trial_store import TrialStore
+from TrampolineAcrobaticVariability.Function.Function_stick_figure import (
+    StickFigureJob,
+    stick_segments,
+    pelvis_frame_positions,
+    render_stick_figures,
+)
+
+home_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
+output_path = f"{home_path}Stick_figures/"
+
+
+def xsens_jobs(store, extension, participant=None, acrobatics=None):
+    # Essais Xsens du trial store, dans le repere du pelvis
+    jobs = []
+    for i_trial in store.trials(participant, acrobatics):
+        row = store.index.iloc[i_trial]
+        positions = pelvis_frame_positions(store.load(i_trial)["Jc_in_pelvis_frame"], store.JC_order)
+        jobs.append(
+            StickFigureJob(
+                positions,
+                f"{output_path}Xsens/{row['participant']}/{row['acrobatics']}/{row['trial']}{extension}",
+                f"{row['participant']} {row['acrobatics']} {row['trial']}",
+            )
+        )
+    return jobs
+
+
+def vicon_jobs(extension, participant=None, acrobatics=None):
+    # Centres articulaires des .mat ecrits par get_Q_and_JC_Marker_from_RotMat.py (<participant>/Pos_JC/<acrobatie>/)
+    jobs = []
+    JC_order = None
+    pattern = f"{home_path}{participant or '*'}/Pos_JC/{acrobatics or '*'}/*.mat"
+    for file_path in sorted(glob.glob(pattern)):
+        data_loaded = scipy.io.loadmat(file_path)
+        if "Jc_in_pelvis_frame" not in data_loaded:
+            continue
+        JC_order = [str(name).strip() for name in data_loaded["JC_order"]]
+        positions = pelvis_frame_positions(data_loaded["Jc_in_pelvis_frame"], JC_order, pelvis_name="JC_pelvis")
+        name, acrobatics_name = file_path.split(os.sep)[-4], file_path.split(os.sep)[-2]
+        trial_name = os.path.basename(file_path)[:-4]
+        jobs.append(
+            StickFigureJob(
+                positions,
+                f"{output_path}Vicon/{name}/{acrobatics_name}/{trial_name}{extension}",
+                f"{name} {acrobatics_name} {trial_name}",
+            )
+        )
+    return jobs, JC_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the stick figures of the joint centers of the trials")
+    parser.add_argument("--source", choices=["xsens", "vicon"], default="xsens", help="Trial store or Pos_JC .mat files")
+    parser.add_argument("--video", action="store_true", help="Write a video per trial instead of a contact sheet")
+    parser.add_argument("--participant", default=None)
+    parser.add_argument("--acrobatics", default=None)
+    parser.add_argument("--jobs", type=int, default=None, help="Number of rendering processes")
+    args = parser.parse_args()
+
+    extension = ".mp4" if args.video else ".png"
+    if args.source == "xsens":
+        store = TrialStore(f"{home_path}Xsens_trial_store/")
+        jobs = xsens_jobs(store, extension, args.participant, args.acrobatics)
+        segments = stick_segments(store.JC_order, parent_list_xsens)
+    else:
+        jobs, JC_order = vicon_jobs(extension, args.participant, args.acrobatics)
+        if not jobs:
+            print("No trial to render")
+            return
+        segments = stick_segments(JC_order, parent_list_marker)
+
+    render_stick_figures(jobs, segments, n_workers=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+The goal of this program is to bring the results and figures up to date by running only the stages whose inputs changed.
+"""
+
+import os
+import argparse
+from TrampolineAcrobaticVariability.Function.Function_pipeline import Stage, Pipeline
+
+data_path = "/home/lim/Documents/StageMathieu/DataTrampo/"
+results_path = "/home/lim/Documents/StageMathieu/Tab_result3/"
+stage_path = "/home/lim/Documents/StageMathieu/"
+
+labelling = f"{data_path}Labelling_trampo.csv"
+trials_c3d = f"{data_path}*/Tests/*.c3d"
+relax_c3d = f"{data_path}*/Score/Relax.c3d"
+models = f"{data_path}*/*.s2mMod"
+trial_store = f"{data_path}Xsens_trial_store/*"
+sd_pelvis_and_gaze = f"{results_path}sd_pelvis_and_gaze_orientation.mat"
+
+STAGES = [
+    Stage("gaps", "find_gaps_from_c3d", [labelling, trials_c3d], [f"{data_path}gaps_summary.csv"]),
+    Stage("kalman_q", "all_kinematics_from_c3d", [labelling, trials_c3d, models], [f"{data_path}*/Q/*.mat"]),
+    Stage(
+        "q_and_jc",
+        "get_Q_and_JC_Marker_from_RotMat",
+        [labelling, trials_c3d, relax_c3d, models],
+        [f"{data_path}*/Pos_JC/*/*.mat", f"{data_path}reconstruction_quality.csv"],
+    ),
+    Stage("xsens_store", "get_JC_Marker_from_Xsens", [f"{data_path}Xsens_pkl/**/*.pkl"], [trial_store]),
+    Stage(
+        "xsens_analysis",
+        "Xsens_analysis",
+        [trial_store, f"{stage_path}mean_total_length.csv"],
+        [
+            sd_pelvis_and_gaze,
+            f"{results_path}twist_events.csv",
+            f"{results_path}results_*_rotation.csv",
+            f"{results_path}results_*_position.csv",
+        ],
+    ),
+    Stage(
+        "velocity_T75",
+        "Get_velocity_at_T75",
+        [trial_store, f"{results_path}twist_events.csv"],
+        [f"{results_path}pelvis_omega.pkl"],
+    ),
+    Stage(
+        "gaze_figures",
+        "Stat_and_plot_article.Plot_SDtotal_with_vision",
+        [sd_pelvis_and_gaze],
+        [f"{results_path}time_spent_looking.pkl", f"{stage_path}Gaze_ground/*.png"],
+    ),
+    Stage(
+        "velocity_ranking",
+        "Stat_and_plot_article.ranking_difficulty_velocity_for_variability_at_T75",
+        [f"{results_path}pelvis_omega.pkl", f"{results_path}results_*_rotation.csv"],
+        [f"{results_path}pelvis_SD_T75.pkl", f"{stage_path}meeting/linear_reg_all_acrobatics_with_velocity_scale.svg"],
+    ),
+    Stage(
+        "time_spent_looking_figure",
+        "Stat_and_plot_article.Plot_SDtotal_vs_time_spent_looking",
+        [sd_pelvis_and_gaze, f"{results_path}time_spent_looking.pkl", f"{results_path}pelvis_SD_T75.pkl"],
+        [f"{stage_path}time_spent_looking_vs_pelvis_SD.svg"],
+    ),
+    Stage(
+        "rotation_rate_figure",
+        "Stat_and_plot_article.Plot_SDtotal_vs_rotation_rate",
+        [sd_pelvis_and_gaze, f"{results_path}pelvis_omega.pkl"],
+        [f"{stage_path}pelvis_velocity_vs_SD/all.png"],
+    ),
+    Stage(
+        "limbs_figures",
+        "Stat_and_plot_article.Plot_SDtotal_limbs_appendix",
+        [sd_pelvis_and_gaze],
+        [f"{stage_path}limbs_variability/*.png"],
+    ),
+    Stage(
+        "members_stats",
+        "Stat_and_plot_article.Plot_and_stat_members_variability",
+        [f"{results_path}results_*_position.csv"],
+        [f"{stage_path}meeting/mean_upper_body.svg", f"{stage_path}meeting/mean_lower_body.svg"],
+    ),
+    Stage(
+        "rotation_stats",
+        "Stat_and_plot_article.Plot_and_stat_rotation_variability",
+        [f"{results_path}results_*_rotation.csv"],
+        [f"{stage_path}meeting/mean_rotation.svg"],
+    ),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale stages of the analysis pipeline")
+    parser.add_argument("stages", nargs="*", help="Stages to bring up to date with their upstream stages (all by default)")
+    parser.add_argument("--force", nargs="*", default=[], help="Stages to run even if they are up to date")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of stages run at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stages which would be run")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(
+        STAGES, f"{data_path}pipeline_state.json", package_dir=os.path.dirname(os.path.abspath(__file__))
+    )
+    status = pipeline.run(args.stages or None, force=args.force, n_workers=args.jobs, dry_run=args.dry_run)
+    for name, stage_status in status.items():
+        print(f"{name}: {stage_status}")
+
+
+if __name__ == "__main__":
+    main()